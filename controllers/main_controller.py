@@ -1,10 +1,18 @@
-from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
 from models.banco import Banco
-from models.database import DatabaseManager
+from models.database import DatabaseManager, UnidadDeTrabajo
+from models.importacion import ImportadorMasivo
+from models.instantanea import Instantanea, InstantaneaInvalida
+from models.mantenimiento import CobroMantenimiento
+from models.registro_movimientos import PoliticaMovimientos
+from models.tiempo import a_epoch_us
+from models.monto import Monto
 from models.entidades import (ClientePersona, ClienteEmpresa, 
                              CajaAhorro, CuentaCorriente, CuentaPlazoFijo)
 from datetime import datetime
 import csv
+import os
+import threading
 
 class MainController(QObject):
     """
@@ -16,16 +24,67 @@ class MainController(QObject):
     datos_actualizados = pyqtSignal()
     error_occurred = pyqtSignal(str)
     operacion_exitosa = pyqtSignal(str)
+    lote_procesado = pyqtSignal(int, int)  # operaciones aplicadas, rechazadas
     
-    def __init__(self):
+    # Orígenes de datos para el informe general
+    INFORME_MEMORIA = "memoria"
+    INFORME_SQL = "sql"
+    
+    def __init__(self, perezoso: bool = False, capacidad_cache: int = 10000,
+                 base_compartida: bool = False, capacidad_movimientos: int = 1000):
         super().__init__()
-        self.banco = Banco()
-        self.db = DatabaseManager()
+        # Con la base compartida entre procesos los saldos se modifican con UPDATE condicionales
+        self.db = DatabaseManager(
+            saldos=DatabaseManager.SALDOS_CONDICIONALES if base_compartida
+            else DatabaseManager.SALDOS_ABSOLUTOS
+        )
+        # Con durabilidad en grupo las escrituras fallidas se informan desde el hilo escritor
+        self.db.suscribir_error_escritura(self._error_escritura)
+        # En modo perezoso las cuentas se cargan desde la base a medida que se usan
+        # Los movimientos que no entran en memoria se leen de la base
+        self._politica_movimientos = PoliticaMovimientos(capacidad_movimientos, historial=self.db)
+        self.banco = (Banco(self.db, capacidad_cache, movimientos=self._politica_movimientos)
+                      if perezoso else Banco(movimientos=self._politica_movimientos))
+        # La instantánea acelera el arranque; con la base compartida la memoria no
+        # refleja lo que escriben otros procesos, así que no se usa
+        self._ruta_instantanea = (None if perezoso or base_compartida
+                                  else os.path.splitext(self.db.db_path)[0] + ".snap")
+        if not self._ruta_instantanea:
+            # Sin instantáneas nadie poda la bitácora; se quitan sus triggers
+            self.db.desactivar_bitacora()
+        self._timer_vencimientos = None
+        self._timer_instantaneas = None
+        self._hilo_instantanea = None
         self.cargar_datos_iniciales()
     
+    def cerrar(self):
+        """Confirma las escrituras pendientes y libera la base de datos"""
+        if self._timer_vencimientos:
+            self._timer_vencimientos.stop()
+        if self._timer_instantaneas:
+            self._timer_instantaneas.stop()
+        self.guardar_instantanea(en_segundo_plano=False)
+        if not self.db.cerrar():
+            self.error_occurred.emit("Algunos movimientos no se pudieron guardar en la base de datos")
+    
+    def _error_escritura(self, error: Exception):
+        """Informa que falló una escritura diferida; la cola la sigue reintentando"""
+        self.error_occurred.emit(f"Error al guardar en la base de datos: {error}")
+    
     def cargar_datos_iniciales(self):
         """Carga los datos iniciales desde la base de datos"""
         try:
+            if self.banco.perezoso:
+                # Solo se agendan los vencimientos; las cuentas se cargan al usarlas
+                for numero, fecha in self.db.vencimientos_pendientes():
+                    self.banco.programar_vencimiento(numero, fecha)
+                self.datos_actualizados.emit()
+                return
+            
+            if self._cargar_instantanea():
+                self.datos_actualizados.emit()
+                return
+            
             # Cargar clientes
             clientes = self.db.cargar_clientes()
             for cliente in clientes:
@@ -39,6 +98,63 @@ class MainController(QObject):
         except Exception as e:
             self.error_occurred.emit(f"Error cargando datos: {str(e)}")
     
+    def _cargar_instantanea(self) -> bool:
+        """Carga el banco desde la instantánea y los cambios posteriores de la base"""
+        if not self._ruta_instantanea or not os.path.exists(self._ruta_instantanea):
+            return False
+        try:
+            Instantanea.cargar(self._ruta_instantanea, self.db, self.banco)
+            return True
+        except (InstantaneaInvalida, OSError):
+            # Se descarta lo que se haya alcanzado a cargar y se usa la base completa
+            self.banco = Banco(movimientos=self._politica_movimientos)
+            return False
+    
+    def guardar_instantanea(self, en_segundo_plano: bool = True) -> bool:
+        """
+        Guarda la instantánea del banco para el próximo arranque
+        Aquí solo se toma una vista consistente del banco; el armado y la escritura del
+        archivo corren en un hilo aparte para no congelar la interfaz
+        """
+        if not self._ruta_instantanea:
+            return False
+        if self._hilo_instantanea and self._hilo_instantanea.is_alive():
+            if en_segundo_plano:
+                # Todavía se está escribiendo la anterior
+                return False
+            self._hilo_instantanea.join()
+        try:
+            preparada = Instantanea.preparar(self.banco, self.db)
+        except ValueError as e:
+            self.error_occurred.emit(f"Error guardando instantánea: {str(e)}")
+            return False
+        if not en_segundo_plano:
+            return self._escribir_instantanea(preparada)
+        self._hilo_instantanea = threading.Thread(
+            target=self._escribir_instantanea, args=(preparada,),
+            name="instantanea", daemon=True
+        )
+        self._hilo_instantanea.start()
+        return True
+    
+    def _escribir_instantanea(self, preparada: dict) -> bool:
+        try:
+            Instantanea.escribir(preparada, self._ruta_instantanea, self.db)
+            return True
+        except (OSError, ValueError) as e:
+            # Desde el hilo de fondo la señal llega encolada al hilo de la interfaz
+            self.error_occurred.emit(f"Error guardando instantánea: {str(e)}")
+            return False
+    
+    def iniciar_instantaneas(self, intervalo_ms: int = 15 * 60 * 1000):
+        """Guarda periódicamente la instantánea del banco con un QTimer"""
+        if not self._ruta_instantanea:
+            return
+        if not self._timer_instantaneas:
+            self._timer_instantaneas = QTimer(self)
+            self._timer_instantaneas.timeout.connect(self.guardar_instantanea)
+        self._timer_instantaneas.start(intervalo_ms)
+    
     # Operaciones con Clientes
     def alta_cliente(self, dni: str, nombre: str, tipo: str) -> bool:
         """Da de alta un nuevo cliente"""
@@ -73,8 +189,7 @@ class MainController(QObject):
                 return False
             
             # Verificar que el cliente no tenga cuentas
-            cuentas_cliente = self.banco.obtener_cuentas_por_cliente(dni)
-            if cuentas_cliente:
+            if self.banco.tiene_cuentas(dni):
                 self.error_occurred.emit("No se puede eliminar un cliente con cuentas activas")
                 return False
             
@@ -183,9 +298,22 @@ class MainController(QObject):
                 self.error_occurred.emit("Cuenta no encontrada")
                 return False
             
+            if self.db.saldos_condicionales:
+                # El movimiento queda con la misma fecha en la base y en memoria
+                fecha_us = a_epoch_us(datetime.now())
+                saldo = self.db.acreditar(numero_cuenta, monto, "DEPOSITO", fecha_us)
+                if saldo is None:
+                    self.error_occurred.emit("Error al realizar el depósito")
+                    return False
+                self.banco.sincronizar_saldo(numero_cuenta, saldo, "DEPOSITO", monto, fecha_us)
+                self.operacion_exitosa.emit(f"Depósito de ${monto:.2f} realizado exitosamente")
+                self.datos_actualizados.emit()
+                return True
+            
             if cuenta.depositar(monto):
-                self.db.guardar_cuenta(cuenta)
-                self.db.guardar_movimiento(numero_cuenta, "DEPOSITO", monto, cuenta.saldo)
+                self.db.actualizar_saldo(cuenta)
+                self.db.guardar_movimiento(numero_cuenta, "DEPOSITO", monto, cuenta.saldo,
+                                           cuenta.ultimo_movimiento_us)
                 self.operacion_exitosa.emit(f"Depósito de ${monto:.2f} realizado exitosamente")
                 self.datos_actualizados.emit()
                 return True
@@ -209,9 +337,23 @@ class MainController(QObject):
                 self.error_occurred.emit("Cuenta no encontrada")
                 return False
             
+            if self.db.saldos_condicionales:
+                fecha_us = a_epoch_us(datetime.now())
+                saldo = self.db.debitar(numero_cuenta, monto, "EXTRACCION", fecha_us)
+                if saldo is None:
+                    # Otro proceso pudo cambiar el saldo: refrescar la copia en memoria
+                    self._refrescar_saldo(numero_cuenta)
+                    self.error_occurred.emit("Fondos insuficientes para la extracción")
+                    return False
+                self.banco.sincronizar_saldo(numero_cuenta, saldo, "EXTRACCION", -monto, fecha_us)
+                self.operacion_exitosa.emit(f"Extracción de ${monto:.2f} realizada exitosamente")
+                self.datos_actualizados.emit()
+                return True
+            
             if cuenta.extraer(monto):
-                self.db.guardar_cuenta(cuenta)
-                self.db.guardar_movimiento(numero_cuenta, "EXTRACCION", -monto, cuenta.saldo)
+                self.db.actualizar_saldo(cuenta)
+                self.db.guardar_movimiento(numero_cuenta, "EXTRACCION", -monto, cuenta.saldo,
+                                           cuenta.ultimo_movimiento_us)
                 self.operacion_exitosa.emit(f"Extracción de ${monto:.2f} realizada exitosamente")
                 self.datos_actualizados.emit()
                 return True
@@ -234,13 +376,18 @@ class MainController(QObject):
                 self.error_occurred.emit("No puede transferir a la misma cuenta")
                 return False
             
-            if self.banco.transferir(cuenta_origen, cuenta_destino, monto):
-                # Actualizar ambas cuentas en la base de datos
-                cuenta_origen_obj = self.banco.buscar_cuenta(cuenta_origen)
-                cuenta_destino_obj = self.banco.buscar_cuenta(cuenta_destino)
-                
-                self.db.guardar_cuenta(cuenta_origen_obj)
-                self.db.guardar_cuenta(cuenta_destino_obj)
+            comision = self.obtener_comision_transferencia(cuenta_origen, cuenta_destino)
+            
+            if self.db.saldos_condicionales:
+                return self._transferir_condicional(cuenta_origen, cuenta_destino, monto, comision)
+            
+            # El banco registra en la unidad ambas patas y la comisión, con las mismas
+            # fechas que en memoria, y se persisten en una sola transacción
+            unidad = UnidadDeTrabajo()
+            if self.banco.transferir(cuenta_origen, cuenta_destino, monto, unidad):
+                if not self._confirmar(unidad):
+                    self.error_occurred.emit("Error al guardar la transferencia")
+                    return False
                 
                 self.operacion_exitosa.emit(f"Transferencia de ${monto:.2f} realizada exitosamente")
                 self.datos_actualizados.emit()
@@ -253,6 +400,111 @@ class MainController(QObject):
             self.error_occurred.emit(f"Error en transferencia: {str(e)}")
             return False
     
+    def _transferir_condicional(self, cuenta_origen: str, cuenta_destino: str,
+                                monto: float, comision: float) -> bool:
+        """Transferencia resuelta en la base compartida con débito condicional"""
+        if not self.banco.buscar_cuenta(cuenta_origen) or not self.banco.buscar_cuenta(cuenta_destino):
+            self.error_occurred.emit("Cuenta no encontrada")
+            return False
+        
+        fecha_us = a_epoch_us(datetime.now())
+        saldos = self.db.transferir(cuenta_origen, cuenta_destino, monto, comision, fecha_us)
+        if saldos is None:
+            self._refrescar_saldo(cuenta_origen)
+            self.error_occurred.emit("Fondos insuficientes para la transferencia")
+            return False
+        
+        saldo_origen, saldo_destino = saldos
+        if comision > 0:
+            self.banco.sincronizar_saldo(cuenta_origen, saldo_origen + monto,
+                                         "COMISION TRANSFERENCIA", -comision, fecha_us)
+        self.banco.sincronizar_saldo(cuenta_origen, saldo_origen,
+                                     f"TRANSFERENCIA A {cuenta_destino}", -monto, fecha_us)
+        self.banco.sincronizar_saldo(cuenta_destino, saldo_destino,
+                                     f"TRANSFERENCIA DE {cuenta_origen}", monto, fecha_us)
+        self.operacion_exitosa.emit(f"Transferencia de ${monto:.2f} realizada exitosamente")
+        self.datos_actualizados.emit()
+        return True
+    
+    def _confirmar(self, unidad: UnidadDeTrabajo) -> bool:
+        """
+        Confirma una unidad de trabajo en la base
+        Si se confirmó, con la base compartida se llevan a memoria los saldos resultantes.
+        Si falló, las cuentas afectadas vuelven al saldo guardado y pierden los movimientos
+        de la unidad, para que memoria y base no queden distintas
+        """
+        if self.db.confirmar(unidad):
+            for numero, saldo in unidad.saldos_confirmados.items():
+                self.banco.sincronizar_saldo(numero, saldo)
+            return True
+        self.banco.anular_movimientos(unidad.movimientos)
+        for numero in unidad.numeros_cuentas:
+            self._refrescar_saldo(numero)
+        return False
+    
+    def _refrescar_saldo(self, numero_cuenta: str):
+        """Trae a memoria el saldo confirmado en la base"""
+        saldo = self.db.saldo_guardado(numero_cuenta)
+        if saldo is not None:
+            self.banco.sincronizar_saldo(numero_cuenta, saldo)
+    
+    def aplicar_lote(self, operaciones: list) -> list:
+        """
+        Aplica un lote de depósitos, extracciones y transferencias (ver Banco.aplicar_lote)
+        Todos los saldos y movimientos se guardan en una sola transacción y al terminar
+        se emite una única señal con el resumen. Devuelve un (exito, mensaje) por operación
+        """
+        try:
+            unidad = UnidadDeTrabajo()
+            resultados = self.banco.aplicar_lote(operaciones, unidad)
+            
+            if not unidad.vacia and not self._confirmar(unidad):
+                self.error_occurred.emit("Error al guardar el lote de operaciones")
+                return [(False, "Error al guardar") if exito else (exito, mensaje)
+                        for exito, mensaje in resultados]
+            
+            aplicadas = sum(1 for exito, _ in resultados if exito)
+            self.lote_procesado.emit(aplicadas, len(resultados) - aplicadas)
+            self.datos_actualizados.emit()
+            return resultados
+            
+        except Exception as e:
+            self.error_occurred.emit(f"Error aplicando lote: {str(e)}")
+            return []
+    
+    def iniciar_vencimientos(self, intervalo_ms: int = 60000):
+        """Revisa periódicamente los plazos fijos vencidos con un QTimer"""
+        if not self._timer_vencimientos:
+            self._timer_vencimientos = QTimer(self)
+            self._timer_vencimientos.timeout.connect(self.acreditar_vencimientos)
+        self._timer_vencimientos.start(intervalo_ms)
+        self.acreditar_vencimientos()
+    
+    def acreditar_vencimientos(self) -> int:
+        """
+        Acredita el interés de los plazos fijos vencidos en una sola transacción
+        Solo se consultan las cuentas vencidas de la agenda. Devuelve cuántas se acreditaron
+        """
+        try:
+            unidad = UnidadDeTrabajo()
+            acreditadas = self.banco.acreditar_vencidos(unidad)
+            if not acreditadas:
+                return 0
+            
+            if not self._confirmar(unidad):
+                # Los saldos ya volvieron a los guardados; se reintentan en la próxima revisión
+                self.banco.reagendar_vencidos(acreditadas)
+                self.error_occurred.emit("Error al guardar la acreditación de intereses")
+                return 0
+            
+            self.operacion_exitosa.emit(f"Intereses acreditados en {len(acreditadas)} plazos fijos")
+            self.datos_actualizados.emit()
+            return len(acreditadas)
+            
+        except Exception as e:
+            self.error_occurred.emit(f"Error acreditando intereses: {str(e)}")
+            return 0
+    
     def crear_plazo_fijo(self, cuenta_origen: str, capital: float, plazo_dias: int) -> str:
         """Crea un plazo fijo desde una cuenta origen"""
         try:
@@ -269,10 +521,12 @@ class MainController(QObject):
                 self.error_occurred.emit("Fondos insuficientes en la cuenta origen")
                 return ""
             
-            # Extraer capital de la cuenta origen
-            if not cuenta_origen_obj.extraer(capital):
+            # Extraer capital de la cuenta origen, registrado como en la base
+            capital = Monto.convertir(capital)
+            if not cuenta_origen_obj.puede_extraer(capital):
                 self.error_occurred.emit("No se pudo extraer el capital de la cuenta origen")
                 return ""
+            cuenta_origen_obj._aplicar_movimiento("CREACION PF", -capital)
             
             # Generar número de cuenta para el plazo fijo
             numero_pf = f"PF{datetime.now().strftime('%Y%m%d%H%M%S')}"
@@ -288,16 +542,26 @@ class MainController(QObject):
             
             # Registrar en el banco y base de datos
             if self.banco.alta_cuenta(plazo_fijo):
-                self.db.guardar_cuenta(cuenta_origen_obj)
-                self.db.guardar_cuenta(plazo_fijo)
-                self.db.guardar_movimiento(cuenta_origen, "CREACION PF", -capital, cuenta_origen_obj.saldo)
+                unidad = UnidadDeTrabajo()
+                unidad.actualizar_saldo(cuenta_origen_obj)
+                unidad.guardar_cuenta(plazo_fijo)
+                unidad.registrar_movimiento(cuenta_origen, "CREACION PF", -capital, cuenta_origen_obj.saldo,
+                                            cuenta_origen_obj.ultimo_movimiento_us)
+                
+                if not self._confirmar(unidad):
+                    # El saldo de la cuenta origen ya volvió al guardado
+                    self.banco.baja_cuenta(numero_pf)
+                    self.error_occurred.emit("No se pudo guardar el plazo fijo")
+                    return ""
                 
                 self.operacion_exitosa.emit(f"Plazo fijo {numero_pf} creado exitosamente")
                 self.datos_actualizados.emit()
                 return numero_pf
             else:
                 # Revertir la extracción si falla la creación del plazo fijo
-                cuenta_origen_obj.depositar(capital)
+                cuenta_origen_obj._quitar_movimiento(cuenta_origen_obj.ultimo_movimiento_us,
+                                                     "CREACION PF", -capital)
+                cuenta_origen_obj._ajustar_saldo(cuenta_origen_obj.saldo + capital)
                 self.error_occurred.emit("No se pudo crear el plazo fijo")
                 return ""
                 
@@ -306,24 +570,19 @@ class MainController(QObject):
             return ""
     
     # Informes y Estadísticas
-    def generar_informe_general(self) -> dict:
-        """Genera un informe general del banco"""
+    def generar_informe_general(self, origen: str = None) -> dict:
+        """
+        Genera un informe general del banco
+        origen elige de dónde salen los totales: INFORME_MEMORIA usa los que mantiene
+        el banco en memoria, INFORME_SQL una consulta agrupada sobre la base.
+        Por defecto se usa la memoria, salvo en modo perezoso donde siempre se usa SQL
+        """
         try:
-            informe = {
-                'total_clientes': len(self.banco.obtener_clientes()),
-                'clientes_persona': len(self.banco.obtener_clientes_persona()),
-                'clientes_empresa': len(self.banco.obtener_clientes_empresa()),
-                'total_cuentas': len(self.banco.obtener_cuentas()),
-                'cajas_ahorro': len(self.banco.obtener_cajas_ahorro()),
-                'cuentas_corriente': len(self.banco.obtener_cuentas_corriente()),
-                'plazos_fijos': len(self.banco.obtener_cuentas_plazo_fijo()),
-                'saldo_total': self.banco.saldo_total(),
-                'saldo_cajas_ahorro': self.banco.saldo_total_cajas_ahorro(),
-                'saldo_cuentas_corriente': self.banco.saldo_total_cuentas_corriente(),
-                'saldo_plazos_fijos': self.banco.saldo_total_plazo_fijo(),
-                'total_descubierto': self.banco.total_descubierto()
-            }
-            return informe
+            if origen == self.INFORME_SQL:
+                return self.db.resumen()
+            if origen in (None, self.INFORME_MEMORIA):
+                return self.banco.resumen()
+            raise ValueError(f"Origen de informe desconocido: {origen}")
         except Exception as e:
             self.error_occurred.emit(f"Error generando informe: {str(e)}")
             return {}
@@ -338,16 +597,74 @@ class MainController(QObject):
                           tipo_movimiento: str = None):
         """Obtiene movimientos con filtros opcionales"""
         try:
-            movimientos = self.db.cargar_movimientos(numero_cuenta, fecha_desde, fecha_hasta)
-            
-            if tipo_movimiento:
-                movimientos = [m for m in movimientos if m['tipo'] == tipo_movimiento]
-            
-            return movimientos
+            return self.db.cargar_movimientos(numero_cuenta, fecha_desde, fecha_hasta, tipo_movimiento)
         except Exception as e:
             self.error_occurred.emit(f"Error obteniendo movimientos: {str(e)}")
             return []
     
+    def obtener_movimientos_pagina(self, numero_cuenta: str = None,
+                                   fecha_desde: datetime = None,
+                                   fecha_hasta: datetime = None,
+                                   tipo_movimiento: str = None,
+                                   despues_de: tuple = None,
+                                   limite: int = 100):
+        """
+        Obtiene una página de movimientos con filtros opcionales
+        Devuelve (movimientos, clave) donde clave se pasa como despues_de para la página siguiente
+        """
+        try:
+            filtros = {
+                'numero_cuenta': numero_cuenta,
+                'fecha_desde': fecha_desde,
+                'fecha_hasta': fecha_hasta,
+                'tipo': tipo_movimiento
+            }
+            return self.db.cargar_movimientos_pagina(filtros, despues_de, limite)
+        except Exception as e:
+            self.error_occurred.emit(f"Error obteniendo movimientos: {str(e)}")
+            return [], None
+    
+    def importar_archivos(self, clientes: str = None, cuentas: str = None,
+                          movimientos: str = None, reiniciar: bool = False) -> list:
+        """
+        Importa en bloque archivos CSV o JSON lines de clientes, cuentas y movimientos
+        Se procesan en ese orden; una importación interrumpida se retoma al repetirla
+        """
+        importador = ImportadorMasivo(self.db, self.banco)
+        resultados = []
+        try:
+            if clientes:
+                resultados.append(importador.importar_clientes(clientes, reiniciar))
+            if cuentas:
+                resultados.append(importador.importar_cuentas(cuentas, reiniciar))
+            if movimientos:
+                resultados.append(importador.importar_movimientos(movimientos, reiniciar))
+        except Exception as e:
+            self.error_occurred.emit(f"Error importando datos: {str(e)}")
+        
+        if resultados:
+            self.operacion_exitosa.emit("\n".join(str(r) for r in resultados))
+            self.datos_actualizados.emit()
+        return resultados
+    
+    def cobrar_mantenimiento(self, periodo: str = None):
+        """
+        Cobra el mantenimiento mensual de las cuentas corrientes (periodo AAAA-MM)
+        Un periodo ya cobrado no se vuelve a cobrar
+        """
+        try:
+            resultado = CobroMantenimiento(self.db, self.banco).cobrar(periodo)
+        except Exception as e:
+            self.error_occurred.emit(f"Error cobrando mantenimiento: {str(e)}")
+            return None
+        
+        if resultado.ya_cobrado:
+            self.operacion_exitosa.emit(f"El mantenimiento de {resultado.periodo} ya fue cobrado")
+        else:
+            self.operacion_exitosa.emit(str(resultado))
+            self.datos_actualizados.emit()
+        return resultado
+    
     def exportar_movimientos_csv(self, movimientos, filename: str) -> bool:
         """Exporta movimientos a archivo CSV"""
         try:
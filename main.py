@@ -18,6 +18,11 @@ def main():
     controller.datos_actualizados.connect(window.actualizar_resumen)
     controller.error_occurred.connect(window.mostrar_error)
     controller.operacion_exitosa.connect(window.mostrar_exito)
+    app.aboutToQuit.connect(controller.cerrar)
+    
+    # Acreditar los plazos fijos a medida que vencen
+    controller.iniciar_vencimientos()
+    controller.iniciar_instantaneas()
     
     # Ejecutar la aplicación
     sys.exit(app.exec())
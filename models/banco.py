@@ -1,159 +1,874 @@
-from typing import List, Dict, Optional
+import threading
+import weakref
+from datetime import datetime
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from operator import attrgetter
+from typing import List, Dict, Optional, Set
 from .entidades import Cliente, CuentaBase, CajaAhorro, CuentaCorriente, CuentaPlazoFijo
+from .monto import Monto
+from .registro_movimientos import PoliticaMovimientos
+from .vencimientos import AgendaVencimientos
+from .vista_banco import VistaBanco
 
 class Banco:
-    """Clase que administra clientes y cuentas del sistema bancario"""
+    """
+    Clase que administra clientes y cuentas del sistema bancario
     
-    def __init__(self):
-        self._clientes: Dict[str, Cliente] = {}
-        self._cuentas: Dict[str, CuentaBase] = {}
-        self._comision_transferencia = 50.0
+    Si se indica un repositorio (DatabaseManager) el banco trabaja en modo perezoso:
+    clientes y cuentas se cargan desde la base al buscarlos por primera vez, se mantienen
+    en una caché LRU de tamaño acotado y los totales se calculan en SQL
+    
+    Si se indica una cantidad de franjas el banco admite operaciones desde varios hilos:
+    cada cuenta se protege con el lock de su franja y las operaciones toman los locks de
+    sus cuentas en orden de franja, sin ningún lock global en depósitos y transferencias
+    """
+    
+    # Códigos de tipo de cuenta usados en la base de datos
+    CLASES_CUENTA = {"CA": CajaAhorro, "CC": CuentaCorriente, "PF": CuentaPlazoFijo}
+    _CODIGOS_CUENTA = {clase: codigo for codigo, clase in CLASES_CUENTA.items()}
+    
+    def __init__(self, repositorio=None, capacidad_cache: int = 10000, franjas: int = 0,
+                 movimientos: PoliticaMovimientos = None):
+        if repositorio and franjas:
+            raise ValueError("El modo concurrente no admite la carga perezosa")
+        self._repositorio = repositorio
+        self._capacidad_cache = capacidad_cache
+        # Capacidad en memoria e historial de los movimientos de las cuentas de este banco;
+        # en modo perezoso el historial por omisión es el mismo repositorio
+        self._politica_movimientos = movimientos or PoliticaMovimientos(historial=repositorio)
+        self._clientes: Dict[str, Cliente] = OrderedDict() if repositorio else {}
+        self._cuentas: Dict[str, CuentaBase] = OrderedDict() if repositorio else {}
+        # Cuentas modificadas en memoria que todavía no se guardaron; no se desalojan
+        self._cuentas_sucias: Set[str] = set()
+        # Mapas de identidad: cada DNI o número de cuenta corresponde a una única
+        # instancia mientras esté referenciada, aunque se haya desalojado de la caché
+        self._clientes_residentes = weakref.WeakValueDictionary()
+        self._cuentas_residentes = weakref.WeakValueDictionary()
+        self._comision_transferencia = Monto.de_pesos(50)
         self._tasa_interes_pf = 0.10
-        self._costo_mantenimiento_cc = 50.0
+        self._costo_mantenimiento_cc = Monto.de_pesos(50)
+        
+        # Índices secundarios y totales que se mantienen al día con cada alta, baja y
+        # cambio de saldo (en modo perezoso se resuelven en SQL). Los índices son
+        # diccionarios con valores None usados como conjuntos ordenados
+        self._cuentas_por_tipo: Dict[str, Dict[str, None]] = {codigo: {} for codigo in self.CLASES_CUENTA}
+        self._cuentas_por_titular: Dict[str, Dict[str, None]] = {}
+        self._clientes_por_tipo: Dict[str, Dict[str, None]] = {}
+        # Los totales de saldo se llevan por franja para que cada operación solo
+        # modifique los de las franjas que tiene bloqueadas
+        cantidad_franjas = max(franjas, 1)
+        self._saldos = [dict.fromkeys(self.CLASES_CUENTA, 0) for _ in range(cantidad_franjas)]
+        self._descubierto = [0] * cantidad_franjas
+        
+        # Locks del modo concurrente: uno por franja para los saldos y uno para
+        # las altas y bajas, que modifican los diccionarios e índices
+        self._locks = [threading.Lock() for _ in range(franjas)]
+        self._lock_estructura = threading.RLock() if franjas else nullcontext()
+        
+        # Plazos fijos con interés por acreditar, ordenados por vencimiento
+        self._agenda = AgendaVencimientos()
+        
+        # Referencias débiles a las vistas abiertas (ver snapshot), que reciben los datos
+        # antes de cada cambio. La tupla se reemplaza entera para recorrerla sin lock
+        self._vistas: tuple = ()
+        self._lock_vistas = threading.RLock()
+        self._epoca = 0
+        if repositorio:
+            repositorio.suscribir_guardado(self.marcar_guardada)
+    
+    @property
+    def politica_movimientos(self) -> PoliticaMovimientos:
+        return self._politica_movimientos
+    
+    @property
+    def perezoso(self) -> bool:
+        return self._repositorio is not None
+    
+    @property
+    def concurrente(self) -> bool:
+        return bool(self._locks)
+    
+    def _franja(self, numero: str) -> int:
+        """Índice de la franja a la que pertenece una cuenta"""
+        return hash(numero) % len(self._locks) if self._locks else 0
+    
+    @contextmanager
+    def _bloquear(self, *numeros: str):
+        """
+        Toma los locks de las franjas de las cuentas indicadas
+        Siempre en orden creciente de franja, para que dos operaciones no se bloqueen mutuamente
+        """
+        if not self._locks:
+            yield
+            return
+        locks = [self._locks[i] for i in sorted({self._franja(n) for n in numeros})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+    
+    @contextmanager
+    def _bloquear_todo(self):
+        """Toma todos los locks de franja, para leer totales consistentes"""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+    
+    def _desalojar(self, cache: Dict, protegidos: Set[str] = frozenset()):
+        """Quita de la caché LRU las entradas menos usadas que excedan la capacidad"""
+        exceso = len(cache) - self._capacidad_cache
+        if exceso <= 0:
+            return
+        desalojar = []
+        for clave in cache:
+            if clave not in protegidos:
+                desalojar.append(clave)
+                if len(desalojar) == exceso:
+                    break
+        for clave in desalojar:
+            del cache[clave]
+    
+    def marcar_guardada(self, *numeros: str):
+        """Indica que las cuentas ya se guardaron y pueden desalojarse de la caché"""
+        self._cuentas_sucias.difference_update(numeros)
     
     # Métodos para clientes
+    def cliente_residente(self, dni: str) -> Optional[Cliente]:
+        """Devuelve la instancia en memoria de un cliente sin consultar la base"""
+        return self._clientes.get(dni) or self._clientes_residentes.get(dni)
+    
+    def cuenta_residente(self, numero: str) -> Optional[CuentaBase]:
+        """Devuelve la instancia en memoria de una cuenta sin consultar la base"""
+        return self._cuentas.get(numero) or self._cuentas_residentes.get(numero)
+    
+    def internar_cliente(self, cliente: Cliente) -> Cliente:
+        """
+        Registra un cliente en el mapa de identidad
+        Si ya hay una instancia para ese DNI se devuelve esa en lugar del argumento
+        """
+        existente = self.cliente_residente(cliente.dni)
+        if existente:
+            return existente
+        self._clientes_residentes[cliente.dni] = cliente
+        return cliente
+    
     def alta_cliente(self, cliente: Cliente) -> bool:
         """Da de alta un nuevo cliente"""
-        if cliente.dni in self._clientes:
-            return False
-        self._clientes[cliente.dni] = cliente
-        return True
+        with self._lock_estructura:
+            if self.buscar_cliente(cliente.dni):
+                return False
+            cliente = self.internar_cliente(cliente)
+            self._separar_vistas()
+            self._clientes[cliente.dni] = cliente
+            if self.perezoso:
+                self._desalojar(self._clientes)
+            else:
+                self._clientes_por_tipo.setdefault(cliente.tipo, {})[cliente.dni] = None
+            return True
     
     def baja_cliente(self, dni: str) -> bool:
         """Da de baja un cliente"""
-        if dni not in self._clientes:
-            return False
+        with self._lock_estructura:
+            if not self.buscar_cliente(dni):
+                return False
         
-        # Verificar que el cliente no tenga cuentas activas
-        cuentas_cliente = self.obtener_cuentas_por_cliente(dni)
-        if cuentas_cliente:
-            return False
+            # Verificar que el cliente no tenga cuentas activas
+            if self.tiene_cuentas(dni):
+                return False
         
-        del self._clientes[dni]
-        return True
+            self._separar_vistas()
+            cliente = self._clientes.pop(dni)
+            self._clientes_residentes.pop(dni, None)
+            if not self.perezoso:
+                del self._clientes_por_tipo[cliente.tipo][dni]
+            return True
+    
+    def reemplazar_cliente(self, cliente: Cliente) -> bool:
+        """
+        Reemplaza un cliente existente por otra instancia con sus datos actuales
+        Sus cuentas pasan a tenerla como titular; si cambió el tipo se reindexa
+        """
+        with self._lock_estructura:
+            anterior = self.buscar_cliente(cliente.dni)
+            if anterior is None:
+                return False
+            self._separar_vistas()
+            self._clientes[cliente.dni] = cliente
+            self._clientes_residentes[cliente.dni] = cliente
+            if self.perezoso:
+                cuentas = [c for c in list(self._cuentas_residentes.values())
+                           if c.titular is anterior]
+            else:
+                del self._clientes_por_tipo[anterior.tipo][cliente.dni]
+                self._clientes_por_tipo.setdefault(cliente.tipo, {})[cliente.dni] = None
+                cuentas = self.obtener_cuentas_por_cliente(cliente.dni)
+            for cuenta in cuentas:
+                cuenta._titular = cliente
+            return True
     
     def buscar_cliente(self, dni: str) -> Optional[Cliente]:
         """Busca un cliente por DNI"""
-        return self._clientes.get(dni)
+        cliente = self._clientes.get(dni)
+        if not self.perezoso:
+            return cliente
+        
+        if cliente:
+            self._clientes.move_to_end(dni)
+            return cliente
+        
+        cliente = self._clientes_residentes.get(dni)
+        if not cliente:
+            cliente = self._repositorio.cargar_cliente(dni)
+            if not cliente:
+                return None
+            self._clientes_residentes[dni] = cliente
+        self._clientes[dni] = cliente
+        self._desalojar(self._clientes)
+        return cliente
     
     def obtener_clientes(self) -> List[Cliente]:
         """Obtiene todos los clientes"""
+        if self.perezoso:
+            return self._buscar_clientes(self._repositorio.dnis_clientes())
         return list(self._clientes.values())
     
     def obtener_clientes_persona(self) -> List[Cliente]:
         """Obtiene solo clientes persona"""
-        return [c for c in self._clientes.values() if c.tipo == "persona"]
+        if self.perezoso:
+            return self._buscar_clientes(self._repositorio.dnis_clientes("persona"))
+        return self._clientes_de_tipo("persona")
     
     def obtener_clientes_empresa(self) -> List[Cliente]:
         """Obtiene solo clientes empresa"""
-        return [c for c in self._clientes.values() if c.tipo == "empresa"]
+        if self.perezoso:
+            return self._buscar_clientes(self._repositorio.dnis_clientes("empresa"))
+        return self._clientes_de_tipo("empresa")
+    
+    def _clientes_de_tipo(self, tipo: str) -> List[Cliente]:
+        return [self._clientes[dni] for dni in self._clientes_por_tipo.get(tipo, ())]
+    
+    def _buscar_clientes(self, dnis: List[str]) -> List[Cliente]:
+        return [c for c in (self.buscar_cliente(dni) for dni in dnis) if c]
     
     # Métodos para cuentas
     def alta_cuenta(self, cuenta: CuentaBase) -> bool:
         """Da de alta una nueva cuenta"""
-        if cuenta.numero in self._cuentas:
-            return False
-        self._cuentas[cuenta.numero] = cuenta
-        return True
+        with self._lock_estructura, self._bloquear(cuenta.numero):
+            if self.buscar_cuenta(cuenta.numero):
+                return False
+            self._separar_vistas()
+            cuenta.usar_politica_movimientos(self._politica_movimientos)
+            self._cuentas[cuenta.numero] = cuenta
+            if self.perezoso:
+                self._cuentas_residentes[cuenta.numero] = cuenta
+                self._cuentas_sucias.add(cuenta.numero)
+                self._desalojar(self._cuentas, self._cuentas_sucias)
+            else:
+                self._indexar_cuenta(cuenta)
+                cuenta.observar_saldo(self._saldo_modificado)
+            if isinstance(cuenta, CuentaPlazoFijo) and cuenta.interes_pendiente:
+                self._agenda.programar(cuenta.numero, cuenta.fecha_vencimiento)
+            return True
     
     def baja_cuenta(self, numero: str) -> bool:
         """Da de baja una cuenta"""
-        if numero not in self._cuentas:
-            return False
-        del self._cuentas[numero]
-        return True
+        with self._lock_estructura, self._bloquear(numero):
+            if not self.buscar_cuenta(numero):
+                return False
+            self._separar_vistas()
+            cuenta = self._cuentas.pop(numero)
+            if self.perezoso:
+                self._cuentas_residentes.pop(numero, None)
+                self._cuentas_sucias.discard(numero)
+            else:
+                cuenta.observar_saldo(None)
+                self._desindexar_cuenta(cuenta)
+            self._agenda.cancelar(numero)
+            return True
+    
+    def restaurar(self, clientes: List[Cliente], cuentas: List[CuentaBase],
+                  saldos: Dict[str, int] = None, descubierto: int = None):
+        """
+        Carga en bloque clientes y cuentas en un banco vacío sin pasar por las altas
+        Si se indican los totales en centavos se usan tal cual en lugar de sumar las cuentas
+        """
+        if self.perezoso:
+            raise ValueError("La carga en bloque no admite el modo perezoso")
+        with self._lock_estructura, self._bloquear_todo():
+            if self._clientes or self._cuentas:
+                raise ValueError("El banco ya tiene clientes o cuentas")
+            self._separar_vistas()
+            
+            for cliente in clientes:
+                self._clientes[cliente.dni] = cliente
+                self._clientes_por_tipo.setdefault(cliente.tipo, {})[cliente.dni] = None
+            
+            # Los totales por franja dependen del hash de cada número: en modo concurrente se suman
+            sumar = saldos is None or self.concurrente
+            observador = self._saldo_modificado
+            politica = self._politica_movimientos
+            por_clase = {clase: self._cuentas_por_tipo[codigo]
+                         for clase, codigo in self._CODIGOS_CUENTA.items()}
+            por_titular = self._cuentas_por_titular
+            plazos_fijos = por_clase[CuentaPlazoFijo]
+            for cuenta in cuentas:
+                numero = cuenta.numero
+                indice = por_clase.get(type(cuenta))
+                if indice is None:
+                    indice = self._cuentas_por_tipo[self.codigo_cuenta(cuenta)]
+                indice[numero] = None
+                dni = cuenta.titular.dni
+                titulares = por_titular.get(dni)
+                if titulares is None:
+                    titulares = por_titular[dni] = {}
+                titulares[numero] = None
+                cuenta.observar_saldo(observador)
+                cuenta.usar_politica_movimientos(politica)
+            self._cuentas.update(zip(map(attrgetter('numero'), cuentas), cuentas))
+            
+            for numero in plazos_fijos:
+                cuenta = self._cuentas[numero]
+                if cuenta.interes_pendiente:
+                    self._agenda.programar(numero, cuenta.fecha_vencimiento)
+            if sumar:
+                for cuenta in cuentas:
+                    self._sumar_saldo(cuenta.numero, self.codigo_cuenta(cuenta), cuenta.saldo.centavos, 1)
+            else:
+                self._saldos[0].update(saldos)
+                self._descubierto[0] = descubierto
     
     def buscar_cuenta(self, numero: str) -> Optional[CuentaBase]:
         """Busca una cuenta por número"""
-        return self._cuentas.get(numero)
+        cuenta = self._cuentas.get(numero)
+        if not self.perezoso:
+            return cuenta
+        
+        if cuenta:
+            self._cuentas.move_to_end(numero)
+            return cuenta
+        
+        cuenta = self._cuentas_residentes.get(numero)
+        if not cuenta:
+            cuenta = self._repositorio.cargar_cuenta(numero, self)
+            if not cuenta:
+                return None
+            cuenta.usar_politica_movimientos(self._politica_movimientos)
+            self._cuentas_residentes[numero] = cuenta
+        self._cuentas[numero] = cuenta
+        self._desalojar(self._cuentas, self._cuentas_sucias)
+        return cuenta
     
     def obtener_cuentas(self) -> List[CuentaBase]:
         """Obtiene todas las cuentas"""
+        if self.perezoso:
+            return self._buscar_cuentas(self._repositorio.numeros_cuentas())
         return list(self._cuentas.values())
     
     def obtener_cuentas_por_cliente(self, dni: str) -> List[CuentaBase]:
         """Obtiene las cuentas de un cliente"""
-        return [c for c in self._cuentas.values() if c.titular.dni == dni]
+        if self.perezoso:
+            return self._buscar_cuentas(self._repositorio.numeros_cuentas(dni_titular=dni))
+        return [self._cuentas[numero] for numero in self._cuentas_por_titular.get(dni, ())]
+    
+    def tiene_cuentas(self, dni: str) -> bool:
+        """Indica si un cliente tiene cuentas activas"""
+        if self.perezoso:
+            return bool(self._repositorio.numeros_cuentas(dni_titular=dni))
+        return bool(self._cuentas_por_titular.get(dni))
     
     def obtener_cajas_ahorro(self) -> List[CajaAhorro]:
         """Obtiene todas las cajas de ahorro"""
-        return [c for c in self._cuentas.values() if isinstance(c, CajaAhorro)]
+        if self.perezoso:
+            return self._buscar_cuentas(self._repositorio.numeros_cuentas(tipo="CA"))
+        return self._cuentas_de_tipo("CA")
     
     def obtener_cuentas_corriente(self) -> List[CuentaCorriente]:
         """Obtiene todas las cuentas corrientes"""
-        return [c for c in self._cuentas.values() if isinstance(c, CuentaCorriente)]
+        if self.perezoso:
+            return self._buscar_cuentas(self._repositorio.numeros_cuentas(tipo="CC"))
+        return self._cuentas_de_tipo("CC")
     
     def obtener_cuentas_plazo_fijo(self) -> List[CuentaPlazoFijo]:
         """Obtiene todas las cuentas a plazo fijo"""
-        return [c for c in self._cuentas.values() if isinstance(c, CuentaPlazoFijo)]
+        if self.perezoso:
+            return self._buscar_cuentas(self._repositorio.numeros_cuentas(tipo="PF"))
+        return self._cuentas_de_tipo("PF")
+    
+    def _cuentas_de_tipo(self, codigo: str) -> List[CuentaBase]:
+        return [self._cuentas[numero] for numero in self._cuentas_por_tipo[codigo]]
+    
+    def _buscar_cuentas(self, numeros: List[str]) -> List[CuentaBase]:
+        return [c for c in (self.buscar_cuenta(numero) for numero in numeros) if c]
+    
+    @classmethod
+    def codigo_cuenta(cls, cuenta: CuentaBase) -> str:
+        """Devuelve el código de tipo (CA, CC, PF) de una cuenta"""
+        codigo = cls._CODIGOS_CUENTA.get(type(cuenta))
+        if codigo is None:
+            codigo = next(c for c, clase in cls.CLASES_CUENTA.items() if isinstance(cuenta, clase))
+        return codigo
+    
+    # Índices y totales incrementales
+    def _indexar_cuenta(self, cuenta: CuentaBase):
+        """Agrega una cuenta a los índices secundarios y a los totales por tipo"""
+        codigo = self.codigo_cuenta(cuenta)
+        self._cuentas_por_tipo[codigo][cuenta.numero] = None
+        self._cuentas_por_titular.setdefault(cuenta.titular.dni, {})[cuenta.numero] = None
+        self._sumar_saldo(cuenta.numero, codigo, cuenta.saldo.centavos, 1)
+    
+    def _desindexar_cuenta(self, cuenta: CuentaBase):
+        """Quita una cuenta de los índices secundarios y de los totales por tipo"""
+        codigo = self.codigo_cuenta(cuenta)
+        del self._cuentas_por_tipo[codigo][cuenta.numero]
+        del self._cuentas_por_titular[cuenta.titular.dni][cuenta.numero]
+        if not self._cuentas_por_titular[cuenta.titular.dni]:
+            del self._cuentas_por_titular[cuenta.titular.dni]
+        self._sumar_saldo(cuenta.numero, codigo, cuenta.saldo.centavos, -1)
+    
+    def _sumar_saldo(self, numero: str, codigo: str, centavos: int, signo: int):
+        franja = self._franja(numero)
+        self._saldos[franja][codigo] += signo * centavos
+        if codigo == "CC" and centavos < 0:
+            self._descubierto[franja] -= signo * centavos
+    
+    def _cantidades(self) -> Dict[str, int]:
+        return {codigo: len(numeros) for codigo, numeros in self._cuentas_por_tipo.items()}
+    
+    def _saldo_modificado(self, cuenta: CuentaBase, anterior: Monto, nuevo: Monto):
+        """
+        Observador de saldo: aplica la diferencia a los totales en O(1)
+        y entrega el saldo anterior a las vistas abiertas
+        """
+        for referencia in self._vistas:
+            vista = referencia()
+            if vista is not None:
+                vista._conservar(cuenta.numero, anterior)
+        codigo = self._CODIGOS_CUENTA.get(type(cuenta)) or self.codigo_cuenta(cuenta)
+        franja = self._franja(cuenta.numero)
+        nuevo, anterior = nuevo.centavos, anterior.centavos
+        self._saldos[franja][codigo] += nuevo - anterior
+        if codigo == "CC" and (nuevo < 0 or anterior < 0):
+            self._descubierto[franja] += max(0, -nuevo) - max(0, -anterior)
+    
+    def _totales_saldo(self) -> tuple:
+        """Suma los totales de todas las franjas: (saldos por tipo, descubierto)"""
+        with self._bloquear_todo():
+            return self._sumar_franjas()
+    
+    def _sumar_franjas(self) -> tuple:
+        saldos = dict.fromkeys(self.CLASES_CUENTA, 0)
+        for saldos_franja in self._saldos:
+            for codigo, centavos in saldos_franja.items():
+                saldos[codigo] += centavos
+        return saldos, sum(self._descubierto)
+    
+    def _recalcular(self) -> tuple:
+        """Reconstruye desde cero índices y totales recorriendo clientes y cuentas"""
+        por_tipo: Dict[str, set] = {codigo: set() for codigo in self.CLASES_CUENTA}
+        por_titular: Dict[str, set] = {}
+        saldos = dict.fromkeys(self.CLASES_CUENTA, 0)
+        descubierto = 0
+        for cuenta in self._cuentas.values():
+            codigo = self.codigo_cuenta(cuenta)
+            centavos = cuenta.saldo.centavos
+            por_tipo[codigo].add(cuenta.numero)
+            por_titular.setdefault(cuenta.titular.dni, set()).add(cuenta.numero)
+            saldos[codigo] += centavos
+            if codigo == "CC" and centavos < 0:
+                descubierto -= centavos
+        
+        clientes: Dict[str, set] = {}
+        for cliente in self._clientes.values():
+            clientes.setdefault(cliente.tipo, set()).add(cliente.dni)
+        return por_tipo, por_titular, saldos, descubierto, clientes
+    
+    # Vistas consistentes para informes
+    def snapshot(self) -> VistaBanco:
+        """
+        Devuelve una vista de solo lectura del banco en este instante
+        Crearla cuesta O(1): no copia clientes ni cuentas, que se copian recién si el banco
+        cambia mientras la vista sigue abierta. Se puede recorrer desde otro hilo; conviene
+        cerrarla (o usarla en un with) al terminar, para que el banco deje de mantenerla
+        """
+        if self.perezoso:
+            raise ValueError("La vista consistente requiere un banco con todas las cuentas en memoria")
+        with self._lock_estructura, self._bloquear_todo():
+            self._epoca += 1
+            clientes = {tipo: len(dnis) for tipo, dnis in self._clientes_por_tipo.items()}
+            saldos, descubierto = self._sumar_franjas()
+            vista = VistaBanco(
+                self._epoca, self._clientes, self._cuentas, self._cuentas_por_tipo,
+                self._clientes_por_tipo,
+                self.armar_resumen(self._cantidades(), saldos, descubierto, clientes)
+            )
+            # Si la vista no se cierra, se deja de mantener cuando ya nadie la usa
+            referencia = weakref.ref(vista, self._quitar_vista)
+            vista._al_cerrar = partial(self._quitar_vista, referencia)
+            with self._lock_vistas:
+                self._vistas += (referencia,)
+            return vista
+    
+    def _quitar_vista(self, referencia: weakref.ref):
+        with self._lock_vistas:
+            self._vistas = tuple(r for r in self._vistas if r is not referencia)
+    
+    def _separar_vistas(self):
+        """Antes de un alta o baja, las vistas abiertas se quedan con su copia de los datos"""
+        for referencia in self._vistas:
+            vista = referencia()
+            if vista is not None:
+                vista._separar()
+    
+    def verificar(self) -> bool:
+        """
+        Comprueba que índices y totales incrementales coincidan con un recálculo completo
+        En modo perezoso no se mantienen en memoria y siempre devuelve True
+        """
+        if self.perezoso:
+            return True
+        
+        def conjuntos(indice: Dict[str, Dict[str, None]]) -> Dict[str, set]:
+            return {clave: set(valores) for clave, valores in indice.items() if valores}
+        
+        with self._lock_estructura, self._bloquear_todo():
+            por_tipo, por_titular, saldos, descubierto, clientes = self._recalcular()
+            saldos_actuales, descubierto_actual = self._sumar_franjas()
+        return (conjuntos(self._cuentas_por_tipo) == {c: n for c, n in por_tipo.items() if n} and
+                conjuntos(self._cuentas_por_titular) == por_titular and
+                conjuntos(self._clientes_por_tipo) == clientes and
+                saldos == saldos_actuales and descubierto == descubierto_actual)
+    
+    def _marcar_sucia(self, *cuentas: CuentaBase):
+        """Mantiene en caché las cuentas modificadas hasta que se guarden"""
+        if not self.perezoso:
+            return
+        for cuenta in cuentas:
+            self._cuentas[cuenta.numero] = cuenta
+            self._cuentas_sucias.add(cuenta.numero)
     
     # Operaciones bancarias
-    def depositar(self, numero_cuenta: str, monto: float) -> bool:
-        """Realiza un depósito en una cuenta"""
-        cuenta = self.buscar_cuenta(numero_cuenta)
-        if not cuenta:
-            return False
-        return cuenta.depositar(monto)
+    def depositar(self, numero_cuenta: str, monto: float, unidad=None) -> bool:
+        """
+        Realiza un depósito en una cuenta
+        Si se indica una unidad de trabajo, registra en ella el saldo y el movimiento
+        """
+        with self._bloquear(numero_cuenta):
+            cuenta = self.buscar_cuenta(numero_cuenta)
+            if not cuenta or not cuenta.depositar(monto):
+                return False
+            self._marcar_sucia(cuenta)
+            if unidad is not None:
+                unidad.actualizar_saldo(cuenta)
+                unidad.registrar_movimiento(numero_cuenta, "DEPOSITO", monto, cuenta.saldo,
+                                            cuenta.ultimo_movimiento_us)
+            return True
     
-    def extraer(self, numero_cuenta: str, monto: float) -> bool:
-        """Realiza una extracción de una cuenta"""
-        cuenta = self.buscar_cuenta(numero_cuenta)
-        if not cuenta:
-            return False
-        return cuenta.extraer(monto)
+    def extraer(self, numero_cuenta: str, monto: float, unidad=None) -> bool:
+        """
+        Realiza una extracción de una cuenta
+        Si se indica una unidad de trabajo, registra en ella el saldo y el movimiento
+        """
+        with self._bloquear(numero_cuenta):
+            cuenta = self.buscar_cuenta(numero_cuenta)
+            if not cuenta or not cuenta.extraer(monto):
+                return False
+            self._marcar_sucia(cuenta)
+            if unidad is not None:
+                unidad.actualizar_saldo(cuenta)
+                unidad.registrar_movimiento(numero_cuenta, "EXTRACCION", -monto, cuenta.saldo,
+                                            cuenta.ultimo_movimiento_us)
+            return True
     
-    def transferir(self, nro_origen: str, nro_destino: str, monto: float) -> bool:
-        """Realiza una transferencia entre cuentas"""
+    def transferir(self, nro_origen: str, nro_destino: str, monto: float, unidad=None) -> bool:
+        """
+        Realiza una transferencia entre cuentas
+        Si se indica una unidad de trabajo, registra en ella ambos saldos y los movimientos
+        """
         cuenta_origen = self.buscar_cuenta(nro_origen)
         cuenta_destino = self.buscar_cuenta(nro_destino)
         
         if not cuenta_origen or not cuenta_destino:
             return False
         
+        with self._bloquear(nro_origen, nro_destino):
+            # En modo concurrente otra operación pudo dar de baja una cuenta antes del bloqueo
+            if self.concurrente and (self._cuentas.get(nro_origen) is not cuenta_origen or
+                                     self._cuentas.get(nro_destino) is not cuenta_destino):
+                return False
+            return self._transferir(cuenta_origen, cuenta_destino, monto, unidad)
+    
+    def _transferir(self, cuenta_origen: CuentaBase, cuenta_destino: CuentaBase,
+                    monto: float, unidad) -> bool:
+        nro_origen, nro_destino = cuenta_origen.numero, cuenta_destino.numero
+        
         # Verificar si las cuentas son de distintos titulares
-        comision = 0.0
+        comision = Monto()
         if cuenta_origen.titular.dni != cuenta_destino.titular.dni:
             comision = self._comision_transferencia
         
         # Aplicar transferencia con comisión si corresponde
-        if cuenta_origen.puede_extraer(monto + comision):
-            if comision > 0:
-                cuenta_origen.extraer(comision)
-                cuenta_origen._registrar_movimiento("COMISION TRANSFERENCIA", -comision)
-            
-            return cuenta_origen.transferir(cuenta_destino, monto)
+        if not cuenta_origen.puede_extraer(monto + comision):
+            return False
+        
+        self._marcar_sucia(cuenta_origen, cuenta_destino)
+        if comision > 0:
+            cuenta_origen._aplicar_movimiento("COMISION TRANSFERENCIA", -comision)
+            if unidad is not None:
+                unidad.registrar_movimiento(nro_origen, "COMISION TRANSFERENCIA", -comision,
+                                            cuenta_origen.saldo, cuenta_origen.ultimo_movimiento_us)
+        
+        if not cuenta_origen.transferir(cuenta_destino, monto):
+            return False
+        if unidad is not None:
+            unidad.actualizar_saldo(cuenta_origen)
+            unidad.actualizar_saldo(cuenta_destino)
+            unidad.registrar_movimiento(nro_origen, f"TRANSFERENCIA A {nro_destino}", -monto,
+                                        cuenta_origen.saldo, cuenta_origen.ultimo_movimiento_us)
+            unidad.registrar_movimiento(nro_destino, f"TRANSFERENCIA DE {nro_origen}", monto,
+                                        cuenta_destino.saldo, cuenta_destino.ultimo_movimiento_us)
+        return True
+    
+    def sincronizar_saldo(self, numero_cuenta: str, saldo: Monto, tipo_movimiento: str = None,
+                          monto: float = None, fecha_us: int = None) -> bool:
+        """
+        Reemplaza el saldo en memoria por el confirmado en la base, que es la fuente de verdad
+        cuando varios procesos la modifican. Opcionalmente registra el movimiento aplicado,
+        con la fecha con que se guardó en la base
+        """
+        with self._bloquear(numero_cuenta):
+            cuenta = self.buscar_cuenta(numero_cuenta)
+            if not cuenta:
+                return False
+            cuenta._ajustar_saldo(Monto.convertir(saldo))
+            if tipo_movimiento:
+                cuenta._registrar_movimiento(tipo_movimiento, Monto.convertir(monto), fecha_us)
+            return True
+    
+    def anular_movimientos(self, movimientos: List[tuple]):
+        """
+        Quita de memoria los movimientos de una unidad de trabajo que no se pudo confirmar
+        (tuplas de UnidadDeTrabajo.movimientos); los saldos los restaura quien la confirmaba
+        """
+        for numero, fecha_us, tipo, monto, _ in movimientos:
+            with self._bloquear(numero):
+                cuenta = self.cuenta_residente(numero)
+                if cuenta:
+                    cuenta._quitar_movimiento(fecha_us, tipo, Monto(monto))
+    
+    # Vencimientos de plazos fijos
+    def programar_vencimiento(self, numero: str, fecha_vencimiento: datetime):
+        """
+        Agenda el vencimiento de un plazo fijo que no está en memoria
+        En modo perezoso permite cargar la agenda sin cargar las cuentas
+        """
+        with self._lock_estructura:
+            self._agenda.programar(numero, fecha_vencimiento)
+    
+    def proximo_vencimiento(self) -> Optional[datetime]:
+        """Fecha del próximo plazo fijo por acreditar"""
+        with self._lock_estructura:
+            return self._agenda.proximo_vencimiento()
+    
+    def acreditar_vencidos(self, unidad=None) -> List[CuentaPlazoFijo]:
+        """
+        Acredita el interés de los plazos fijos vencidos según la agenda
+        Si se indica una unidad de trabajo, registra en ella los saldos y movimientos
+        """
+        with self._lock_estructura:
+            numeros = self._agenda.vencidas()
         
-        return False
+        acreditadas = []
+        for numero in numeros:
+            with self._bloquear(numero):
+                cuenta = self.buscar_cuenta(numero)
+                if not isinstance(cuenta, CuentaPlazoFijo) or not cuenta.interes_pendiente:
+                    continue
+                cuenta.acreditar_interes()
+                interes = cuenta.saldo - cuenta.capital_inicial
+                if not interes:
+                    continue
+                cuenta._registrar_movimiento("INTERES PLAZO FIJO", interes)
+                self._marcar_sucia(cuenta)
+                if unidad is not None:
+                    # En la base compartida otro proceso pudo acreditarlo antes
+                    unidad.actualizar_saldo(cuenta, saldo_anterior=cuenta.capital_inicial)
+                    unidad.registrar_movimiento(numero, "INTERES PLAZO FIJO", interes, cuenta.saldo,
+                                                cuenta.ultimo_movimiento_us)
+                acreditadas.append(cuenta)
+        return acreditadas
+    
+    def reagendar_vencidos(self, cuentas: List[CuentaPlazoFijo]):
+        """
+        Vuelve a agendar los plazos fijos cuya acreditación no se pudo guardar
+        Se llama después de devolver sus saldos al valor guardado: los que siguen con el
+        interés pendiente se reintentan en la próxima revisión de vencimientos
+        """
+        for cuenta in cuentas:
+            with self._bloquear(cuenta.numero):
+                if not cuenta.interes_pendiente:
+                    continue
+                cuenta.anular_interes()
+            with self._lock_estructura:
+                self._agenda.programar(cuenta.numero, cuenta.fecha_vencimiento)
+    
+    # Operaciones en lote
+    OPERACIONES_LOTE = ("DEPOSITO", "EXTRACCION", "TRANSFERENCIA")
+    
+    def _validar_operacion(self, operacion: Dict) -> tuple:
+        """
+        Valida una operación de lote sin aplicarla
+        Devuelve (tipo, cuenta, destino, monto) o lanza ValueError con el motivo
+        """
+        tipo = str(operacion.get('tipo') or '').strip().upper()
+        if tipo not in self.OPERACIONES_LOTE:
+            raise ValueError(f"Tipo de operación no válido: {tipo}")
+        
+        try:
+            monto = Monto.convertir(operacion.get('monto'))
+        except (TypeError, ValueError, ArithmeticError):
+            raise ValueError(f"Monto inválido: {operacion.get('monto')}")
+        if monto <= 0:
+            raise ValueError("El monto debe ser mayor a cero")
+        
+        cuenta = str(operacion.get('cuenta') or '').strip()
+        if not self.buscar_cuenta(cuenta):
+            raise ValueError(f"Cuenta no encontrada: {cuenta}")
+        
+        destino = None
+        if tipo == "TRANSFERENCIA":
+            destino = str(operacion.get('destino') or '').strip()
+            if destino == cuenta:
+                raise ValueError("No puede transferir a la misma cuenta")
+            if not self.buscar_cuenta(destino):
+                raise ValueError(f"Cuenta destino no encontrada: {destino}")
+        return tipo, cuenta, destino, monto
+    
+    def aplicar_lote(self, operaciones: List[Dict], unidad=None) -> List[tuple]:
+        """
+        Aplica en orden una lista de operaciones, cada una un diccionario con
+        tipo (DEPOSITO, EXTRACCION o TRANSFERENCIA), cuenta, monto y, para
+        transferencias, destino
+        
+        Todas las operaciones se validan antes de aplicar la primera; las inválidas y
+        las que no tienen fondos al momento de aplicarse se rechazan sin afectar al resto.
+        Devuelve un (exito, mensaje) por operación, en el mismo orden
+        """
+        validadas = []
+        for operacion in operaciones:
+            try:
+                validadas.append(self._validar_operacion(operacion))
+            except ValueError as e:
+                validadas.append(str(e))
+        
+        resultados = []
+        for validada in validadas:
+            if isinstance(validada, str):
+                resultados.append((False, validada))
+                continue
+            tipo, cuenta, destino, monto = validada
+            if tipo == "DEPOSITO":
+                exito = self.depositar(cuenta, monto, unidad)
+            elif tipo == "EXTRACCION":
+                exito = self.extraer(cuenta, monto, unidad)
+            else:
+                exito = self.transferir(cuenta, destino, monto, unidad)
+            resultados.append((True, "OK") if exito else (False, "Fondos insuficientes"))
+        return resultados
     
     # Métodos para informes
-    def saldo_total(self) -> float:
+    @classmethod
+    def armar_resumen(cls, cantidades: Dict[str, int], saldos: Dict[str, int],
+                      descubierto: int, clientes: Dict[str, int]) -> Dict:
+        """
+        Arma el informe general a partir de los totales por tipo
+        Cantidades y saldos (en centavos) van por código de cuenta; clientes por tipo
+        """
+        return {
+            'total_clientes': sum(clientes.values()),
+            'clientes_persona': clientes.get("persona", 0),
+            'clientes_empresa': clientes.get("empresa", 0),
+            'total_cuentas': sum(cantidades.values()),
+            'cajas_ahorro': cantidades.get("CA", 0),
+            'cuentas_corriente': cantidades.get("CC", 0),
+            'plazos_fijos': cantidades.get("PF", 0),
+            'saldo_total': Monto(sum(saldos.values())),
+            'saldo_cajas_ahorro': Monto(saldos.get("CA", 0)),
+            'saldo_cuentas_corriente': Monto(saldos.get("CC", 0)),
+            'saldo_plazos_fijos': Monto(saldos.get("PF", 0)),
+            'total_descubierto': Monto(descubierto)
+        }
+    
+    def resumen(self) -> Dict:
+        """Devuelve todos los totales del informe general"""
+        if self.perezoso:
+            return self._repositorio.resumen()
+        clientes = {tipo: len(dnis) for tipo, dnis in self._clientes_por_tipo.items()}
+        saldos, descubierto = self._totales_saldo()
+        return self.armar_resumen(self._cantidades(), saldos, descubierto, clientes)
+    
+    def contar_clientes(self, tipo: str = None) -> int:
+        """Cuenta los clientes, opcionalmente por tipo (persona, empresa)"""
+        if self.perezoso:
+            return self._repositorio.contar_clientes(tipo)
+        if tipo is None:
+            return len(self._clientes)
+        return len(self._clientes_por_tipo.get(tipo, ()))
+    
+    def contar_cuentas(self, tipo: str = None) -> int:
+        """Cuenta las cuentas, opcionalmente por tipo (CA, CC, PF)"""
+        if self.perezoso:
+            return self._repositorio.contar_cuentas(tipo)
+        if tipo is None:
+            return len(self._cuentas)
+        return len(self._cuentas_por_tipo[tipo])
+    
+    def saldo_total(self) -> Monto:
         """Calcula el saldo total de todas las cuentas"""
-        return sum(cuenta.saldo for cuenta in self._cuentas.values())
+        if self.perezoso:
+            return self._repositorio.sumar_saldos()
+        return Monto(sum(self._totales_saldo()[0].values()))
     
-    def saldo_total_cajas_ahorro(self) -> float:
+    def saldo_total_cajas_ahorro(self) -> Monto:
         """Calcula el saldo total de cajas de ahorro"""
-        return sum(caja.saldo for caja in self.obtener_cajas_ahorro())
+        if self.perezoso:
+            return self._repositorio.sumar_saldos("CA")
+        return Monto(self._totales_saldo()[0]["CA"])
     
-    def saldo_total_cuentas_corriente(self) -> float:
+    def saldo_total_cuentas_corriente(self) -> Monto:
         """Calcula el saldo total de cuentas corrientes"""
-        return sum(cc.saldo for cc in self.obtener_cuentas_corriente())
+        if self.perezoso:
+            return self._repositorio.sumar_saldos("CC")
+        return Monto(self._totales_saldo()[0]["CC"])
     
-    def saldo_total_plazo_fijo(self) -> float:
+    def saldo_total_plazo_fijo(self) -> Monto:
         """Calcula el saldo total de plazos fijos"""
-        return sum(pf.saldo for pf in self.obtener_cuentas_plazo_fijo())
+        if self.perezoso:
+            return self._repositorio.sumar_saldos("PF")
+        return Monto(self._totales_saldo()[0]["PF"])
     
-    def total_descubierto(self) -> float:
+    def total_descubierto(self) -> Monto:
         """Calcula el total en descubierto"""
-        return sum(cc.descubierto_utilizado for cc in self.obtener_cuentas_corriente())
+        if self.perezoso:
+            return self._repositorio.total_descubierto()
+        return Monto(self._totales_saldo()[1])
     
     # Parámetros configurables
     @property
-    def comision_transferencia(self) -> float:
+    def comision_transferencia(self) -> Monto:
         return self._comision_transferencia
     
     @comision_transferencia.setter
     def comision_transferencia(self, valor: float):
-        self._comision_transferencia = valor
+        self._comision_transferencia = Monto.convertir(valor)
     
     @property
     def tasa_interes_pf(self) -> float:
@@ -164,9 +879,9 @@ class Banco:
         self._tasa_interes_pf = valor
     
     @property
-    def costo_mantenimiento_cc(self) -> float:
+    def costo_mantenimiento_cc(self) -> Monto:
         return self._costo_mantenimiento_cc
     
     @costo_mantenimiento_cc.setter
     def costo_mantenimiento_cc(self, valor: float):
-        self._costo_mantenimiento_cc = valor
\ No newline at end of file
+        self._costo_mantenimiento_cc = Monto.convertir(valor)
\ No newline at end of file
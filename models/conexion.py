@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+from typing import Iterator, List
+
+class GestorConexiones:
+    """
+    Administra conexiones SQLite de larga duración
+    Mantiene una única conexión de escritura y un pool de conexiones de lectura
+    """
+
+    def __init__(self, db_path: str, tamano_pool: int = 4, synchronous: str = "NORMAL",
+                 cache_size: int = -16000, mmap_size: int = 256 * 1024 * 1024,
+                 cached_statements: int = 256, timeout: float = 5.0):
+        self.db_path = db_path
+        self._synchronous = synchronous
+        self._cache_size = cache_size
+        self._mmap_size = mmap_size
+        self._cached_statements = cached_statements
+        self._timeout = timeout
+
+        # Una base en memoria solo es visible desde su propia conexión
+        self._en_memoria = db_path == ":memory:" or db_path.startswith("file::memory:")
+
+        self._lock_escritura = threading.RLock()
+        self._profundidad_transaccion = 0
+        self._escritura = self._conectar()
+        self._escritura.execute('PRAGMA journal_mode=WAL')
+
+        self._tamano_pool = 0 if self._en_memoria else tamano_pool
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._lecturas: List[sqlite3.Connection] = []
+        self._lock_pool = threading.Lock()
+        self._cerrado = False
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Abre una conexión configurada con los pragmas de rendimiento"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self._timeout,
+            check_same_thread=False,
+            cached_statements=self._cached_statements,
+            isolation_level=None
+        )
+        conn.execute(f'PRAGMA synchronous={self._synchronous}')
+        conn.execute(f'PRAGMA cache_size={int(self._cache_size)}')
+        conn.execute(f'PRAGMA mmap_size={int(self._mmap_size)}')
+        conn.execute('PRAGMA foreign_keys=OFF')
+        return conn
+
+    @contextmanager
+    def escritura(self) -> Iterator[sqlite3.Connection]:
+        """Entrega la conexión de escritura con acceso exclusivo entre hilos"""
+        with self._lock_escritura:
+            yield self._escritura
+
+    @contextmanager
+    def transaccion(self, modo: str = "DEFERRED") -> Iterator[sqlite3.Connection]:
+        """
+        Ejecuta un bloque dentro de una transacción sobre la conexión de escritura
+        Las transacciones anidadas se integran a la transacción exterior
+        """
+        with self._lock_escritura:
+            if self._profundidad_transaccion > 0:
+                self._profundidad_transaccion += 1
+                try:
+                    yield self._escritura
+                finally:
+                    self._profundidad_transaccion -= 1
+                return
+
+            self._escritura.execute(f'BEGIN {modo}')
+            self._profundidad_transaccion = 1
+            try:
+                yield self._escritura
+            except BaseException:
+                self._profundidad_transaccion = 0
+                self._escritura.rollback()
+                raise
+            else:
+                try:
+                    self._escritura.commit()
+                except BaseException:
+                    # Un COMMIT fallido (base ocupada, disco) deja la transacción abierta
+                    if self._escritura.in_transaction:
+                        self._escritura.rollback()
+                    raise
+                finally:
+                    self._profundidad_transaccion = 0
+
+    @contextmanager
+    def lectura(self) -> Iterator[sqlite3.Connection]:
+        """Entrega una conexión de lectura del pool, creándola si hace falta"""
+        if self._tamano_pool == 0:
+            with self._lock_escritura:
+                yield self._escritura
+            return
+
+        conn = self._tomar_lectura()
+        try:
+            yield conn
+        finally:
+            if self._cerrado:
+                conn.close()
+            else:
+                self._pool.put(conn)
+
+    def _tomar_lectura(self) -> sqlite3.Connection:
+        """Obtiene una conexión libre o abre una nueva si el pool no está completo"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock_pool:
+            if len(self._lecturas) < self._tamano_pool:
+                conn = self._conectar()
+                self._lecturas.append(conn)
+                return conn
+
+        try:
+            return self._pool.get(timeout=self._timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("No hay conexiones de lectura libres") from None
+
+    def cerrar(self):
+        """Cierra todas las conexiones abiertas"""
+        self._cerrado = True
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock_escritura:
+            self._escritura.close()
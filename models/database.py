@@ -1,19 +1,218 @@
 import sqlite3
+import time
 from datetime import datetime
-from typing import List, Dict, Any
-from .entidades import Cliente, ClientePersona, ClienteEmpresa, CuentaBase, CajaAhorro, CuentaCorriente, CuentaPlazoFijo
+from typing import List, Dict, Optional, Iterator, Tuple, Callable
+from .entidades import (Cliente, ClientePersona, ClienteEmpresa, CuentaBase, CajaAhorro, 
+                        CuentaCorriente, CuentaPlazoFijo, Movimiento)
 from .banco import Banco
+from .monto import Monto
+from .tiempo import a_epoch_us, desde_epoch_us
+from .conexion import GestorConexiones
+from .migraciones import aplicar_migraciones, restaurar_indices
+from .escritura_diferida import ColaEscritura
+
+class UnidadDeTrabajo:
+    """
+    Acumula las escrituras de una operación de negocio
+    para que DatabaseManager.confirmar las aplique en una sola transacción
+    """
+    
+    def __init__(self):
+        self._cuentas: Dict[str, CuentaBase] = {}
+        self._saldos: Dict[str, tuple] = {}
+        # Saldo que debe tener la cuenta en la base para aplicar el cambio (base compartida)
+        self._saldos_esperados: Dict[str, int] = {}
+        self._movimientos: List[tuple] = []
+        # Saldos resultantes en la base, que confirmar completa en el modo de saldos condicionales
+        self.saldos_confirmados: Dict[str, Monto] = {}
+    
+    def guardar_cuenta(self, cuenta: CuentaBase):
+        """Registra el alta o modificación completa de una cuenta"""
+        self._saldos.pop(cuenta.numero, None)
+        self._cuentas[cuenta.numero] = cuenta
+    
+    def actualizar_saldo(self, cuenta: CuentaBase, saldo_anterior: float = None):
+        """
+        Registra el saldo actual de una cuenta
+        Con saldo_anterior, en la base compartida el cambio solo se aplica si el saldo
+        guardado sigue siendo ese; si no, se rechaza toda la unidad
+        """
+        if cuenta.numero not in self._cuentas:
+            self._saldos[cuenta.numero] = (cuenta.saldo.centavos, cuenta.numero)
+            if saldo_anterior is not None:
+                self._saldos_esperados[cuenta.numero] = Monto.convertir(saldo_anterior).centavos
+    
+    def saldo_esperado(self, numero_cuenta: str) -> Optional[int]:
+        """Saldo en centavos que la cuenta debe tener guardado, si se indicó"""
+        return self._saldos_esperados.get(numero_cuenta)
+    
+    def registrar_movimiento(self, numero_cuenta: str, tipo: str, monto: float, saldo_final: float,
+                             fecha_us: int = None):
+        """
+        Registra un movimiento a insertar
+        fecha_us es la fecha con que se registró en memoria, para guardarlo con la misma
+        """
+        if fecha_us is None:
+            fecha_us = a_epoch_us(datetime.now())
+        self._movimientos.append(
+            (numero_cuenta, fecha_us, tipo,
+             Monto.convertir(monto).centavos, Monto.convertir(saldo_final).centavos)
+        )
+    
+    @property
+    def cuentas(self) -> List[CuentaBase]:
+        return list(self._cuentas.values())
+    
+    @property
+    def saldos(self) -> List[tuple]:
+        return list(self._saldos.values())
+    
+    @property
+    def movimientos(self) -> List[tuple]:
+        return self._movimientos
+    
+    @property
+    def numeros_cuentas(self) -> List[str]:
+        """Números de todas las cuentas cuyo estado se guarda en la unidad"""
+        return list(self._cuentas) + list(self._saldos)
+    
+    @property
+    def vacia(self) -> bool:
+        return not (self._cuentas or self._saldos or self._movimientos)
+    
+    def variaciones_saldo(self) -> Dict[str, int]:
+        """
+        Variación en centavos del saldo de cada cuenta con saldo actualizado,
+        sumando los movimientos que la unidad registró para ella
+        """
+        variaciones = dict.fromkeys(self._saldos, 0)
+        for numero, _, _, monto, _ in self._movimientos:
+            if numero in variaciones:
+                variaciones[numero] += monto
+        return variaciones
+    
+    def movimientos_desde_saldos(self, saldos: Dict[str, int]) -> List[tuple]:
+        """
+        Movimientos con el saldo final recalculado hacia atrás desde el saldo
+        resultante de cada cuenta, en lugar del saldo que tenía la memoria
+        """
+        pendientes = self.variaciones_saldo()
+        movimientos = []
+        for numero, fecha, tipo, monto, saldo_final in self._movimientos:
+            if numero in saldos:
+                pendientes[numero] -= monto
+                saldo_final = saldos[numero] - pendientes[numero]
+            movimientos.append((numero, fecha, tipo, monto, saldo_final))
+        return movimientos
+
+class _OperacionRechazada(Exception):
+    """Deshace una transacción de saldos cuando una de sus condiciones no se cumple"""
+
+def _base_bloqueada(error: sqlite3.OperationalError) -> bool:
+    mensaje = str(error).lower()
+    return 'locked' in mensaje or 'busy' in mensaje
 
 class DatabaseManager:
     """Gestor de base de datos SQLite para el sistema bancario"""
     
-    def __init__(self, db_path: str = "sistema_bancario.db"):
+    # Modos de durabilidad para movimientos y saldos
+    DURABILIDAD_POR_OPERACION = "por_operacion"
+    DURABILIDAD_GRUPO = "grupo"
+    
+    # Modos de escritura de saldos: absolutos desde memoria o condicionales en SQL
+    SALDOS_ABSOLUTOS = "absolutos"
+    SALDOS_CONDICIONALES = "condicionales"
+    
+    def __init__(self, db_path: str = "sistema_bancario.db", 
+                 durabilidad: str = DURABILIDAD_POR_OPERACION,
+                 tamano_lote: int = 500, intervalo_lote: float = 0.05,
+                 capacidad_cola: int = 10000, saldos: str = SALDOS_ABSOLUTOS,
+                 reintentos: int = 5, espera_reintento: float = 0.05, **opciones_conexion):
+        if saldos not in (self.SALDOS_ABSOLUTOS, self.SALDOS_CONDICIONALES):
+            raise ValueError(f"Modo de saldos desconocido: {saldos}")
+        self._modo_saldos = saldos
+        self._reintentos = reintentos
+        self._espera_reintento = espera_reintento
         self.db_path = db_path
+        self._conexiones = GestorConexiones(db_path, **opciones_conexion)
+        self._observadores_guardado: List[Callable[..., None]] = []
+        self._observadores_error: List[Callable[[Exception], None]] = []
         self._init_database()
+        
+        # En modo grupo los movimientos y saldos se confirman en lotes desde un hilo de fondo
+        self._cola: Optional[ColaEscritura] = None
+        if durabilidad == self.DURABILIDAD_GRUPO:
+            self._cola = ColaEscritura(self._conexiones, tamano_lote, intervalo_lote, capacidad_cola,
+                                       al_confirmar=self._notificar_guardado,
+                                       al_fallar=self._notificar_error)
+        elif durabilidad != self.DURABILIDAD_POR_OPERACION:
+            raise ValueError(f"Modo de durabilidad desconocido: {durabilidad}")
+    
+    @property
+    def conexiones(self) -> GestorConexiones:
+        """Gestor de conexiones compartido con el resto de la aplicación"""
+        return self._conexiones
+    
+    def suscribir_guardado(self, observador: Callable[..., None]):
+        """Registra una función que recibe los números de las cuentas guardadas"""
+        self._observadores_guardado.append(observador)
+    
+    def _notificar_guardado(self, *numeros: str):
+        for observador in self._observadores_guardado:
+            observador(*numeros)
+    
+    def suscribir_error_escritura(self, observador: Callable[[Exception], None]):
+        """
+        Registra una función que recibe el error cuando falla una escritura diferida
+        Se llama desde el hilo escritor; las escrituras fallidas se siguen reintentando
+        """
+        self._observadores_error.append(observador)
+    
+    def _notificar_error(self, error: Exception):
+        for observador in self._observadores_error:
+            observador(error)
+    
+    @property
+    def durabilidad(self) -> str:
+        return self.DURABILIDAD_GRUPO if self._cola else self.DURABILIDAD_POR_OPERACION
+    
+    @property
+    def saldos_condicionales(self) -> bool:
+        """Indica si los saldos se modifican con actualizaciones condicionales en SQL"""
+        return self._modo_saldos == self.SALDOS_CONDICIONALES
+    
+    def flush(self, espera: Optional[float] = None) -> bool:
+        """
+        Espera a que se confirmen las escrituras diferidas pendientes
+        Devuelve False si alguna quedó sin confirmar
+        """
+        if self._cola:
+            return self._cola.flush(espera)
+        return True
+    
+    def esperar_escrituras(self):
+        """
+        Espera las escrituras diferidas antes de escribir directamente en la base
+        Lanza sqlite3.OperationalError si alguna quedó sin confirmar: su reintento
+        posterior pisaría los saldos que se escriban ahora con los anteriores
+        """
+        if not self.flush():
+            raise sqlite3.OperationalError("Hay escrituras diferidas sin confirmar")
+    
+    def cerrar(self, espera: Optional[float] = None) -> bool:
+        """
+        Confirma las escrituras pendientes y cierra las conexiones
+        Devuelve False si alguna escritura diferida no se pudo confirmar
+        """
+        resultado = True
+        if self._cola:
+            resultado = self._cola.cerrar(espera)
+        self._conexiones.cerrar()
+        return resultado
     
     def _init_database(self):
         """Inicializa la base de datos con las tablas necesarias"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conexiones.transaccion() as conn:
             cursor = conn.cursor()
             
             # Tabla de clientes
@@ -55,137 +254,259 @@ class DatabaseManager:
                 )
             ''')
             
-            conn.commit()
+            # Índices y cambios de esquema versionados
+            aplicar_migraciones(conn)
+            # Índices que una importación interrumpida pudo dejar eliminados
+            restaurar_indices(conn)
+    
+    def plan_consulta(self, query: str, params=()) -> List[str]:
+        """Devuelve el detalle de EXPLAIN QUERY PLAN para una consulta"""
+        with self._conexiones.lectura() as conn:
+            cursor = conn.execute('EXPLAIN QUERY PLAN ' + query, params)
+            return [row[3] for row in cursor.fetchall()]
     
     # Métodos para clientes
     def guardar_cliente(self, cliente: Cliente) -> bool:
         """Guarda un cliente en la base de datos"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexiones.transaccion() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     'INSERT OR REPLACE INTO clientes (dni, nombre, tipo) VALUES (?, ?, ?)',
                     (cliente.dni, cliente.nombre, cliente.tipo)
                 )
-                conn.commit()
                 return True
         except sqlite3.Error:
             return False
     
+    def cliente_desde_fila(self, dni: str, nombre: str, tipo: str) -> Cliente:
+        """Crea el cliente que corresponde a una fila de la tabla clientes"""
+        if tipo == "persona":
+            return ClientePersona(dni, nombre)
+        return ClienteEmpresa(dni, nombre)
+    
+    def insertar_clientes(self, conn: sqlite3.Connection, filas: List[tuple]):
+        """
+        Inserta filas (dni, nombre, tipo) en la transacción en curso de conn
+        Para cargas masivas: no pasa por la cola diferida ni avisa a los observadores
+        """
+        conn.executemany('INSERT INTO clientes (dni, nombre, tipo) VALUES (?, ?, ?)', filas)
+    
     def cargar_clientes(self) -> List[Cliente]:
         """Carga todos los clientes de la base de datos"""
         clientes = []
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexiones.lectura() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT dni, nombre, tipo FROM clientes')
                 for row in cursor.fetchall():
-                    dni, nombre, tipo = row
-                    if tipo == "persona":
-                        clientes.append(ClientePersona(dni, nombre))
-                    else:
-                        clientes.append(ClienteEmpresa(dni, nombre))
+                    clientes.append(self.cliente_desde_fila(*row))
         except sqlite3.Error:
             pass
         return clientes
     
+    def cargar_cliente(self, dni: str) -> Optional[Cliente]:
+        """Carga un cliente por DNI"""
+        try:
+            with self._conexiones.lectura() as conn:
+                row = conn.execute('SELECT dni, nombre, tipo FROM clientes WHERE dni = ?', 
+                                   (dni,)).fetchone()
+                return self.cliente_desde_fila(*row) if row else None
+        except sqlite3.Error:
+            return None
+    
+    def dnis_clientes(self, tipo: str = None) -> List[str]:
+        """Obtiene los DNI de los clientes, opcionalmente filtrados por tipo"""
+        query = 'SELECT dni FROM clientes'
+        params = []
+        if tipo:
+            query += ' WHERE tipo = ?'
+            params.append(tipo)
+        try:
+            with self._conexiones.lectura() as conn:
+                return [row[0] for row in conn.execute(query, params)]
+        except sqlite3.Error:
+            return []
+    
+    def contar_clientes(self, tipo: str = None) -> int:
+        """Cuenta los clientes, opcionalmente filtrados por tipo"""
+        query = 'SELECT COUNT(*) FROM clientes'
+        params = []
+        if tipo:
+            query += ' WHERE tipo = ?'
+            params.append(tipo)
+        try:
+            with self._conexiones.lectura() as conn:
+                return conn.execute(query, params).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+    
     def eliminar_cliente(self, dni: str) -> bool:
         """Elimina un cliente de la base de datos"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexiones.transaccion() as conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM clientes WHERE dni = ?', (dni,))
-                conn.commit()
                 return cursor.rowcount > 0
         except sqlite3.Error:
             return False
     
     # Métodos para cuentas
+    _SQL_GUARDAR_CUENTA = '''
+        INSERT OR REPLACE INTO cuentas 
+        (numero, dni_titular, tipo, saldo, limite_descubierto, costo_mantenimiento, 
+         capital_inicial, tasa_interes, fecha_creacion_us, fecha_vencimiento_us)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    # Con saldos condicionales el alta no pisa el saldo que otro proceso ya haya modificado
+    _SQL_GUARDAR_CUENTA_CONSERVANDO_SALDO = '''
+        INSERT INTO cuentas 
+        (numero, dni_titular, tipo, saldo, limite_descubierto, costo_mantenimiento, 
+         capital_inicial, tasa_interes, fecha_creacion_us, fecha_vencimiento_us)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (numero) DO UPDATE SET
+            dni_titular = excluded.dni_titular, tipo = excluded.tipo,
+            limite_descubierto = excluded.limite_descubierto,
+            costo_mantenimiento = excluded.costo_mantenimiento,
+            capital_inicial = excluded.capital_inicial, tasa_interes = excluded.tasa_interes,
+            fecha_creacion_us = excluded.fecha_creacion_us,
+            fecha_vencimiento_us = excluded.fecha_vencimiento_us
+    '''
+    
+    @property
+    def _sql_guardar_cuenta(self) -> str:
+        if self.saldos_condicionales:
+            return self._SQL_GUARDAR_CUENTA_CONSERVANDO_SALDO
+        return self._SQL_GUARDAR_CUENTA
+    
+    _SQL_GUARDAR_MOVIMIENTO = '''
+        INSERT INTO movimientos (numero_cuenta, fecha_us, tipo, monto, saldo_final)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+    
+    def _fila_cuenta(self, cuenta: CuentaBase) -> tuple:
+        """Convierte una cuenta en la fila a guardar en la tabla cuentas"""
+        # Determinar tipo de cuenta y parámetros específicos
+        tipo_cuenta = ""
+        limite_descubierto = None
+        costo_mantenimiento = None
+        capital_inicial = None
+        tasa_interes = None
+        fecha_creacion = None
+        fecha_vencimiento = None
+        
+        if isinstance(cuenta, CajaAhorro):
+            tipo_cuenta = "CA"
+        elif isinstance(cuenta, CuentaCorriente):
+            tipo_cuenta = "CC"
+            limite_descubierto = cuenta.limite_descubierto.centavos
+            # Se guarda el costo base: el descuento por titular se aplica al calcularlo
+            costo_mantenimiento = cuenta.costo_mantenimiento_base.centavos
+        elif isinstance(cuenta, CuentaPlazoFijo):
+            tipo_cuenta = "PF"
+            capital_inicial = cuenta.capital_inicial.centavos
+            tasa_interes = cuenta.tasa_interes
+            fecha_creacion = a_epoch_us(cuenta.fecha_creacion)
+            fecha_vencimiento = a_epoch_us(cuenta.fecha_vencimiento)
+        
+        return (
+            cuenta.numero, cuenta.titular.dni, tipo_cuenta, cuenta.saldo.centavos,
+            limite_descubierto, costo_mantenimiento, capital_inicial,
+            tasa_interes, fecha_creacion, fecha_vencimiento
+        )
+    
+    def insertar_cuentas(self, conn: sqlite3.Connection, filas: List[tuple]):
+        """
+        Inserta filas completas de la tabla cuentas, con importes en centavos y fechas en
+        microsegundos, en la transacción en curso de conn
+        Para cargas masivas: no avisa a los observadores
+        """
+        conn.executemany(self._SQL_GUARDAR_CUENTA, filas)
+    
+    def insertar_movimientos(self, conn: sqlite3.Connection, filas: List[tuple]):
+        """
+        Inserta filas (numero_cuenta, fecha_us, tipo, monto, saldo_final) en la
+        transacción en curso de conn. Para cargas masivas: no pasa por la cola diferida
+        """
+        conn.executemany(self._SQL_GUARDAR_MOVIMIENTO, filas)
+    
     def guardar_cuenta(self, cuenta: CuentaBase) -> bool:
         """Guarda una cuenta en la base de datos"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            self.esperar_escrituras()
+            with self._conexiones.transaccion() as conn:
                 cursor = conn.cursor()
-                
-                # Determinar tipo de cuenta y parámetros específicos
-                tipo_cuenta = ""
-                limite_descubierto = None
-                costo_mantenimiento = None
-                capital_inicial = None
-                tasa_interes = None
-                fecha_creacion = None
-                fecha_vencimiento = None
-                
-                if isinstance(cuenta, CajaAhorro):
-                    tipo_cuenta = "CA"
-                elif isinstance(cuenta, CuentaCorriente):
-                    tipo_cuenta = "CC"
-                    limite_descubierto = cuenta.limite_descubierto
-                    costo_mantenimiento = cuenta.costo_mantenimiento()
-                elif isinstance(cuenta, CuentaPlazoFijo):
-                    tipo_cuenta = "PF"
-                    capital_inicial = cuenta.capital_inicial
-                    tasa_interes = cuenta.tasa_interes
-                    fecha_creacion = cuenta.fecha_creacion.isoformat()
-                    fecha_vencimiento = cuenta.fecha_vencimiento.isoformat()
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO cuentas 
-                    (numero, dni_titular, tipo, saldo, limite_descubierto, costo_mantenimiento, 
-                     capital_inicial, tasa_interes, fecha_creacion, fecha_vencimiento)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    cuenta.numero, cuenta.titular.dni, tipo_cuenta, cuenta.saldo,
-                    limite_descubierto, costo_mantenimiento, capital_inicial,
-                    tasa_interes, fecha_creacion, fecha_vencimiento
-                ))
-                
-                conn.commit()
-                return True
+                cursor.execute(self._sql_guardar_cuenta, self._fila_cuenta(cuenta))
         except sqlite3.Error:
             return False
+        self._notificar_guardado(cuenta.numero)
+        return True
+    
+    _SQL_SELECT_CUENTAS = '''
+        SELECT numero, dni_titular, tipo, saldo, limite_descubierto,
+               costo_mantenimiento, capital_inicial, tasa_interes,
+               fecha_creacion_us, fecha_vencimiento_us
+        FROM cuentas
+    '''
+    
+    def cuenta_desde_fila(self, fila: tuple, cliente: Cliente) -> CuentaBase:
+        """Crea la cuenta que corresponde a una fila de la tabla cuentas"""
+        (numero, dni_titular, tipo_cuenta, saldo, limite_descubierto,
+         costo_mantenimiento, capital_inicial, tasa_interes,
+         fecha_creacion, fecha_vencimiento) = fila
+        
+        # Los importes se guardan en centavos
+        saldo = Monto(saldo)
+        
+        # Crear cuenta según tipo
+        if tipo_cuenta == "CA":
+            cuenta = CajaAhorro(numero, cliente, saldo)
+        elif tipo_cuenta == "CC":
+            cuenta = CuentaCorriente(numero, cliente, 
+                                   Monto(limite_descubierto) if limite_descubierto else 1000.0, 
+                                   Monto(costo_mantenimiento) if costo_mantenimiento else 50.0, 
+                                   saldo)
+        else:
+            fecha_creacion_dt = desde_epoch_us(fecha_creacion)
+            fecha_vencimiento_dt = desde_epoch_us(fecha_vencimiento)
+            # Calcular días de plazo
+            plazo_dias = (fecha_vencimiento_dt - fecha_creacion_dt).days
+            cuenta = CuentaPlazoFijo(numero, cliente, 
+                                   Monto(capital_inicial) if capital_inicial else saldo,
+                                   tasa_interes or 0.10, plazo_dias)
+            cuenta._fecha_creacion = fecha_creacion_dt
+            cuenta._fecha_vencimiento = fecha_vencimiento_dt
+            # El saldo guardado incluye el interés si ya se acreditó
+            cuenta._saldo = saldo
+        return cuenta
     
     def cargar_cuentas(self, banco: Banco) -> List[CuentaBase]: 
         """Carga todas las cuentas de la base de datos"""
         cuentas = []
+        self.flush()
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexiones.lectura() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT c.numero, c.dni_titular, c.tipo, c.saldo, c.limite_descubierto,
                            c.costo_mantenimiento, c.capital_inicial, c.tasa_interes,
-                           c.fecha_creacion, c.fecha_vencimiento, cl.nombre, cl.tipo as cliente_tipo
+                           c.fecha_creacion_us, c.fecha_vencimiento_us, cl.nombre, cl.tipo as cliente_tipo
                     FROM cuentas c
                     JOIN clientes cl ON c.dni_titular = cl.dni
                 ''')
                 
                 for row in cursor.fetchall():
-                    (numero, dni_titular, tipo_cuenta, saldo, limite_descubierto,
-                     costo_mantenimiento, capital_inicial, tasa_interes,
-                     fecha_creacion, fecha_vencimiento, nombre_cliente, tipo_cliente) = row
-                    
-                    # Crear cliente
-                    if tipo_cliente == "persona":
-                        cliente = ClientePersona(dni_titular, nombre_cliente)
-                    else:
-                        cliente = ClienteEmpresa(dni_titular, nombre_cliente)
+                    dni_titular, nombre_cliente, tipo_cliente = row[1], row[10], row[11]
                     
-                    # Crear cuenta según tipo
-                    if tipo_cuenta == "CA":
-                        cuenta = CajaAhorro(numero, cliente, saldo)
-                    elif tipo_cuenta == "CC":
-                        cuenta = CuentaCorriente(numero, cliente, limite_descubierto or 1000.0, 
-                                               costo_mantenimiento or 50.0, saldo)
-                    elif tipo_cuenta == "PF":
-                        fecha_creacion_dt = datetime.fromisoformat(fecha_creacion)
-                        fecha_vencimiento_dt = datetime.fromisoformat(fecha_vencimiento)
-                        # Calcular días de plazo
-                        plazo_dias = (fecha_vencimiento_dt - fecha_creacion_dt).days
-                        cuenta = CuentaPlazoFijo(numero, cliente, capital_inicial or saldo,
-                                               tasa_interes or 0.10, plazo_dias)
-                        cuenta._fecha_creacion = fecha_creacion_dt
-                        cuenta._fecha_vencimiento = fecha_vencimiento_dt
+                    # Reutilizar el cliente ya cargado para que cada DNI sea una única instancia
+                    cliente = banco.cliente_residente(dni_titular)
+                    if not cliente:
+                        cliente = banco.internar_cliente(
+                            self.cliente_desde_fila(dni_titular, nombre_cliente, tipo_cliente)
+                        )
                     
+                    cuenta = self.cuenta_desde_fila(row[:10], cliente)
                     cuentas.append(cuenta)
                     banco.alta_cuenta(cuenta)
                     
@@ -194,72 +515,611 @@ class DatabaseManager:
         
         return cuentas
     
+    def cargar_cuenta(self, numero: str, banco: Banco) -> Optional[CuentaBase]:
+        """
+        Carga una cuenta por número
+        El titular se obtiene del banco para no duplicar clientes ya cargados
+        """
+        self.flush()
+        try:
+            with self._conexiones.lectura() as conn:
+                fila = conn.execute(self._SQL_SELECT_CUENTAS + ' WHERE numero = ?', 
+                                    (numero,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if not fila:
+            return None
+        cliente = banco.buscar_cliente(fila[1])
+        if not cliente:
+            return None
+        return self.cuenta_desde_fila(fila, cliente)
+    
+    def numeros_cuentas(self, dni_titular: str = None, tipo: str = None) -> List[str]:
+        """Obtiene los números de cuenta filtrados por titular y/o tipo (CA, CC, PF)"""
+        self.flush()
+        query = 'SELECT numero FROM cuentas WHERE 1=1'
+        params = []
+        if dni_titular:
+            query += ' AND dni_titular = ?'
+            params.append(dni_titular)
+        if tipo:
+            query += ' AND tipo = ?'
+            params.append(tipo)
+        try:
+            with self._conexiones.lectura() as conn:
+                return [row[0] for row in conn.execute(query, params)]
+        except sqlite3.Error:
+            return []
+    
+    def contar_cuentas(self, tipo: str = None) -> int:
+        """Cuenta las cuentas, opcionalmente filtradas por tipo (CA, CC, PF)"""
+        self.flush()
+        query = 'SELECT COUNT(*) FROM cuentas'
+        params = []
+        if tipo:
+            query += ' WHERE tipo = ?'
+            params.append(tipo)
+        try:
+            with self._conexiones.lectura() as conn:
+                return conn.execute(query, params).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+    
+    def sumar_saldos(self, tipo: str = None) -> Monto:
+        """Suma los saldos en SQL, opcionalmente filtrados por tipo (CA, CC, PF)"""
+        self.flush()
+        query = 'SELECT COALESCE(SUM(saldo), 0) FROM cuentas'
+        params = []
+        if tipo:
+            query += ' WHERE tipo = ?'
+            params.append(tipo)
+        try:
+            with self._conexiones.lectura() as conn:
+                return Monto(conn.execute(query, params).fetchone()[0])
+        except sqlite3.Error:
+            return Monto()
+    
+    def total_descubierto(self) -> Monto:
+        """Suma en SQL el descubierto utilizado por las cuentas corrientes"""
+        self.flush()
+        try:
+            with self._conexiones.lectura() as conn:
+                row = conn.execute(
+                    "SELECT COALESCE(SUM(-saldo), 0) FROM cuentas WHERE tipo = 'CC' AND saldo < 0"
+                ).fetchone()
+                return Monto(row[0])
+        except sqlite3.Error:
+            return Monto()
+    
+    def resumen(self) -> Dict:
+        """
+        Calcula los totales del informe general con una única consulta agrupada
+        Devuelve el mismo diccionario que Banco.resumen
+        """
+        self.flush()
+        cantidades: Dict[str, int] = {}
+        saldos: Dict[str, int] = {}
+        clientes: Dict[str, int] = {}
+        descubierto = 0
+        try:
+            with self._conexiones.lectura() as conn:
+                cursor = conn.execute('''
+                    SELECT 'cuentas', tipo, COUNT(*), COALESCE(SUM(saldo), 0),
+                           COALESCE(SUM(CASE WHEN tipo = 'CC' AND saldo < 0 THEN -saldo END), 0)
+                    FROM cuentas GROUP BY tipo
+                    UNION ALL
+                    SELECT 'clientes', tipo, COUNT(*), 0, 0
+                    FROM clientes GROUP BY tipo
+                ''')
+                for tabla, tipo, cantidad, saldo, descubierto_tipo in cursor:
+                    if tabla == 'clientes':
+                        clientes[tipo] = cantidad
+                    else:
+                        cantidades[tipo] = cantidad
+                        saldos[tipo] = saldo
+                        descubierto += descubierto_tipo
+        except sqlite3.Error:
+            pass
+        return Banco.armar_resumen(cantidades, saldos, descubierto, clientes)
+    
+    def vencimientos_pendientes(self) -> List[Tuple[str, datetime]]:
+        """Número y vencimiento de los plazos fijos a los que aún no se acreditó el interés"""
+        self.flush()
+        try:
+            with self._conexiones.lectura() as conn:
+                cursor = conn.execute(
+                    "SELECT numero, fecha_vencimiento_us FROM cuentas "
+                    "WHERE tipo = 'PF' AND saldo = capital_inicial"
+                )
+                return [(numero, desde_epoch_us(fecha)) for numero, fecha in cursor]
+        except sqlite3.Error:
+            return []
+    
     def eliminar_cuenta(self, numero: str) -> bool:
         """Elimina una cuenta de la base de datos"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            self.esperar_escrituras()
+            with self._conexiones.transaccion() as conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM cuentas WHERE numero = ?', (numero,))
-                conn.commit()
                 return cursor.rowcount > 0
         except sqlite3.Error:
             return False
     
+    def actualizar_saldo(self, cuenta: CuentaBase) -> bool:
+        """Actualiza solo el saldo de una cuenta ya guardada"""
+        if self._cola:
+            # La cola avisa que la cuenta quedó guardada recién después de confirmarla
+            self._cola.encolar_saldo(cuenta.numero, cuenta.saldo.centavos)
+            return True
+        try:
+            with self._conexiones.transaccion() as conn:
+                cursor = conn.cursor()
+                cursor.execute('UPDATE cuentas SET saldo = ? WHERE numero = ?',
+                               (cuenta.saldo.centavos, cuenta.numero))
+                if cursor.rowcount == 0:
+                    return False
+        except sqlite3.Error:
+            return False
+        self._notificar_guardado(cuenta.numero)
+        return True
+    
+    # Actualizaciones condicionales de saldo
+    # El control de fondos y la escritura son una única sentencia, así que varios procesos
+    # pueden compartir la base sin carreras de leer-modificar-escribir
+    _SQL_DEBITAR = '''
+        UPDATE cuentas SET saldo = saldo - :monto
+        WHERE numero = :numero
+          AND saldo + COALESCE(limite_descubierto, 0) >= :monto
+          AND (tipo != 'PF' OR fecha_vencimiento_us <= :ahora)
+        RETURNING saldo
+    '''
+    
+    _SQL_ACREDITAR = 'UPDATE cuentas SET saldo = saldo + ? WHERE numero = ? RETURNING saldo'
+    
+    _SQL_AJUSTAR_SI_SALDO = '''
+        UPDATE cuentas SET saldo = saldo + ? WHERE numero = ? AND saldo = ? RETURNING saldo
+    '''
+    
+    def _con_reintentos(self, operacion: Callable[[sqlite3.Connection], object]):
+        """
+        Ejecuta la operación en una transacción BEGIN IMMEDIATE
+        Si otro proceso mantiene la base bloqueada más allá del busy timeout de la conexión,
+        reintenta una cantidad acotada de veces con espera exponencial
+        """
+        self.esperar_escrituras()
+        for intento in range(self._reintentos + 1):
+            try:
+                with self._conexiones.transaccion("IMMEDIATE") as conn:
+                    return operacion(conn)
+            except sqlite3.OperationalError as e:
+                if intento == self._reintentos or not _base_bloqueada(e):
+                    raise
+            time.sleep(self._espera_reintento * (2 ** intento))
+    
+    def _debitar(self, conn: sqlite3.Connection, numero: str, centavos: int) -> Optional[int]:
+        fila = conn.execute(self._SQL_DEBITAR, {
+            'monto': centavos, 'numero': numero, 'ahora': a_epoch_us(datetime.now())
+        }).fetchone()
+        return fila[0] if fila else None
+    
+    def _acreditar(self, conn: sqlite3.Connection, numero: str, centavos: int) -> Optional[int]:
+        fila = conn.execute(self._SQL_ACREDITAR, (centavos, numero)).fetchone()
+        return fila[0] if fila else None
+    
+    def debitar(self, numero: str, monto: float, tipo_movimiento: str = "EXTRACCION",
+                fecha_us: int = None) -> Optional[Monto]:
+        """
+        Descuenta el monto solo si el saldo guardado más el descubierto lo cubre
+        y registra el movimiento. Devuelve el nuevo saldo o None si no se aplicó
+        """
+        centavos = Monto.convertir(monto).centavos
+        fecha_us = a_epoch_us(datetime.now()) if fecha_us is None else fecha_us
+        
+        def operacion(conn):
+            saldo = self._debitar(conn, numero, centavos)
+            if saldo is not None:
+                conn.execute(self._SQL_GUARDAR_MOVIMIENTO,
+                             (numero, fecha_us, tipo_movimiento, -centavos, saldo))
+            return saldo
+        
+        try:
+            saldo = self._con_reintentos(operacion)
+        except sqlite3.Error:
+            return None
+        if saldo is None:
+            return None
+        self._notificar_guardado(numero)
+        return Monto(saldo)
+    
+    def acreditar(self, numero: str, monto: float, tipo_movimiento: str = "DEPOSITO",
+                  fecha_us: int = None) -> Optional[Monto]:
+        """
+        Suma el monto al saldo guardado y registra el movimiento
+        Devuelve el nuevo saldo o None si la cuenta no existe
+        """
+        centavos = Monto.convertir(monto).centavos
+        fecha_us = a_epoch_us(datetime.now()) if fecha_us is None else fecha_us
+        
+        def operacion(conn):
+            saldo = self._acreditar(conn, numero, centavos)
+            if saldo is not None:
+                conn.execute(self._SQL_GUARDAR_MOVIMIENTO,
+                             (numero, fecha_us, tipo_movimiento, centavos, saldo))
+            return saldo
+        
+        try:
+            saldo = self._con_reintentos(operacion)
+        except sqlite3.Error:
+            return None
+        if saldo is None:
+            return None
+        self._notificar_guardado(numero)
+        return Monto(saldo)
+    
+    def transferir(self, nro_origen: str, nro_destino: str, monto: float,
+                   comision: float = 0, fecha_us: int = None) -> Optional[Tuple[Monto, Monto]]:
+        """
+        Debita monto más comisión del origen y acredita el monto en el destino
+        en una sola transacción. Devuelve los nuevos saldos (origen, destino) o None
+        """
+        centavos = Monto.convertir(monto).centavos
+        comision = Monto.convertir(comision).centavos
+        fecha = a_epoch_us(datetime.now()) if fecha_us is None else fecha_us
+        
+        def operacion(conn):
+            saldo_origen = self._debitar(conn, nro_origen, centavos + comision)
+            if saldo_origen is None:
+                return None
+            saldo_destino = self._acreditar(conn, nro_destino, centavos)
+            if saldo_destino is None:
+                raise _OperacionRechazada(nro_destino)
+            
+            movimientos = []
+            if comision > 0:
+                movimientos.append((nro_origen, fecha, "COMISION TRANSFERENCIA", -comision,
+                                    saldo_origen + centavos))
+            movimientos.append((nro_origen, fecha, f"TRANSFERENCIA A {nro_destino}", -centavos,
+                                saldo_origen))
+            movimientos.append((nro_destino, fecha, f"TRANSFERENCIA DE {nro_origen}", centavos,
+                                saldo_destino))
+            conn.executemany(self._SQL_GUARDAR_MOVIMIENTO, movimientos)
+            return saldo_origen, saldo_destino
+        
+        try:
+            saldos = self._con_reintentos(operacion)
+        except (sqlite3.Error, _OperacionRechazada):
+            return None
+        if saldos is None:
+            return None
+        self._notificar_guardado(nro_origen, nro_destino)
+        return Monto(saldos[0]), Monto(saldos[1])
+    
+    def saldo_guardado(self, numero: str) -> Optional[Monto]:
+        """Lee el saldo confirmado de una cuenta"""
+        self.flush()
+        try:
+            with self._conexiones.lectura() as conn:
+                fila = conn.execute('SELECT saldo FROM cuentas WHERE numero = ?', (numero,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return Monto(fila[0]) if fila else None
+    
+    # Bitácora de cambios (la completan triggers sobre clientes y cuentas)
+    # Los triggers solo existen mientras se usan instantáneas; sin ellas la tabla no crece
+    _TRIGGERS_BITACORA = {
+        f'bitacora_{tabla}_{evento.lower()}': f'''
+            CREATE TRIGGER IF NOT EXISTS bitacora_{tabla}_{evento.lower()}
+            AFTER {evento} ON {tabla}
+            BEGIN INSERT INTO bitacora (tabla, clave) VALUES ('{tabla}', {fila}.{clave}); END
+        '''
+        for tabla, clave in (('cuentas', 'numero'), ('clientes', 'dni'))
+        for evento, fila in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))
+    }
+    
+    def activar_bitacora(self) -> bool:
+        """
+        Crea los triggers que registran los cambios de clientes y cuentas en la bitácora
+        Si no estaban, los cambios hechos sin ellos no quedaron registrados y la bitácora
+        se invalida, así ninguna instantánea anterior se reproduce sobre datos incompletos
+        """
+        self.flush()
+        try:
+            with self._conexiones.transaccion("IMMEDIATE") as conn:
+                existentes = {fila[0] for fila in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+                )}
+                if existentes.issuperset(self._TRIGGERS_BITACORA):
+                    return True
+                self._invalidar_bitacora(conn)
+                for sentencia in self._TRIGGERS_BITACORA.values():
+                    conn.execute(sentencia)
+                return True
+        except sqlite3.Error:
+            return False
+    
+    def desactivar_bitacora(self) -> bool:
+        """Elimina los triggers de la bitácora y los cambios registrados"""
+        self.flush()
+        try:
+            with self._conexiones.transaccion("IMMEDIATE") as conn:
+                for nombre in self._TRIGGERS_BITACORA:
+                    conn.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+                self._invalidar_bitacora(conn)
+                return True
+        except sqlite3.Error:
+            return False
+    
+    @staticmethod
+    def _invalidar_bitacora(conn: sqlite3.Connection):
+        """Vacía la bitácora y saltea un número, que deja fuera cualquier marca anterior"""
+        conn.execute('DELETE FROM bitacora')
+        cursor = conn.execute("UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'bitacora'")
+        if cursor.rowcount == 0:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('bitacora', 1)")
+    
+    def identidad(self) -> Optional[str]:
+        """Identificador aleatorio de la base, generado al crearla (32 dígitos hexadecimales)"""
+        try:
+            with self._conexiones.lectura() as conn:
+                fila = conn.execute('SELECT id FROM identidad').fetchone()
+                return fila[0] if fila else None
+        except sqlite3.Error:
+            return None
+    
+    def marca_cambios(self) -> int:
+        """Número del último cambio registrado en la bitácora"""
+        self.flush()
+        try:
+            with self._conexiones.lectura() as conn:
+                # Se lee la secuencia y no MAX(seq): tras podar la tabla puede quedar vacía
+                fila = conn.execute(
+                    "SELECT seq FROM sqlite_sequence WHERE name = 'bitacora'"
+                ).fetchone()
+                return fila[0] if fila else 0
+        except sqlite3.Error:
+            return 0
+    
+    def cambios_desde(self, marca: int) -> Optional[Tuple[int, List[str], List[str]]]:
+        """
+        Claves de clientes y cuentas modificados después de una marca de la bitácora
+        Devuelve (nueva marca, dnis, números de cuenta) sin repetir claves, o None si
+        la bitácora ya se podó más allá de la marca y los cambios no se pueden reconstruir,
+        o si la marca es posterior al último cambio (la base se reemplazó por una anterior)
+        """
+        self.flush()
+        dnis: Dict[str, None] = {}
+        numeros: Dict[str, None] = {}
+        try:
+            with self._conexiones.lectura() as conn:
+                conn.execute('BEGIN')
+                try:
+                    # Los números de AUTOINCREMENT no tienen huecos salvo por la poda
+                    primero = conn.execute('SELECT MIN(seq) FROM bitacora').fetchone()[0]
+                    ultimo = conn.execute(
+                        "SELECT seq FROM sqlite_sequence WHERE name = 'bitacora'"
+                    ).fetchone()
+                    ultimo = ultimo[0] if ultimo else 0
+                    if ultimo < marca or (primero or ultimo + 1) > marca + 1:
+                        return None
+                    for seq, tabla, clave in conn.execute(
+                        'SELECT seq, tabla, clave FROM bitacora WHERE seq > ? ORDER BY seq', (marca,)
+                    ):
+                        (dnis if tabla == 'clientes' else numeros)[clave] = None
+                        marca = seq
+                finally:
+                    conn.execute('COMMIT')
+        except sqlite3.Error:
+            return None
+        return marca, list(dnis), list(numeros)
+    
+    def podar_cambios(self, hasta: int) -> bool:
+        """Elimina de la bitácora los cambios hasta una marca, ya incluidos en una instantánea"""
+        try:
+            with self._conexiones.transaccion() as conn:
+                conn.execute('DELETE FROM bitacora WHERE seq <= ?', (hasta,))
+                return True
+        except sqlite3.Error:
+            return False
+    
     # Métodos para movimientos
-    def guardar_movimiento(self, numero_cuenta: str, tipo: str, monto: float, saldo_final: float):
-        """Guarda un movimiento en la base de datos"""
+    def guardar_movimiento(self, numero_cuenta: str, tipo: str, monto: float, saldo_final: float,
+                           fecha_us: int = None):
+        """
+        Guarda un movimiento en la base de datos
+        fecha_us es la fecha con que se registró en memoria, para guardarlo con la misma
+        """
+        fecha = a_epoch_us(datetime.now()) if fecha_us is None else fecha_us
+        monto = Monto.convertir(monto).centavos
+        saldo_final = Monto.convertir(saldo_final).centavos
+        if self._cola:
+            self._cola.encolar_movimiento(numero_cuenta, fecha, tipo, monto, saldo_final)
+            return
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexiones.transaccion() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO movimientos (numero_cuenta, fecha, tipo, monto, saldo_final)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (numero_cuenta, datetime.now().isoformat(), tipo, monto, saldo_final))
-                conn.commit()
+                cursor.execute(self._SQL_GUARDAR_MOVIMIENTO,
+                               (numero_cuenta, fecha, tipo, monto, saldo_final))
         except sqlite3.Error:
             pass
     
+    _SQL_SELECT_MOVIMIENTOS = '''
+        SELECT numero_cuenta, fecha_us, tipo, monto, saldo_final, id 
+        FROM movimientos 
+        WHERE 1=1
+    '''
+    
+    def _filtrar_movimientos(self, numero_cuenta: str = None, fecha_desde: datetime = None,
+                             fecha_hasta: datetime = None, tipo: str = None) -> Tuple[str, list]:
+        """Arma la consulta de movimientos y sus parámetros según los filtros"""
+        query = self._SQL_SELECT_MOVIMIENTOS
+        params = []
+        
+        if numero_cuenta:
+            query += ' AND numero_cuenta = ?'
+            params.append(numero_cuenta)
+        
+        if fecha_desde:
+            query += ' AND fecha_us >= ?'
+            params.append(a_epoch_us(fecha_desde))
+        
+        if fecha_hasta:
+            query += ' AND fecha_us <= ?'
+            params.append(a_epoch_us(fecha_hasta, fin_del_dia=True))
+        
+        if tipo:
+            query += ' AND tipo = ?'
+            params.append(tipo)
+        
+        return query, params
+    
+    def _leer_movimientos(self, query: str, params: list, tamano_bloque: int,
+                          descendente: bool = True, despues_de: Optional[tuple] = None,
+                          limite: Optional[int] = None) -> Iterator[Movimiento]:
+        """
+        Recorre una consulta de movimientos por bloques ordenados por (fecha, id)
+        Cada bloque se lee con una conexión del pool que se devuelve antes de entregar sus
+        filas, así un iterador lento o abandonado no retiene conexiones; el bloque
+        siguiente continúa después de la clave del último movimiento leído
+        """
+        comparacion, orden = ('<', ' DESC') if descendente else ('>', '')
+        clave = despues_de
+        restantes = limite
+        while restantes is None or restantes > 0:
+            bloque = tamano_bloque if restantes is None else min(tamano_bloque, restantes)
+            consulta, argumentos = query, list(params)
+            if clave is not None:
+                consulta += f' AND (fecha_us, id) {comparacion} (?, ?)'
+                argumentos.extend(clave)
+            consulta += f' ORDER BY fecha_us{orden}, id{orden} LIMIT ?'
+            argumentos.append(bloque)
+            try:
+                with self._conexiones.lectura() as conn:
+                    filas = conn.execute(consulta, argumentos).fetchall()
+            except sqlite3.Error:
+                return
+            for numero_cuenta, fecha, tipo, monto, saldo_final, id in filas:
+                yield Movimiento(numero_cuenta, fecha, tipo, Monto(monto),
+                                 Monto(saldo_final), id)
+            if len(filas) < bloque:
+                return
+            clave = (filas[-1][1], filas[-1][5])
+            if restantes is not None:
+                restantes -= len(filas)
+    
+    def movimientos_anteriores(self, numero_cuenta: str, antes_de_us: Optional[int],
+                               fecha_desde: datetime = None,
+                               fecha_hasta: datetime = None) -> List[Movimiento]:
+        """
+        Movimientos de una cuenta anteriores a un instante (o todos, con None), en orden
+        cronológico. Es el historial de los movimientos que RegistroMovimientos no tiene
+        en memoria
+        """
+        self.flush()
+        query, params = self._filtrar_movimientos(numero_cuenta, fecha_desde, fecha_hasta)
+        if antes_de_us is not None:
+            query += ' AND fecha_us < ?'
+            params.append(antes_de_us)
+        return list(self._leer_movimientos(query, params, 1000, descendente=False))
+    
+    def iter_movimientos(self, numero_cuenta: str = None, fecha_desde: datetime = None,
+                         fecha_hasta: datetime = None, tipo: str = None,
+                         tamano_bloque: int = 1000) -> Iterator[Movimiento]:
+        """
+        Recorre los movimientos filtrados leyendo por bloques
+        Evita materializar todo el resultado en memoria
+        """
+        self.flush()
+        query, params = self._filtrar_movimientos(numero_cuenta, fecha_desde, fecha_hasta, tipo)
+        return self._leer_movimientos(query, params, tamano_bloque)
+    
     def cargar_movimientos(self, numero_cuenta: str = None, fecha_desde: datetime = None, 
-                          fecha_hasta: datetime = None) -> List[Dict[str, Any]]:
+                          fecha_hasta: datetime = None, tipo: str = None) -> List[Movimiento]:
         """Carga movimientos con filtros opcionales"""
-        movimientos = []
+        return list(self.iter_movimientos(numero_cuenta, fecha_desde, fecha_hasta, tipo))
+    
+    def cargar_movimientos_pagina(self, filtros: Optional[Dict] = None, despues_de: Optional[tuple] = None,
+                                  limite: int = 100) -> Tuple[List[Movimiento], Optional[tuple]]:
+        """
+        Carga una página de movimientos usando paginación por clave (fecha, id)
+        filtros admite numero_cuenta, fecha_desde, fecha_hasta y tipo. despues_de es la
+        clave devuelta por la página anterior; devuelve la página y la clave de la siguiente
+        (None cuando no hay más movimientos)
+        """
+        self.flush()
+        query, params = self._filtrar_movimientos(**(filtros or {}))
+        movimientos = list(self._leer_movimientos(query, params, limite + 1,
+                                                  despues_de=despues_de or None,
+                                                  limite=limite + 1))
+        siguiente = None
+        if len(movimientos) > limite:
+            movimientos.pop()
+            ultimo = movimientos[-1]
+            siguiente = (ultimo._fecha, ultimo.id)
+        return movimientos, siguiente
+    
+    # Unidad de trabajo
+    def confirmar(self, unidad: UnidadDeTrabajo) -> bool:
+        """
+        Escribe todas las cuentas y movimientos de una unidad de trabajo
+        en una única transacción: se aplican todos o ninguno
+        """
+        if unidad.vacia:
+            return True
+        if self.saldos_condicionales:
+            return self._confirmar_condicional(unidad)
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                query = '''
-                    SELECT numero_cuenta, fecha, tipo, monto, saldo_final 
-                    FROM movimientos 
-                    WHERE 1=1
-                '''
-                params = []
-                
-                if numero_cuenta:
-                    query += ' AND numero_cuenta = ?'
-                    params.append(numero_cuenta)
-                
-                if fecha_desde:
-                    query += ' AND fecha >= ?'
-                    params.append(fecha_desde.isoformat())
-                
-                if fecha_hasta:
-                    query += ' AND fecha <= ?'
-                    params.append(fecha_hasta.isoformat())
-                
-                query += ' ORDER BY fecha DESC'
-                
-                cursor.execute(query, params)
-                
-                for row in cursor.fetchall():
-                    numero_cuenta, fecha_str, tipo, monto, saldo_final = row
-                    movimientos.append({
-                        'numero_cuenta': numero_cuenta,
-                        'fecha': datetime.fromisoformat(fecha_str),
-                        'tipo': tipo,
-                        'monto': monto,
-                        'saldo_final': saldo_final
-                    })
-                    
+            self.esperar_escrituras()
+            with self._conexiones.transaccion() as conn:
+                if unidad.cuentas:
+                    conn.executemany(self._sql_guardar_cuenta,
+                                     [self._fila_cuenta(c) for c in unidad.cuentas])
+                if unidad.saldos:
+                    conn.executemany('UPDATE cuentas SET saldo = ? WHERE numero = ?',
+                                     unidad.saldos)
+                if unidad.movimientos:
+                    conn.executemany(self._SQL_GUARDAR_MOVIMIENTO, unidad.movimientos)
         except sqlite3.Error:
-            pass
+            return False
+        self._notificar_guardado(*unidad.numeros_cuentas)
+        return True
+    
+    def _confirmar_condicional(self, unidad: UnidadDeTrabajo) -> bool:
+        """
+        Confirma la unidad en la base compartida sin pisar saldos de otros procesos
+        Cada saldo se modifica por la variación de sus movimientos con un UPDATE relativo
+        (condicional si es un débito o si se indicó el saldo esperado) dentro de una
+        transacción BEGIN IMMEDIATE. Los saldos
+        resultantes quedan en unidad.saldos_confirmados para llevarlos a memoria
+        """
+        variaciones = unidad.variaciones_saldo()
+        
+        def operacion(conn):
+            if unidad.cuentas:
+                conn.executemany(self._sql_guardar_cuenta,
+                                 [self._fila_cuenta(c) for c in unidad.cuentas])
+            saldos = {}
+            for numero, centavos in variaciones.items():
+                esperado = unidad.saldo_esperado(numero)
+                if esperado is not None:
+                    fila = conn.execute(self._SQL_AJUSTAR_SI_SALDO,
+                                        (centavos, numero, esperado)).fetchone()
+                    saldo = fila[0] if fila else None
+                elif centavos < 0:
+                    saldo = self._debitar(conn, numero, -centavos)
+                else:
+                    saldo = self._acreditar(conn, numero, centavos)
+                if saldo is None:
+                    raise _OperacionRechazada(numero)
+                saldos[numero] = saldo
+            if unidad.movimientos:
+                conn.executemany(self._SQL_GUARDAR_MOVIMIENTO, unidad.movimientos_desde_saldos(saldos))
+            return saldos
         
-        return movimientos
\ No newline at end of file
+        try:
+            saldos = self._con_reintentos(operacion)
+        except (sqlite3.Error, _OperacionRechazada):
+            return False
+        unidad.saldos_confirmados = {numero: Monto(saldo) for numero, saldo in saldos.items()}
+        self._notificar_guardado(*unidad.numeros_cuentas)
+        return True
@@ -1,9 +1,15 @@
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Optional, Sequence
+from .monto import Monto
+from .registro_movimientos import Movimiento, PoliticaMovimientos, RegistroMovimientos
+from .tiempo import a_epoch_us
 
 class Cliente:
     """Clase base para todos los clientes del banco"""
+    # Sin __dict__ por instancia; __weakref__ permite los mapas de identidad del banco
+    __slots__ = ('_dni', '_nombre', '_tipo', '__weakref__')
+    
     def __init__(self, dni: str, nombre: str, tipo: str = "persona"):
         self._dni = dni
         self._nombre = nombre
@@ -26,21 +32,32 @@ class Cliente:
 
 class ClientePersona(Cliente):
     """Cliente persona física"""
+    __slots__ = ()
+    
     def __init__(self, dni: str, nombre: str):
         super().__init__(dni, nombre, "persona")
 
 class ClienteEmpresa(Cliente):
     """Cliente empresa"""
+    __slots__ = ()
+    
     def __init__(self, dni: str, nombre: str):
         super().__init__(dni, nombre, "empresa")
 
 class CuentaBase(ABC):
     """Clase abstracta base para todas las cuentas"""
+    __slots__ = ('_numero', '_titular', '_saldo', '_movimientos', '_politica_movimientos',
+                 '_observador_saldo', '__weakref__')
+    
     def __init__(self, numero: str, titular: Cliente, saldo: float = 0.0):
         self._numero = numero
         self._titular = titular
-        self._saldo = saldo
-        self._movimientos = []
+        self._saldo = Monto.convertir(saldo)
+        # El registro se crea con el primer movimiento
+        self._movimientos: Optional[RegistroMovimientos] = None
+        # Capacidad e historial de los movimientos; la fija el banco que tiene la cuenta
+        self._politica_movimientos: Optional[PoliticaMovimientos] = None
+        self._observador_saldo = None
     
     @property
     def numero(self) -> str:
@@ -51,47 +68,97 @@ class CuentaBase(ABC):
         return self._titular
     
     @property
-    def saldo(self) -> float:
+    def saldo(self) -> Monto:
         return self._saldo
     
+    def observar_saldo(self, observador):
+        """
+        Registra una función que se llama como observador(cuenta, anterior, nuevo)
+        cada vez que cambia el saldo, justo antes del cambio; None quita el observador
+        """
+        self._observador_saldo = observador
+    
+    def _ajustar_saldo(self, nuevo: Monto):
+        """
+        Cambia el saldo y avisa al observador registrado
+        Se avisa antes de asignar, para que el observador pueda conservar el saldo anterior
+        antes de que otro hilo vea el nuevo
+        """
+        anterior = self._saldo
+        if self._observador_saldo:
+            self._observador_saldo(self, anterior, nuevo)
+        self._saldo = nuevo
+    
     def depositar(self, monto: float) -> bool:
         """Deposita un monto en la cuenta"""
+        monto = Monto.convertir(monto)
         if monto <= 0:
             return False
         
-        self._saldo += monto
+        self._ajustar_saldo(self._saldo + monto)
         self._registrar_movimiento("DEPOSITO", monto)
         return True
     
     def extraer(self, monto: float) -> bool:
         """Extrae un monto de la cuenta si es posible"""
+        monto = Monto.convertir(monto)
         if monto <= 0 or not self.puede_extraer(monto):
             return False
         
-        self._saldo -= monto
+        self._ajustar_saldo(self._saldo - monto)
         self._registrar_movimiento("EXTRACCION", -monto)
         return True
     
     def transferir(self, destino: 'CuentaBase', monto: float) -> bool:
         """Transfiere un monto a otra cuenta"""
+        monto = Monto.convertir(monto)
         if monto <= 0 or not self.puede_extraer(monto):
             return False
         
-        self._saldo -= monto
-        destino.depositar(monto)
+        self._ajustar_saldo(self._saldo - monto)
+        # El crédito se registra solo como transferencia recibida, igual que en la base
+        destino._ajustar_saldo(destino._saldo + monto)
         self._registrar_movimiento(f"TRANSFERENCIA A {destino.numero}", -monto)
         destino._registrar_movimiento(f"TRANSFERENCIA DE {self.numero}", monto)
         return True
     
-    def _registrar_movimiento(self, tipo: str, monto: float):
-        """Registra un movimiento en la cuenta"""
-        movimiento = {
-            'fecha': datetime.now(),
-            'tipo': tipo,
-            'monto': monto,
-            'saldo_final': self._saldo
-        }
-        self._movimientos.append(movimiento)
+    def _aplicar_movimiento(self, tipo: str, monto: Monto, fecha_us: int = None):
+        """
+        Suma al saldo un monto (negativo para débitos) y lo registra como un único
+        movimiento del tipo indicado, el mismo que se guarda en la base
+        Quien lo llama ya verificó los fondos
+        """
+        self._ajustar_saldo(self._saldo + monto)
+        self._registrar_movimiento(tipo, monto, fecha_us)
+    
+    def _quitar_movimiento(self, fecha_us: int, tipo: str, monto: float) -> bool:
+        """Quita de memoria un movimiento registrado que no llegó a guardarse en la base"""
+        if self._movimientos is None:
+            return False
+        return self._movimientos.quitar(fecha_us, tipo, Monto.convertir(monto).centavos)
+    
+    def _registrar_movimiento(self, tipo: str, monto: float, fecha_us: int = None):
+        """
+        Registra un movimiento en la cuenta
+        Con fecha_us se usa la fecha con que ya se guardó en la base
+        """
+        if self._movimientos is None:
+            self._movimientos = RegistroMovimientos(self._numero, self._politica_movimientos)
+        if fecha_us is None:
+            fecha_us = a_epoch_us(datetime.now())
+        self._movimientos.agregar(fecha_us, tipo, Monto.convertir(monto).centavos,
+                                  self._saldo.centavos)
+    
+    @property
+    def ultimo_movimiento_us(self) -> Optional[int]:
+        """Fecha del último movimiento registrado en memoria, para guardarlo con la misma"""
+        return self._movimientos.ultima_fecha_us if self._movimientos is not None else None
+    
+    def usar_politica_movimientos(self, politica: PoliticaMovimientos):
+        """Fija la capacidad en memoria y el historial de los movimientos de la cuenta"""
+        self._politica_movimientos = politica
+        if self._movimientos is not None:
+            self._movimientos.politica = politica
     
     @abstractmethod
     def puede_extraer(self, monto: float) -> bool:
@@ -99,87 +166,105 @@ class CuentaBase(ABC):
         pass
     
     @abstractmethod
-    def costo_mantenimiento(self) -> float:
+    def costo_mantenimiento(self) -> Monto:
         """Calcula el costo de mantenimiento"""
         pass
     
-    def obtener_movimientos(self, fecha_desde: datetime = None, fecha_hasta: datetime = None) -> List[dict]:
-        """Obtiene movimientos filtrados por fecha"""
-        movimientos_filtrados = self._movimientos
-        
-        if fecha_desde:
-            movimientos_filtrados = [m for m in movimientos_filtrados if m['fecha'] >= fecha_desde]
-        if fecha_hasta:
-            movimientos_filtrados = [m for m in movimientos_filtrados if m['fecha'] <= fecha_hasta]
-        
-        return movimientos_filtrados
+    def obtener_movimientos(self, fecha_desde: datetime = None,
+                            fecha_hasta: datetime = None) -> Sequence[Movimiento]:
+        """
+        Obtiene movimientos filtrados por fecha, ambas inclusive
+        Los recientes se leen del registro en memoria sin copiarlos y los anteriores,
+        del historial de la política de movimientos de la cuenta
+        """
+        registro = self._movimientos
+        if registro is None:
+            # Sin movimientos en memoria todo está en el historial, si lo hay
+            registro = RegistroMovimientos(self._numero, self._politica_movimientos)
+        return registro.rango(fecha_desde, fecha_hasta)
 
 class CajaAhorro(CuentaBase):
     """Caja de ahorro que no permite saldo negativo"""
+    __slots__ = ()
+    
     def __init__(self, numero: str, titular: Cliente, saldo: float = 0.0):
         super().__init__(numero, titular, saldo)
     
     def puede_extraer(self, monto: float) -> bool:
         return self._saldo >= monto
     
-    def costo_mantenimiento(self) -> float:
-        costo_base = 0.0  # Sin costo para caja de ahorro
+    def costo_mantenimiento(self) -> Monto:
+        costo_base = Monto()  # Sin costo para caja de ahorro
         if self.titular.tipo == "empresa":
             return costo_base * 0.9  # 10% de descuento
         return costo_base
 
 class CuentaCorriente(CuentaBase):
     """Cuenta corriente con descubierto permitido"""
+    __slots__ = ('_limite_descubierto', '_costo_mantenimiento_base')
+    
     def __init__(self, numero: str, titular: Cliente, limite_descubierto: float = 1000.0, 
                  costo_mantenimiento: float = 50.0, saldo: float = 0.0):
         super().__init__(numero, titular, saldo)
-        self._limite_descubierto = limite_descubierto
-        self._costo_mantenimiento_base = costo_mantenimiento
+        self._limite_descubierto = Monto.convertir(limite_descubierto)
+        self._costo_mantenimiento_base = Monto.convertir(costo_mantenimiento)
     
     def puede_extraer(self, monto: float) -> bool:
         return (self._saldo + self._limite_descubierto) >= monto
     
-    def costo_mantenimiento(self) -> float:
+    def costo_mantenimiento(self) -> Monto:
         costo = self._costo_mantenimiento_base
         if self.titular.tipo == "empresa":
             costo *= 0.9  # 10% de descuento
         return costo
     
     @property
-    def limite_descubierto(self) -> float:
+    def costo_mantenimiento_base(self) -> Monto:
+        """Costo mensual antes del descuento por tipo de titular"""
+        return self._costo_mantenimiento_base
+    
+    @property
+    def limite_descubierto(self) -> Monto:
         return self._limite_descubierto
     
     @property
-    def descubierto_utilizado(self) -> float:
-        return max(0, -self._saldo)
+    def descubierto_utilizado(self) -> Monto:
+        return max(Monto(), -self._saldo)
 
 class CuentaPlazoFijo(CuentaBase):
     """Cuenta a plazo fijo con vencimiento"""
+    __slots__ = ('_capital_inicial', '_tasa_interes_anual', '_fecha_creacion',
+                 '_fecha_vencimiento', '_interes_acumulado')
+    
     def __init__(self, numero: str, titular: Cliente, capital: float, 
                  tasa_interes_anual: float = 0.10, plazo_dias: int = 30):
         super().__init__(numero, titular, capital)
-        self._capital_inicial = capital
+        self._capital_inicial = self._saldo
         self._tasa_interes_anual = tasa_interes_anual
         self._fecha_creacion = datetime.now()
         self._fecha_vencimiento = self._fecha_creacion + timedelta(days=plazo_dias)
-        self._interes_acumulado = 0.0
+        self._interes_acumulado = Monto()
     
     def puede_extraer(self, monto: float) -> bool:
         # No permite extracciones antes del vencimiento
         return datetime.now() >= self._fecha_vencimiento and self._saldo >= monto
     
-    def costo_mantenimiento(self) -> float:
-        return 0.0  # Sin costo de mantenimiento
+    def costo_mantenimiento(self) -> Monto:
+        return Monto()  # Sin costo de mantenimiento
     
     def acreditar_interes(self):
         """Acredita el interés mensual a la cuenta"""
         if datetime.now() >= self._fecha_vencimiento:
             # Calcular interés total
             meses = (self._fecha_vencimiento - self._fecha_creacion).days / 30.0
-            interes = self._capital_inicial * self._tasa_interes_anual * meses / 12
-            self._saldo = self._capital_inicial + interes
+            interes = self._capital_inicial * (self._tasa_interes_anual * meses / 12)
+            self._ajustar_saldo(self._capital_inicial + interes)
             self._interes_acumulado = interes
     
+    def anular_interes(self):
+        """Descarta el interés calculado cuya acreditación no llegó a guardarse"""
+        self._interes_acumulado = Monto()
+    
     @property
     def fecha_creacion(self) -> datetime:
         return self._fecha_creacion
@@ -193,9 +278,14 @@ class CuentaPlazoFijo(CuentaBase):
         return self._tasa_interes_anual
     
     @property
-    def interes_calculado(self) -> float:
+    def interes_pendiente(self) -> bool:
+        """El interés todavía no se acreditó: el saldo sigue siendo el capital inicial"""
+        return self._saldo == self._capital_inicial
+    
+    @property
+    def interes_calculado(self) -> Monto:
         return self._interes_acumulado
     
     @property
-    def capital_inicial(self) -> float:
+    def capital_inicial(self) -> Monto:
         return self._capital_inicial
\ No newline at end of file
@@ -0,0 +1,199 @@
+import sqlite3
+import threading
+import queue
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from .conexion import GestorConexiones
+
+class ColaEscritura:
+    """
+    Cola de escritura diferida (write-behind) para movimientos y saldos
+    Un hilo de fondo agrupa las operaciones encoladas y las confirma en lotes,
+    cuando se alcanza el tamaño de lote o vence la ventana de tiempo.
+    Si un lote falla no se descarta: queda pendiente y se reintenta delante del
+    siguiente, y flush informa el fallo hasta que se confirme
+    """
+
+    _MOVIMIENTO = "movimiento"
+    _SALDO = "saldo"
+    _BARRERA = "barrera"
+    _FIN = "fin"
+
+    def __init__(self, conexiones: GestorConexiones, tamano_lote: int = 500,
+                 intervalo: float = 0.05, capacidad: int = 10000,
+                 espera_reintento: float = 1.0,
+                 al_confirmar: Optional[Callable[..., None]] = None,
+                 al_fallar: Optional[Callable[[Exception], None]] = None):
+        self._conexiones = conexiones
+        self._tamano_lote = tamano_lote
+        self._intervalo = intervalo
+        self._espera_reintento = espera_reintento
+        # Recibe los números de las cuentas cuyo saldo quedó confirmado en la base
+        self._al_confirmar = al_confirmar
+        # Recibe el error cuando un lote empieza a fallar
+        self._al_fallar = al_fallar
+        # La cola acotada bloquea a los productores cuando el escritor se atrasa
+        self._cola: "queue.Queue[Tuple[str, object]]" = queue.Queue(maxsize=capacidad)
+        # Escrituras de lotes fallidos, que se reintentan antes que las nuevas
+        self._movimientos_fallidos: List[tuple] = []
+        self._saldos_fallidos: Dict[str, tuple] = {}
+        self._error: Optional[Exception] = None
+        self._cerrada = False
+        self._hilo = threading.Thread(target=self._procesar, name="escritura-diferida", daemon=True)
+        self._hilo.start()
+
+    def encolar_movimiento(self, numero_cuenta: str, fecha_us: int, tipo: str,
+                           monto: int, saldo_final: int):
+        """Encola la inserción de un movimiento con importes en centavos"""
+        self._encolar(self._MOVIMIENTO, (numero_cuenta, fecha_us, tipo, monto, saldo_final))
+
+    def encolar_saldo(self, numero_cuenta: str, saldo: int):
+        """Encola la actualización del saldo de una cuenta en centavos"""
+        self._encolar(self._SALDO, (saldo, numero_cuenta))
+
+    @property
+    def activa(self) -> bool:
+        """Indica si el hilo escritor sigue procesando la cola"""
+        return self._hilo.is_alive()
+
+    @property
+    def error(self) -> Optional[Exception]:
+        """Último error de escritura, mientras haya escrituras sin confirmar"""
+        return self._error
+
+    def _encolar(self, tipo: str, datos: object):
+        if self._cerrada:
+            raise RuntimeError("La cola de escritura está cerrada")
+        self._poner((tipo, datos))
+
+    def _poner(self, elemento: Tuple[str, object], espera: Optional[float] = None) -> bool:
+        """Encola sin quedar bloqueado si el hilo escritor terminó"""
+        limite = None if espera is None else time.monotonic() + espera
+        while True:
+            if not self.activa:
+                raise RuntimeError("El hilo de escritura diferida se detuvo")
+            try:
+                self._cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                if limite is not None and time.monotonic() >= limite:
+                    return False
+
+    def flush(self, espera: Optional[float] = None) -> bool:
+        """
+        Espera a que todo lo encolado hasta ahora quede confirmado
+        Devuelve False si quedan escrituras fallidas sin confirmar, si el hilo escritor
+        terminó o si se agotó la espera (en segundos, None espera sin límite)
+        """
+        if not self.activa:
+            return False
+        limite = None if espera is None else time.monotonic() + espera
+        barrera = threading.Event()
+        try:
+            if not self._poner((self._BARRERA, barrera), espera):
+                return False
+        except RuntimeError:
+            return False
+        while not barrera.wait(0.1):
+            if not self.activa:
+                return False
+            if limite is not None and time.monotonic() >= limite:
+                return False
+        return self._error is None
+
+    def cerrar(self, espera: Optional[float] = None) -> bool:
+        """
+        Confirma lo pendiente y detiene el hilo escritor
+        Devuelve False si algo quedó sin confirmar
+        """
+        if self._cerrada:
+            return self._error is None
+        resultado = self.flush(espera)
+        self._cerrada = True
+        if self.activa:
+            try:
+                self._poner((self._FIN, None), espera)
+            except RuntimeError:
+                pass
+            self._hilo.join(espera)
+        return resultado
+
+    def _procesar(self):
+        """Bucle del hilo escritor"""
+        try:
+            self._bucle()
+        except Exception as e:
+            # El hilo termina; flush y los productores lo detectan y dejan de esperarlo
+            self._error = e
+            raise
+
+    def _bucle(self):
+        while True:
+            # Con escrituras fallidas pendientes se reintenta aunque no llegue nada nuevo
+            reintentar = bool(self._movimientos_fallidos or self._saldos_fallidos)
+            try:
+                lote = [self._cola.get(timeout=self._espera_reintento if reintentar else None)]
+            except queue.Empty:
+                self._escribir([])
+                continue
+            limite = time.monotonic() + self._intervalo
+
+            while len(lote) < self._tamano_lote and lote[-1][0] not in (self._BARRERA, self._FIN):
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            self._escribir(lote)
+
+            for tipo, datos in lote:
+                if tipo == self._BARRERA:
+                    datos.set()
+                elif tipo == self._FIN:
+                    return
+
+    def _escribir(self, lote: List[Tuple[str, object]]):
+        """Confirma un lote completo, con los fallidos anteriores, en una sola transacción"""
+        movimientos = list(self._movimientos_fallidos)
+        saldos: Dict[str, tuple] = dict(self._saldos_fallidos)
+        for tipo, datos in lote:
+            if tipo == self._MOVIMIENTO:
+                movimientos.append(datos)
+            elif tipo == self._SALDO:
+                # Solo importa el último saldo de cada cuenta dentro del lote
+                saldos[datos[1]] = datos
+
+        if not movimientos and not saldos:
+            return
+
+        try:
+            with self._conexiones.transaccion() as conn:
+                if movimientos:
+                    conn.executemany('''
+                        INSERT INTO movimientos (numero_cuenta, fecha_us, tipo, monto, saldo_final)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', movimientos)
+                if saldos:
+                    conn.executemany(
+                        'UPDATE cuentas SET saldo = ? WHERE numero = ?',
+                        list(saldos.values())
+                    )
+        except sqlite3.Error as e:
+            # El lote queda pendiente para el próximo intento
+            primer_fallo = self._error is None
+            self._movimientos_fallidos = movimientos
+            self._saldos_fallidos = saldos
+            self._error = e
+            if primer_fallo and self._al_fallar:
+                self._al_fallar(e)
+            return
+
+        self._movimientos_fallidos = []
+        self._saldos_fallidos = {}
+        self._error = None
+        if saldos and self._al_confirmar:
+            # Recién ahora las cuentas están guardadas y pueden desalojarse de la caché
+            self._al_confirmar(*saldos)
@@ -0,0 +1,271 @@
+import csv
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+from .banco import Banco
+from .migraciones import INDICES, restaurar_indices
+from .monto import Monto
+from .tiempo import a_epoch_us
+
+def _texto(fila: Dict, campo: str, defecto: str = '') -> str:
+    """Valor de texto de un campo; los JSON lines pueden traer números"""
+    valor = fila.get(campo)
+    return defecto if valor in (None, '') else str(valor).strip()
+
+class ResultadoImportacion:
+    """Resumen de una importación masiva"""
+
+    def __init__(self, entidad: str, archivo: str, retomada_desde: int = 0):
+        self.entidad = entidad
+        self.archivo = archivo
+        self.retomada_desde = retomada_desde
+        self.leidas = 0
+        self.importadas = 0
+        self.rechazadas: List[Tuple[int, str]] = []
+        self.segundos = 0.0
+        self.completada = False
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return self.leidas / self.segundos if self.segundos else 0.0
+
+    def __str__(self):
+        return (f"{self.entidad}: {self.importadas} importadas, {len(self.rechazadas)} rechazadas "
+                f"en {self.segundos:.1f} s ({self.filas_por_segundo:,.0f} filas/s)")
+
+class ImportadorMasivo:
+    """
+    Carga masiva de clientes, cuentas y movimientos desde archivos CSV o JSON lines
+
+    Las filas se validan por bloques y cada bloque se inserta con executemany en una
+    sola transacción, que también registra cuántas filas del archivo se procesaron.
+    Si la importación se interrumpe, volver a ejecutarla retoma desde ese punto.
+    Los índices de la tabla destino se eliminan durante la carga y se recrean al final;
+    si el proceso muere antes, DatabaseManager los recrea al abrir la base.
+    """
+
+    def __init__(self, db, banco: Optional[Banco] = None, tamano_bloque: int = 50000,
+                 diferir_indices: bool = True):
+        self._db = db
+        self._banco = banco
+        self._tamano_bloque = tamano_bloque
+        self._diferir_indices = diferir_indices
+
+    # Puntos de entrada
+    def importar_clientes(self, archivo: str, reiniciar: bool = False) -> ResultadoImportacion:
+        """Importa clientes con columnas dni, nombre, tipo (persona o empresa)"""
+        return self._importar("clientes", archivo, reiniciar)
+
+    def importar_cuentas(self, archivo: str, reiniciar: bool = False) -> ResultadoImportacion:
+        """
+        Importa cuentas con columnas numero, dni_titular, tipo (CA, CC o PF), saldo y,
+        según el tipo, limite_descubierto, costo_mantenimiento, capital_inicial,
+        tasa_interes, fecha_creacion y fecha_vencimiento. Los importes van en pesos
+        """
+        return self._importar("cuentas", archivo, reiniciar)
+
+    def importar_movimientos(self, archivo: str, reiniciar: bool = False) -> ResultadoImportacion:
+        """Importa movimientos con columnas numero_cuenta, fecha (ISO), tipo, monto, saldo_final"""
+        return self._importar("movimientos", archivo, reiniciar)
+
+    # Lectura de archivos
+    def _leer_filas(self, archivo: str) -> Iterator[Dict[str, str]]:
+        """Recorre las filas de un archivo CSV con encabezado o JSON lines"""
+        with open(archivo, newline='', encoding='utf-8') as f:
+            if archivo.endswith(('.jsonl', '.json')):
+                for linea in f:
+                    if linea.strip():
+                        yield json.loads(linea)
+            else:
+                yield from csv.DictReader(f)
+
+    # Progreso
+    def _filas_procesadas(self, archivo: str, entidad: str) -> Tuple[int, bool]:
+        with self._db.conexiones.lectura() as conn:
+            row = conn.execute(
+                'SELECT filas, completada FROM importaciones WHERE archivo = ? AND entidad = ?',
+                (archivo, entidad)
+            ).fetchone()
+        return (row[0], bool(row[1])) if row else (0, False)
+
+    def _registrar_progreso(self, conn: sqlite3.Connection, archivo: str, entidad: str,
+                            filas: int, completada: bool = False):
+        conn.execute('''
+            INSERT OR REPLACE INTO importaciones (archivo, entidad, filas, completada, actualizada)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (archivo, entidad, filas, int(completada)))
+
+    # Índices
+    def _eliminar_indices(self, entidad: str):
+        with self._db.conexiones.transaccion() as conn:
+            for nombre, _ in INDICES[entidad]:
+                conn.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+    def _crear_indices(self, entidad: str):
+        with self._db.conexiones.transaccion() as conn:
+            restaurar_indices(conn, entidad)
+
+    def _importar(self, entidad: str, archivo: str, reiniciar: bool) -> ResultadoImportacion:
+        archivo = os.path.abspath(archivo)
+        self._db.flush()
+
+        procesadas, completada = (0, False) if reiniciar else self._filas_procesadas(archivo, entidad)
+        resultado = ResultadoImportacion(entidad, archivo, procesadas)
+        if completada:
+            resultado.completada = True
+            return resultado
+
+        validar = getattr(self, f'_validar_{entidad}')
+        insertar = getattr(self._db, f'insertar_{entidad}')
+
+        inicio = time.perf_counter()
+        if self._diferir_indices:
+            self._eliminar_indices(entidad)
+        try:
+            filas = islice(self._leer_filas(archivo), procesadas, None)
+            numero_linea = procesadas
+            while True:
+                bloque = list(islice(filas, self._tamano_bloque))
+                if not bloque:
+                    break
+                primera_linea = numero_linea + 1
+                numero_linea += len(bloque)
+
+                with self._db.conexiones.transaccion() as conn:
+                    validas = validar(conn, bloque, primera_linea, resultado.rechazadas)
+                    insertar(conn, validas)
+                    self._registrar_progreso(conn, archivo, entidad, numero_linea)
+
+                resultado.leidas += len(bloque)
+                resultado.importadas += len(validas)
+                self._poblar_banco(entidad, validas)
+
+            with self._db.conexiones.transaccion() as conn:
+                self._registrar_progreso(conn, archivo, entidad, numero_linea, completada=True)
+            resultado.completada = True
+        finally:
+            if self._diferir_indices:
+                self._crear_indices(entidad)
+            resultado.segundos = time.perf_counter() - inicio
+        return resultado
+
+    # Validación por bloques
+    def _existentes(self, conn: sqlite3.Connection, tabla: str, columna: str, claves) -> set:
+        """Devuelve cuáles de las claves ya existen en la tabla con una sola consulta"""
+        cursor = conn.execute(
+            f'SELECT {columna} FROM {tabla} WHERE {columna} IN (SELECT value FROM json_each(?))',
+            (json.dumps(list(claves)),)
+        )
+        return {row[0] for row in cursor}
+
+    def _validar_clientes(self, conn, bloque, primera_linea, rechazadas) -> List[tuple]:
+        existentes = self._existentes(conn, 'clientes', 'dni', (_texto(f, 'dni') for f in bloque))
+        validas = []
+        for linea, fila in enumerate(bloque, primera_linea):
+            dni = _texto(fila, 'dni')
+            nombre = _texto(fila, 'nombre')
+            tipo = _texto(fila, 'tipo', 'persona').lower()
+            if not dni or not nombre:
+                rechazadas.append((linea, "DNI y Nombre son obligatorios"))
+            elif tipo not in ("persona", "empresa"):
+                rechazadas.append((linea, f"Tipo de cliente no válido: {tipo}"))
+            elif dni in existentes:
+                rechazadas.append((linea, f"El cliente {dni} ya existe"))
+            else:
+                existentes.add(dni)
+                validas.append((dni, nombre, tipo))
+        return validas
+
+    def _validar_cuentas(self, conn, bloque, primera_linea, rechazadas) -> List[tuple]:
+        existentes = self._existentes(conn, 'cuentas', 'numero', (_texto(f, 'numero') for f in bloque))
+        titulares = self._existentes(conn, 'clientes', 'dni', {_texto(f, 'dni_titular') for f in bloque})
+        validas = []
+        for linea, fila in enumerate(bloque, primera_linea):
+            numero = _texto(fila, 'numero')
+            dni = _texto(fila, 'dni_titular')
+            tipo = _texto(fila, 'tipo').upper()
+            if not numero:
+                rechazadas.append((linea, "El número de cuenta es obligatorio"))
+                continue
+            if numero in existentes:
+                rechazadas.append((linea, f"La cuenta {numero} ya existe"))
+                continue
+            if dni not in titulares:
+                rechazadas.append((linea, f"Cliente no encontrado: {dni}"))
+                continue
+            if tipo not in Banco.CLASES_CUENTA:
+                rechazadas.append((linea, f"Tipo de cuenta no válido: {tipo}"))
+                continue
+            try:
+                validas.append(self._fila_cuenta(numero, dni, tipo, fila))
+            except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+                rechazadas.append((linea, f"Valor inválido: {e}"))
+                continue
+            existentes.add(numero)
+        return validas
+
+    def _fila_cuenta(self, numero: str, dni: str, tipo: str, fila: Dict) -> tuple:
+        """Convierte una fila del archivo en una fila de la tabla cuentas"""
+        def centavos(campo: str, defecto=None) -> Optional[int]:
+            valor = fila.get(campo)
+            if valor in (None, ''):
+                return defecto
+            return Monto.de_pesos(valor).centavos
+
+        saldo = centavos('saldo', 0)
+        limite = costo = capital = tasa = creacion = vencimiento = None
+        if tipo == "CC":
+            limite = centavos('limite_descubierto', 100000)
+            costo = centavos('costo_mantenimiento', 5000)
+        elif tipo == "PF":
+            capital = centavos('capital_inicial', saldo)
+            tasa = float(fila.get('tasa_interes') or 0.10)
+            creacion = a_epoch_us(datetime.fromisoformat(fila['fecha_creacion']))
+            vencimiento = a_epoch_us(datetime.fromisoformat(fila['fecha_vencimiento']))
+            if vencimiento < creacion:
+                raise ValueError("la fecha de vencimiento es anterior a la de creación")
+        return (numero, dni, tipo, saldo, limite, costo, capital, tasa, creacion, vencimiento)
+
+    def _validar_movimientos(self, conn, bloque, primera_linea, rechazadas) -> List[tuple]:
+        cuentas = self._existentes(conn, 'cuentas', 'numero', {_texto(f, 'numero_cuenta') for f in bloque})
+        validas = []
+        for linea, fila in enumerate(bloque, primera_linea):
+            numero = _texto(fila, 'numero_cuenta')
+            tipo = _texto(fila, 'tipo')
+            if numero not in cuentas:
+                rechazadas.append((linea, f"Cuenta no encontrada: {numero}"))
+                continue
+            if not tipo:
+                rechazadas.append((linea, "El tipo de movimiento es obligatorio"))
+                continue
+            try:
+                validas.append((
+                    numero, a_epoch_us(datetime.fromisoformat(fila['fecha'])), tipo,
+                    Monto.de_pesos(fila['monto']).centavos,
+                    Monto.de_pesos(fila['saldo_final']).centavos
+                ))
+            except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+                rechazadas.append((linea, f"Valor inválido: {e}"))
+        return validas
+
+    # Banco en memoria
+    def _poblar_banco(self, entidad: str, filas: List[tuple]):
+        """
+        Agrega al banco lo recién importado a partir de las filas ya validadas
+        En modo perezoso no hace falta: el banco lee de la base cuando lo necesita
+        """
+        banco = self._banco
+        if banco is None or banco.perezoso:
+            return
+        if entidad == "clientes":
+            for dni, nombre, tipo in filas:
+                banco.alta_cliente(self._db.cliente_desde_fila(dni, nombre, tipo))
+        elif entidad == "cuentas":
+            for fila in filas:
+                cliente = banco.buscar_cliente(fila[1])
+                if cliente:
+                    banco.alta_cuenta(self._db.cuenta_desde_fila(fila, cliente))
@@ -0,0 +1,305 @@
+import os
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from itertools import accumulate
+from typing import List, Optional, Tuple
+from .banco import Banco
+from .entidades import (Cliente, ClientePersona, ClienteEmpresa, CuentaBase, CajaAhorro,
+                        CuentaCorriente, CuentaPlazoFijo)
+from .monto import Monto
+from .tiempo import a_epoch_us, desde_epoch_us
+from .vista_banco import VistaBanco
+
+class InstantaneaInvalida(ValueError):
+    """El archivo no es una instantánea válida, es de otra versión o está dañado"""
+
+class Instantanea:
+    """
+    Instantánea binaria del estado completo de un Banco en memoria
+
+    El archivo tiene una cabecera de tamaño fijo (número mágico, versión, marca de la
+    bitácora, identidad de la base, cantidades, largo y CRC32 del cuerpo) y un cuerpo por columnas: parámetros
+    y totales, y luego un array por atributo de clientes y cuentas, con los textos
+    concatenados en UTF-8. Al arrancar se carga la instantánea y se reproducen solo los
+    cambios que la bitácora registró después de su marca.
+    """
+
+    MAGICO = b'BNCSNAP\x00'
+    VERSION = 2
+
+    # mágico, versión, reservado, marca de bitácora, creación (us), clientes, cuentas,
+    # largo del cuerpo, CRC32 del cuerpo e identidad de la base (ceros sin base)
+    _CABECERA = struct.Struct('<8sHHqqIIQI16s')
+    _SIN_IDENTIDAD = bytes(16)
+    # comisión y costo de mantenimiento en centavos, tasa de plazo fijo,
+    # saldos de CA, CC y PF y descubierto en centavos
+    _PARAMETROS = struct.Struct('<qqdqqqq')
+    _LARGO = struct.Struct('<Q')
+
+    _TIPOS_CLIENTE = ("persona", "empresa")
+
+    # Escritura
+    @classmethod
+    def guardar(cls, banco: Banco, ruta: str, db=None) -> int:
+        """
+        Escribe la instantánea de un banco en memoria; devuelve el tamaño en bytes
+        Con db se activa la bitácora, se registra su marca y luego se podan los cambios ya
+        incluidos (no se usa con una base compartida entre procesos)
+        """
+        return cls.escribir(cls.preparar(banco, db), ruta, db)
+
+    @classmethod
+    def preparar(cls, banco: Banco, db=None) -> dict:
+        """
+        Toma la marca de la bitácora, una vista consistente del banco y sus parámetros
+        Es rápido y se llama desde el hilo que modifica el banco; el resultado se pasa a
+        escribir, que puede correr en otro hilo sin bloquear las operaciones. La marca se
+        toma antes que la vista, que refleja todo lo confirmado por este proceso
+        """
+        if banco.perezoso:
+            raise ValueError("La instantánea requiere un banco con todas las cuentas en memoria")
+        if db and not db.activar_bitacora():
+            raise ValueError("No se pudo activar la bitácora de cambios")
+        marca = db.marca_cambios() if db else 0
+        identidad = cls._identidad(db) if db else cls._SIN_IDENTIDAD
+        parametros = (banco.comision_transferencia.centavos, banco.costo_mantenimiento_cc.centavos,
+                      banco.tasa_interes_pf)
+        return {'marca': marca, 'identidad': identidad, 'vista': banco.snapshot(),
+                'parametros': parametros}
+
+    @classmethod
+    def _identidad(cls, db) -> bytes:
+        identidad = db.identidad()
+        if identidad is None:
+            raise ValueError("No se pudo leer la identidad de la base de datos")
+        return bytes.fromhex(identidad)
+
+    @classmethod
+    def escribir(cls, preparada: dict, ruta: str, db=None) -> int:
+        """Serializa y escribe lo tomado con preparar; devuelve el tamaño en bytes"""
+        marca = preparada['marca']
+        with preparada['vista'] as vista:
+            cuerpo = cls._armar_cuerpo(vista, preparada['parametros'])
+        cabecera = cls._CABECERA.pack(
+            cls.MAGICO, cls.VERSION, 0, marca, a_epoch_us(datetime.now()),
+            cuerpo['clientes'], cuerpo['cuentas'],
+            len(cuerpo['datos']), zlib.crc32(cuerpo['datos']), preparada['identidad']
+        )
+
+        # Se escribe aparte y se reemplaza de una vez para no dejar un archivo a medias
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            archivo.write(cabecera)
+            archivo.write(cuerpo['datos'])
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+
+        if db:
+            db.podar_cambios(marca)
+        return len(cabecera) + len(cuerpo['datos'])
+
+    @classmethod
+    def _armar_cuerpo(cls, vista: VistaBanco, parametros: tuple) -> dict:
+        clientes = vista.obtener_clientes()
+        posiciones = {cliente.dni: i for i, cliente in enumerate(clientes)}
+        tipos_cliente = array('B', (cls._TIPOS_CLIENTE.index(c.tipo) for c in clientes))
+        textos_cliente = [texto for c in clientes for texto in (c.dni, c.nombre)]
+
+        cuentas = vista.obtener_cuentas()
+        n = len(cuentas)
+        numeros = [c.numero for c in cuentas]
+        titulares = array('I', (posiciones[c.titular.dni] for c in cuentas))
+        tipos = array('B', bytes(n))
+        saldos, limites, costos, capitales, creaciones, vencimientos = (
+            array('q', bytes(8 * n)) for _ in range(6)
+        )
+        tasas = array('d', bytes(8 * n))
+        # Los totales se suman de las mismas filas que se escriben, así coinciden con ellas
+        totales = [0, 0, 0]
+        descubierto = 0
+        for i, cuenta in enumerate(cuentas):
+            saldos[i] = saldo = vista.saldo(cuenta).centavos
+            if isinstance(cuenta, CuentaCorriente):
+                tipos[i] = 1
+                if saldo < 0:
+                    descubierto -= saldo
+                limites[i] = cuenta.limite_descubierto.centavos
+                costos[i] = cuenta.costo_mantenimiento_base.centavos
+            elif isinstance(cuenta, CuentaPlazoFijo):
+                tipos[i] = 2
+                capitales[i] = cuenta.capital_inicial.centavos
+                tasas[i] = cuenta.tasa_interes
+                creaciones[i] = a_epoch_us(cuenta.fecha_creacion)
+                vencimientos[i] = a_epoch_us(cuenta.fecha_vencimiento)
+            totales[tipos[i]] += saldo
+
+        parametros = cls._PARAMETROS.pack(*parametros, *totales, descubierto)
+
+        bloques = [
+            parametros,
+            tipos_cliente, array('I', map(len, textos_cliente)), ''.join(textos_cliente).encode(),
+            array('I', map(len, numeros)), ''.join(numeros).encode(),
+            titulares, tipos, saldos, limites, costos, capitales, tasas, creaciones, vencimientos,
+        ]
+        partes = []
+        for bloque in bloques:
+            if isinstance(bloque, array):
+                if sys.byteorder == 'big':
+                    bloque = array(bloque.typecode, bloque)
+                    bloque.byteswap()
+                bloque = bloque.tobytes()
+            partes.append(cls._LARGO.pack(len(bloque)))
+            partes.append(bloque)
+        return {'datos': b''.join(partes), 'clientes': len(clientes), 'cuentas': n}
+
+    # Lectura
+    @classmethod
+    def leer_cabecera(cls, ruta: str) -> Tuple[int, datetime, int, int]:
+        """Devuelve (marca, creación, clientes, cuentas) sin leer el cuerpo"""
+        with open(ruta, 'rb') as archivo:
+            cabecera = cls._desempaquetar_cabecera(archivo.read(cls._CABECERA.size))
+        _, _, _, marca, creada, clientes, cuentas, _, _, _ = cabecera
+        return marca, desde_epoch_us(creada), clientes, cuentas
+
+    @classmethod
+    def _desempaquetar_cabecera(cls, datos: bytes) -> tuple:
+        if len(datos) < cls._CABECERA.size:
+            raise InstantaneaInvalida("Archivo truncado")
+        cabecera = cls._CABECERA.unpack_from(datos)
+        if cabecera[0] != cls.MAGICO:
+            raise InstantaneaInvalida("No es una instantánea del banco")
+        if cabecera[1] != cls.VERSION:
+            raise InstantaneaInvalida(f"Versión de instantánea no soportada: {cabecera[1]}")
+        return cabecera
+
+    @classmethod
+    def cargar(cls, ruta: str, db=None, banco: Optional[Banco] = None) -> Tuple[Banco, int]:
+        """
+        Reconstruye el banco desde la instantánea y, con db, reproduce los cambios posteriores
+        Devuelve el banco y la marca de bitácora alcanzada. Lanza InstantaneaInvalida si el
+        archivo está dañado, si se tomó sobre otra base o si la bitácora ya no tiene los
+        cambios desde su marca
+        """
+        with open(ruta, 'rb') as archivo:
+            datos = archivo.read()
+        (_, _, _, marca, _, n_clientes, n_cuentas, largo, crc,
+         identidad) = cls._desempaquetar_cabecera(datos)
+        cuerpo = memoryview(datos)[cls._CABECERA.size:]
+        if len(cuerpo) != largo or zlib.crc32(cuerpo) != crc:
+            raise InstantaneaInvalida("El contenido no coincide con su suma de verificación")
+        if db is not None and identidad.hex() != db.identidad():
+            raise InstantaneaInvalida("La instantánea se tomó sobre otra base de datos")
+
+        banco = banco if banco is not None else Banco()
+        cls._restaurar(banco, cls._bloques(cuerpo), n_clientes, n_cuentas)
+        if db is not None:
+            marca = cls.reproducir(banco, db, marca)
+        return banco, marca
+
+    @classmethod
+    def _bloques(cls, cuerpo: memoryview) -> List[memoryview]:
+        bloques = []
+        posicion = 0
+        while posicion < len(cuerpo):
+            largo, = cls._LARGO.unpack_from(cuerpo, posicion)
+            posicion += cls._LARGO.size
+            bloques.append(cuerpo[posicion:posicion + largo])
+            posicion += largo
+        if len(bloques) != 15:
+            raise InstantaneaInvalida("Cantidad de bloques inesperada")
+        return bloques
+
+    @staticmethod
+    def _array(tipo: str, bloque: memoryview) -> array:
+        columna = array(tipo)
+        columna.frombytes(bloque)
+        if sys.byteorder == 'big':
+            columna.byteswap()
+        return columna
+
+    @staticmethod
+    def _textos(largos: array, bloque: memoryview) -> List[str]:
+        texto = bytes(bloque).decode()
+        limites = list(accumulate(largos, initial=0))
+        return [texto[a:b] for a, b in zip(limites, limites[1:])]
+
+    @classmethod
+    def _restaurar(cls, banco: Banco, bloques: List[memoryview], n_clientes: int, n_cuentas: int):
+        (comision, costo_cc, tasa_pf, saldo_ca, saldo_cc, saldo_pf,
+         descubierto) = cls._PARAMETROS.unpack(bloques[0])
+
+        tipos_cliente = cls._array('B', bloques[1])
+        textos = cls._textos(cls._array('I', bloques[2]), bloques[3])
+        clientes: List[Cliente] = [
+            (ClienteEmpresa if tipo else ClientePersona)(textos[2 * i], textos[2 * i + 1])
+            for i, tipo in enumerate(tipos_cliente)
+        ]
+
+        numeros = cls._textos(cls._array('I', bloques[4]), bloques[5])
+        titulares = cls._array('I', bloques[6])
+        tipos = cls._array('B', bloques[7])
+        saldos, limites, costos, capitales = [cls._array('q', b) for b in bloques[8:12]]
+        tasas = cls._array('d', bloques[12])
+        creaciones, vencimientos = [cls._array('q', b) for b in bloques[13:15]]
+        if len(clientes) != n_clientes or not (len(numeros) == len(tipos) == n_cuentas):
+            raise InstantaneaInvalida("Las cantidades no coinciden con la cabecera")
+
+        cuentas: List[CuentaBase] = []
+        agregar = cuentas.append
+        for numero, titular, tipo, saldo, limite, costo, capital, tasa, creacion, vencimiento in zip(
+            numeros, map(clientes.__getitem__, titulares), tipos, saldos, limites, costos,
+            capitales, tasas, creaciones, vencimientos
+        ):
+            if tipo == 0:
+                agregar(CajaAhorro(numero, titular, Monto(saldo)))
+            elif tipo == 1:
+                agregar(CuentaCorriente(numero, titular, Monto(limite), Monto(costo), Monto(saldo)))
+            else:
+                cuenta = CuentaPlazoFijo(numero, titular, Monto(capital), tasa, 0)
+                cuenta._fecha_creacion = desde_epoch_us(creacion)
+                cuenta._fecha_vencimiento = desde_epoch_us(vencimiento)
+                cuenta._saldo = Monto(saldo)
+                agregar(cuenta)
+
+        banco.comision_transferencia = Monto(comision)
+        banco.costo_mantenimiento_cc = Monto(costo_cc)
+        banco.tasa_interes_pf = tasa_pf
+        banco.restaurar(clientes, cuentas,
+                        {"CA": saldo_ca, "CC": saldo_cc, "PF": saldo_pf}, descubierto)
+
+    @classmethod
+    def reproducir(cls, banco: Banco, db, marca: int) -> int:
+        """Aplica al banco los clientes y cuentas modificados en la base después de la marca"""
+        # Si la bitácora estaba desactivada se invalida al activarla y la marca ya no sirve
+        cambios = db.cambios_desde(marca) if db.activar_bitacora() else None
+        if cambios is None:
+            raise InstantaneaInvalida("La bitácora ya no tiene los cambios posteriores a la instantánea")
+        marca, dnis, numeros = cambios
+
+        # Cada cliente modificado se reconstruye desde su fila, que puede cambiar de tipo
+        eliminados = []
+        for dni in dnis:
+            cliente = db.cargar_cliente(dni)
+            actual = banco.buscar_cliente(dni)
+            if cliente is None:
+                eliminados.append(dni)
+            elif actual is None:
+                banco.alta_cliente(cliente)
+            else:
+                banco.reemplazar_cliente(cliente)
+
+        # Cada cuenta modificada se reemplaza por la versión guardada
+        for numero in numeros:
+            if banco.buscar_cuenta(numero):
+                banco.baja_cuenta(numero)
+            cuenta = db.cargar_cuenta(numero, banco)
+            if cuenta:
+                banco.alta_cuenta(cuenta)
+
+        for dni in eliminados:
+            banco.baja_cliente(dni)
+        return marca
@@ -0,0 +1,138 @@
+import time
+from datetime import datetime
+from typing import Optional
+from .banco import Banco
+from .monto import Monto
+from .tiempo import a_epoch_us
+
+class ResultadoCobro:
+    """Resumen de un cobro de mantenimiento"""
+
+    def __init__(self, periodo: str):
+        self.periodo = periodo
+        self.cuentas = 0
+        # Cuentas que quedaron sin cobrar por no alcanzarles el saldo más el descubierto
+        self.sin_fondos = 0
+        self.total = Monto()
+        self.segundos = 0.0
+
+    @property
+    def ya_cobrado(self) -> bool:
+        return self.cuentas == 0 and self.sin_fondos == 0
+
+    def __str__(self):
+        texto = (f"Mantenimiento {self.periodo}: {self.cuentas} cuentas, ${self.total:,.2f} "
+                 f"en {self.segundos:.2f} s")
+        if self.sin_fondos:
+            texto += f" ({self.sin_fondos} sin fondos suficientes)"
+        return texto
+
+class CobroMantenimiento:
+    """
+    Cobro mensual del costo de mantenimiento de las cuentas corrientes
+
+    El costo de cada cuenta (su costo base, con 10% de descuento para empresas) se calcula
+    y se descuenta en SQL sobre todas las cuentas a la vez, junto con un movimiento por cuenta,
+    en una sola transacción. Cada cuenta queda registrada en cobros_mantenimiento con el
+    periodo cobrado, así que repetir el cobro de un periodo no vuelve a descontar nada.
+    Las cuentas a las que no les alcanza el saldo más el descubierto no se cobran.
+    """
+
+    TIPO_MOVIMIENTO = "COSTO MANTENIMIENTO"
+
+    # Mismo cálculo que CuentaCorriente.costo_mantenimiento: el costo vacío se carga como $50
+    # y el descuento para empresas redondea al centavo hacia arriba desde la mitad.
+    # Como en CuentaCorriente.puede_extraer, solo se cobra si el costo entra en el saldo más
+    # el límite de descubierto; las demás cuentas quedan sin registrar en el periodo y se
+    # cobran al repetirlo cuando tengan fondos
+    _SQL_REGISTRAR = '''
+        INSERT OR IGNORE INTO cobros_mantenimiento (periodo, numero_cuenta, monto)
+        SELECT :periodo, numero, monto
+        FROM (SELECT numero, disponible,
+                     CASE WHEN tipo_titular = 'empresa' THEN (base * 9 + 5) / 10
+                          ELSE base END AS monto
+              FROM (SELECT c.numero, cl.tipo AS tipo_titular,
+                           c.saldo + COALESCE(c.limite_descubierto, 0) AS disponible,
+                           COALESCE(NULLIF(c.costo_mantenimiento, 0), 5000) AS base
+                    FROM cuentas c JOIN clientes cl ON cl.dni = c.dni_titular
+                    WHERE c.tipo = 'CC'))
+        WHERE disponible >= monto
+    '''
+
+    _SQL_SIN_FONDOS = '''
+        SELECT COUNT(*)
+        FROM cuentas c JOIN clientes cl ON cl.dni = c.dni_titular
+        WHERE c.tipo = 'CC' AND NOT EXISTS (
+            SELECT 1 FROM cobros_mantenimiento cobro
+            WHERE cobro.periodo = :periodo AND cobro.numero_cuenta = c.numero)
+    '''
+
+    _SQL_DESCONTAR = '''
+        UPDATE cuentas SET saldo = cuentas.saldo - cobro.monto
+        FROM cobros_mantenimiento AS cobro
+        WHERE cobro.rowid > :marca AND cobro.numero_cuenta = cuentas.numero
+    '''
+
+    _SQL_MOVIMIENTOS = '''
+        INSERT INTO movimientos (numero_cuenta, fecha_us, tipo, monto, saldo_final)
+        SELECT cobro.numero_cuenta, :fecha, :tipo, -cobro.monto, c.saldo
+        FROM cobros_mantenimiento cobro
+        JOIN cuentas c ON c.numero = cobro.numero_cuenta
+        WHERE cobro.rowid > :marca
+    '''
+
+    _SQL_COBRADAS = '''
+        SELECT cobro.numero_cuenta, cobro.monto, c.saldo
+        FROM cobros_mantenimiento cobro
+        JOIN cuentas c ON c.numero = cobro.numero_cuenta
+        WHERE cobro.rowid > :marca
+    '''
+
+    def __init__(self, db, banco: Optional[Banco] = None):
+        self._db = db
+        self._banco = banco
+
+    @staticmethod
+    def periodo_de(fecha: datetime = None) -> str:
+        """Periodo mensual con formato AAAA-MM"""
+        return (fecha or datetime.now()).strftime("%Y-%m")
+
+    def cobrar(self, periodo: str = None) -> ResultadoCobro:
+        """
+        Cobra el mantenimiento del periodo a las cuentas corrientes que aún no lo pagaron
+        Lanza sqlite3.Error si la transacción falla; en ese caso no se cobra nada
+        """
+        periodo = periodo or self.periodo_de()
+        resultado = ResultadoCobro(periodo)
+        inicio = time.perf_counter()
+
+        self._db.esperar_escrituras()
+        with self._db.conexiones.transaccion("IMMEDIATE") as conn:
+            # Las filas nuevas del periodo quedan por encima de la marca
+            marca = conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM cobros_mantenimiento').fetchone()[0]
+            conn.execute(self._SQL_REGISTRAR, {'periodo': periodo})
+            parametros = {'marca': marca}
+            fecha_us = a_epoch_us(datetime.now())
+            conn.execute(self._SQL_DESCONTAR, parametros)
+            conn.execute(self._SQL_MOVIMIENTOS, dict(parametros, fecha=fecha_us,
+                                                     tipo=self.TIPO_MOVIMIENTO))
+            cobradas = conn.execute(self._SQL_COBRADAS, parametros).fetchall()
+            sin_fondos = conn.execute(self._SQL_SIN_FONDOS, {'periodo': periodo}).fetchone()[0]
+
+        resultado.cuentas = len(cobradas)
+        resultado.sin_fondos = sin_fondos
+        resultado.total = Monto(sum(monto for _, monto, _ in cobradas))
+        if self._banco is not None:
+            self._actualizar_banco(cobradas, fecha_us)
+        resultado.segundos = time.perf_counter() - inicio
+        return resultado
+
+    def _actualizar_banco(self, cobradas: list, fecha_us: int):
+        """Lleva a memoria los saldos descontados, con la fecha de los movimientos guardados"""
+        banco = self._banco
+        for numero, monto, saldo in cobradas:
+            # En modo perezoso solo importan las cuentas que ya están en memoria
+            if banco.perezoso and banco.cuenta_residente(numero) is None:
+                continue
+            banco.sincronizar_saldo(numero, Monto(saldo), self.TIPO_MOVIMIENTO, Monto(-monto),
+                                    fecha_us)
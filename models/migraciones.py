@@ -0,0 +1,228 @@
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+from .tiempo import sql_texto_epoch_us, sql_epoch_us_desde_texto
+
+# Cada migración es (versión, descripción, sentencias). Las versiones se aplican en orden,
+# una sola vez y dentro de la misma transacción que registra la versión alcanzada.
+MIGRACIONES: List[Tuple[int, str, List[str]]] = [
+    (1, "Indice de movimientos por cuenta y fecha", [
+        'CREATE INDEX IF NOT EXISTS idx_movimientos_cuenta_fecha ON movimientos (numero_cuenta, fecha)',
+    ]),
+    (2, "Indice de movimientos por fecha", [
+        'CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos (fecha)',
+    ]),
+    (3, "Indice de cuentas por titular", [
+        'CREATE INDEX IF NOT EXISTS idx_cuentas_dni_titular ON cuentas (dni_titular)',
+    ]),
+    (4, "Importes en centavos enteros", [
+        '''
+        CREATE TABLE cuentas_centavos (
+            numero TEXT PRIMARY KEY,
+            dni_titular TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            saldo INTEGER NOT NULL,
+            limite_descubierto INTEGER,
+            costo_mantenimiento INTEGER,
+            capital_inicial INTEGER,
+            tasa_interes REAL,
+            fecha_creacion TEXT,
+            fecha_vencimiento TEXT,
+            FOREIGN KEY (dni_titular) REFERENCES clientes (dni)
+        )
+        ''',
+        '''
+        INSERT INTO cuentas_centavos
+        SELECT numero, dni_titular, tipo,
+               CAST(ROUND(saldo * 100) AS INTEGER),
+               CAST(ROUND(limite_descubierto * 100) AS INTEGER),
+               CAST(ROUND(costo_mantenimiento * 100) AS INTEGER),
+               CAST(ROUND(capital_inicial * 100) AS INTEGER),
+               tasa_interes, fecha_creacion, fecha_vencimiento
+        FROM cuentas
+        ''',
+        'DROP TABLE cuentas',
+        'ALTER TABLE cuentas_centavos RENAME TO cuentas',
+        'CREATE INDEX IF NOT EXISTS idx_cuentas_dni_titular ON cuentas (dni_titular)',
+        '''
+        CREATE TABLE movimientos_centavos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_cuenta TEXT NOT NULL,
+            fecha TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            monto INTEGER NOT NULL,
+            saldo_final INTEGER NOT NULL,
+            FOREIGN KEY (numero_cuenta) REFERENCES cuentas (numero)
+        )
+        ''',
+        '''
+        INSERT INTO movimientos_centavos
+        SELECT id, numero_cuenta, fecha, tipo,
+               CAST(ROUND(monto * 100) AS INTEGER),
+               CAST(ROUND(saldo_final * 100) AS INTEGER)
+        FROM movimientos
+        ''',
+        'DROP TABLE movimientos',
+        'ALTER TABLE movimientos_centavos RENAME TO movimientos',
+        'CREATE INDEX IF NOT EXISTS idx_movimientos_cuenta_fecha ON movimientos (numero_cuenta, fecha)',
+        'CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos (fecha)',
+    ]),
+    (5, "Fechas como microsegundos desde la epoca", [
+        f'''
+        CREATE TABLE cuentas_epoch (
+            numero TEXT PRIMARY KEY,
+            dni_titular TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            saldo INTEGER NOT NULL,
+            limite_descubierto INTEGER,
+            costo_mantenimiento INTEGER,
+            capital_inicial INTEGER,
+            tasa_interes REAL,
+            fecha_creacion_us INTEGER,
+            fecha_vencimiento_us INTEGER,
+            fecha_creacion TEXT GENERATED ALWAYS AS ({sql_texto_epoch_us('fecha_creacion_us')}) VIRTUAL,
+            fecha_vencimiento TEXT GENERATED ALWAYS AS ({sql_texto_epoch_us('fecha_vencimiento_us')}) VIRTUAL,
+            FOREIGN KEY (dni_titular) REFERENCES clientes (dni)
+        )
+        ''',
+        f'''
+        INSERT INTO cuentas_epoch
+        (numero, dni_titular, tipo, saldo, limite_descubierto, costo_mantenimiento,
+         capital_inicial, tasa_interes, fecha_creacion_us, fecha_vencimiento_us)
+        SELECT numero, dni_titular, tipo, saldo, limite_descubierto, costo_mantenimiento,
+               capital_inicial, tasa_interes,
+               CASE WHEN fecha_creacion IS NULL THEN NULL 
+                    ELSE {sql_epoch_us_desde_texto('fecha_creacion')} END,
+               CASE WHEN fecha_vencimiento IS NULL THEN NULL 
+                    ELSE {sql_epoch_us_desde_texto('fecha_vencimiento')} END
+        FROM cuentas
+        ''',
+        'DROP TABLE cuentas',
+        'ALTER TABLE cuentas_epoch RENAME TO cuentas',
+        'CREATE INDEX IF NOT EXISTS idx_cuentas_dni_titular ON cuentas (dni_titular)',
+        f'''
+        CREATE TABLE movimientos_epoch (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_cuenta TEXT NOT NULL,
+            fecha_us INTEGER NOT NULL,
+            fecha TEXT GENERATED ALWAYS AS ({sql_texto_epoch_us('fecha_us')}) VIRTUAL,
+            tipo TEXT NOT NULL,
+            monto INTEGER NOT NULL,
+            saldo_final INTEGER NOT NULL,
+            FOREIGN KEY (numero_cuenta) REFERENCES cuentas (numero)
+        )
+        ''',
+        f'''
+        INSERT INTO movimientos_epoch (id, numero_cuenta, fecha_us, tipo, monto, saldo_final)
+        SELECT id, numero_cuenta, {sql_epoch_us_desde_texto('fecha')}, tipo, monto, saldo_final
+        FROM movimientos
+        ''',
+        'DROP TABLE movimientos',
+        'ALTER TABLE movimientos_epoch RENAME TO movimientos',
+        'CREATE INDEX IF NOT EXISTS idx_movimientos_cuenta_fecha_us ON movimientos (numero_cuenta, fecha_us)',
+        'CREATE INDEX IF NOT EXISTS idx_movimientos_fecha_us ON movimientos (fecha_us)',
+    ]),
+    (6, "Progreso de importaciones masivas", [
+        '''
+        CREATE TABLE IF NOT EXISTS importaciones (
+            archivo TEXT NOT NULL,
+            entidad TEXT NOT NULL,
+            filas INTEGER NOT NULL,
+            completada INTEGER NOT NULL DEFAULT 0,
+            actualizada TEXT NOT NULL,
+            PRIMARY KEY (archivo, entidad)
+        )
+        ''',
+    ]),
+    (7, "Cobros de mantenimiento por periodo", [
+        '''
+        CREATE TABLE IF NOT EXISTS cobros_mantenimiento (
+            periodo TEXT NOT NULL,
+            numero_cuenta TEXT NOT NULL,
+            monto INTEGER NOT NULL,
+            PRIMARY KEY (periodo, numero_cuenta)
+        )
+        ''',
+        # Hasta esta versión se guardaba el costo con el descuento de empresa ya aplicado;
+        # se recupera el costo base (exacto para costos múltiplos de 10 centavos)
+        '''
+        UPDATE cuentas SET costo_mantenimiento = CAST(ROUND(costo_mantenimiento * 10 / 9.0) AS INTEGER)
+        WHERE tipo = 'CC' AND costo_mantenimiento > 0
+          AND dni_titular IN (SELECT dni FROM clientes WHERE tipo = 'empresa')
+        ''',
+    ]),
+    # Los triggers que llenan la bitácora los crea DatabaseManager.activar_bitacora,
+    # solo cuando se usan instantáneas
+    (8, "Bitacora de cambios en clientes y cuentas", [
+        # AUTOINCREMENT para que los números no se reutilicen al podar la bitácora
+        '''
+        CREATE TABLE IF NOT EXISTS bitacora (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabla TEXT NOT NULL,
+            clave TEXT NOT NULL
+        )
+        ''',
+    ]),
+    # Identifica la base entre reemplazos del archivo: una instantánea solo se reproduce
+    # sobre la misma base en la que se tomó
+    (9, "Identidad de la base de datos", [
+        'CREATE TABLE IF NOT EXISTS identidad (id TEXT NOT NULL)',
+        '''
+        INSERT INTO identidad (id)
+        SELECT lower(hex(randomblob(16))) WHERE NOT EXISTS (SELECT 1 FROM identidad)
+        ''',
+    ]),
+]
+
+# Índices secundarios del esquema actual por tabla. La importación masiva los elimina
+# durante la carga; si se interrumpe sin recrearlos, restaurar_indices los vuelve a crear.
+INDICES: Dict[str, List[Tuple[str, str]]] = {
+    "clientes": [],
+    "cuentas": [
+        ('idx_cuentas_dni_titular',
+         'CREATE INDEX IF NOT EXISTS idx_cuentas_dni_titular ON cuentas (dni_titular)'),
+    ],
+    "movimientos": [
+        ('idx_movimientos_cuenta_fecha_us',
+         'CREATE INDEX IF NOT EXISTS idx_movimientos_cuenta_fecha_us '
+         'ON movimientos (numero_cuenta, fecha_us)'),
+        ('idx_movimientos_fecha_us',
+         'CREATE INDEX IF NOT EXISTS idx_movimientos_fecha_us ON movimientos (fecha_us)'),
+    ],
+}
+
+def version_actual(conn: sqlite3.Connection) -> int:
+    """Obtiene la versión de esquema registrada en la base de datos"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            aplicada TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+def aplicar_migraciones(conn: sqlite3.Connection) -> int:
+    """
+    Aplica las migraciones pendientes dentro de la transacción en curso
+    Devuelve la versión de esquema resultante
+    """
+    version = version_actual(conn)
+    for numero, descripcion, sentencias in MIGRACIONES:
+        if numero <= version:
+            continue
+        for sentencia in sentencias:
+            conn.execute(sentencia)
+        conn.execute(
+            'INSERT INTO schema_version (version, descripcion) VALUES (?, ?)',
+            (numero, descripcion)
+        )
+        version = numero
+    return version
+
+def restaurar_indices(conn: sqlite3.Connection, tabla: Optional[str] = None):
+    """Crea los índices secundarios que falten, de una tabla o de todas"""
+    tablas = [tabla] if tabla is not None else list(INDICES)
+    for nombre_tabla in tablas:
+        for _, sentencia in INDICES[nombre_tabla]:
+            conn.execute(sentencia)
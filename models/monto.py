@@ -0,0 +1,154 @@
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+from typing import Optional, Union
+
+class Monto:
+    """
+    Importe de punto fijo almacenado como cantidad entera de centavos
+    Las operaciones con números que no son Monto interpretan el número en pesos
+    """
+    __slots__ = ('_centavos',)
+
+    def __init__(self, centavos: int = 0):
+        self._centavos = int(centavos)
+
+    @classmethod
+    def de_pesos(cls, valor: Union[int, float, str, Decimal]) -> 'Monto':
+        """Crea un monto a partir de un valor en pesos, redondeando al centavo"""
+        if isinstance(valor, int):
+            return cls(valor * 100)
+        centavos = (Decimal(str(valor)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+        return cls(int(centavos))
+
+    @classmethod
+    def convertir(cls, valor) -> 'Monto':
+        """Devuelve el valor como Monto; los números se interpretan en pesos"""
+        if isinstance(valor, Monto):
+            return valor
+        return cls.de_pesos(valor)
+
+    @property
+    def centavos(self) -> int:
+        return self._centavos
+
+    @property
+    def pesos(self) -> Decimal:
+        return Decimal(self._centavos).scaleb(-2)
+
+    # Aritmética
+    def __add__(self, otro) -> 'Monto':
+        if type(otro) is Monto:
+            return Monto(self._centavos + otro._centavos)
+        try:
+            return Monto(self._centavos + Monto.convertir(otro)._centavos)
+        except (TypeError, ValueError, ArithmeticError):
+            return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, otro) -> 'Monto':
+        if type(otro) is Monto:
+            return Monto(self._centavos - otro._centavos)
+        try:
+            return Monto(self._centavos - Monto.convertir(otro)._centavos)
+        except (TypeError, ValueError, ArithmeticError):
+            return NotImplemented
+
+    def __rsub__(self, otro) -> 'Monto':
+        try:
+            return Monto(Monto.convertir(otro)._centavos - self._centavos)
+        except (TypeError, ValueError, ArithmeticError):
+            return NotImplemented
+
+    def __mul__(self, factor) -> 'Monto':
+        """Multiplica por un factor escalar redondeando al centavo"""
+        if isinstance(factor, Monto):
+            return NotImplemented
+        if isinstance(factor, int):
+            return Monto(self._centavos * factor)
+        try:
+            producto = Decimal(self._centavos) * Decimal(str(factor))
+        except (TypeError, ValueError, ArithmeticError):
+            return NotImplemented
+        return Monto(int(producto.quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, otro):
+        """Divide por otro monto (devuelve la razón) o por un escalar (devuelve un monto)"""
+        if isinstance(otro, Monto):
+            return self._centavos / otro._centavos
+        return self * (1 / Decimal(str(otro)))
+
+    def __neg__(self) -> 'Monto':
+        return Monto(-self._centavos)
+
+    def __pos__(self) -> 'Monto':
+        return self
+
+    def __abs__(self) -> 'Monto':
+        return Monto(abs(self._centavos))
+
+    # Comparaciones
+    def _comparables(self, otro) -> Optional[tuple]:
+        """
+        Par de valores equivalentes para comparar con otro número, o None si no es número
+        Los números que no son enteros se comparan con el valor exacto en pesos, sin
+        redondear, así dos valores iguales siempre tienen el mismo hash
+        """
+        # Caminos rápidos para los casos habituales: otro monto o un entero en pesos
+        if type(otro) is Monto:
+            return self._centavos, otro._centavos
+        if type(otro) is int:
+            return self._centavos, otro * 100
+        if isinstance(otro, (int, float, Decimal, Fraction)):
+            try:
+                return Fraction(self._centavos, 100), Fraction(otro)
+            except (ValueError, OverflowError):
+                # Infinitos y NaN se comparan como float
+                return float(self), float(otro)
+        return None
+
+    def __eq__(self, otro) -> bool:
+        par = self._comparables(otro)
+        return NotImplemented if par is None else par[0] == par[1]
+
+    def __lt__(self, otro) -> bool:
+        par = self._comparables(otro)
+        return NotImplemented if par is None else par[0] < par[1]
+
+    def __le__(self, otro) -> bool:
+        par = self._comparables(otro)
+        return NotImplemented if par is None else par[0] <= par[1]
+
+    def __gt__(self, otro) -> bool:
+        par = self._comparables(otro)
+        return NotImplemented if par is None else par[0] > par[1]
+
+    def __ge__(self, otro) -> bool:
+        par = self._comparables(otro)
+        return NotImplemented if par is None else par[0] >= par[1]
+
+    def __hash__(self) -> int:
+        # Igual que el número que se compara: el valor en pesos, así Monto(500) y 5
+        # tienen el mismo hash (y también Decimal('5.00') o Fraction(5))
+        pesos, resto = divmod(self._centavos, 100)
+        if not resto:
+            return hash(pesos)
+        return hash(Fraction(self._centavos, 100))
+
+    def __bool__(self) -> bool:
+        return self._centavos != 0
+
+    # Conversiones para la interfaz
+    def __float__(self) -> float:
+        return self._centavos / 100
+
+    def __format__(self, especificacion: str) -> str:
+        return format(self.pesos, especificacion or ".2f")
+
+    def __str__(self) -> str:
+        return format(self, ".2f")
+
+    def __repr__(self) -> str:
+        return f"Monto('{self}')"
@@ -0,0 +1,477 @@
+import multiprocessing
+import uuid
+import zlib
+from typing import Dict, List, Optional
+from .banco import Banco
+from .database import DatabaseManager, UnidadDeTrabajo
+from .entidades import ClientePersona, ClienteEmpresa, CajaAhorro, CuentaCorriente, CuentaPlazoFijo
+from .monto import Monto
+from .registro_movimientos import PoliticaMovimientos
+
+# Estados de una transferencia entre particiones
+PREPARADA = "preparada"
+CONFIRMADA = "confirmada"
+ABORTADA = "abortada"
+
+def particion_de(numero: str, cantidad: int) -> int:
+    """Partición dueña de una cuenta; estable entre procesos, a diferencia de hash()"""
+    return zlib.crc32(numero.encode('utf-8')) % cantidad
+
+class Particion:
+    """
+    Banco y base de datos propios de un proceso de partición
+    Los clientes se replican en todas las particiones; cada cuenta vive en una sola
+    """
+
+    # Solo las bases de partición registran transferencias en dos fases
+    _SQL_TABLA_TRANSFERENCIAS = '''
+        CREATE TABLE IF NOT EXISTS transferencias_particion (
+            id TEXT PRIMARY KEY,
+            rol TEXT NOT NULL,
+            numero_cuenta TEXT NOT NULL,
+            contraparte TEXT NOT NULL,
+            monto INTEGER NOT NULL,
+            comision INTEGER NOT NULL DEFAULT 0,
+            estado TEXT NOT NULL
+        )
+    '''
+
+    def __init__(self, db_path: str):
+        self.db = DatabaseManager(db_path)
+        with self.db.conexiones.transaccion() as conn:
+            conn.execute(self._SQL_TABLA_TRANSFERENCIAS)
+        # Cada partición lee de su propia base los movimientos que no tiene en memoria
+        self.banco = Banco(movimientos=PoliticaMovimientos(historial=self.db))
+        for cliente in self.db.cargar_clientes():
+            self.banco.alta_cliente(cliente)
+        self.db.cargar_cuentas(self.banco)
+
+    def cerrar(self):
+        self.db.cerrar()
+
+    # Altas
+    def alta_cliente(self, dni: str, nombre: str, tipo: str) -> bool:
+        cliente = ClientePersona(dni, nombre) if tipo == "persona" else ClienteEmpresa(dni, nombre)
+        return self.banco.alta_cliente(cliente) and self.db.guardar_cliente(cliente)
+
+    def alta_cuenta(self, numero: str, dni_titular: str, tipo: str, saldo_inicial=0,
+                    limite_descubierto=1000.0, plazo_dias: int = 30) -> bool:
+        cliente = self.banco.buscar_cliente(dni_titular)
+        if not cliente:
+            return False
+        if tipo == "CA":
+            cuenta = CajaAhorro(numero, cliente, saldo_inicial)
+        elif tipo == "CC":
+            cuenta = CuentaCorriente(numero, cliente, limite_descubierto,
+                                     self.banco.costo_mantenimiento_cc, saldo_inicial)
+        elif tipo == "PF":
+            cuenta = CuentaPlazoFijo(numero, cliente, saldo_inicial,
+                                     self.banco.tasa_interes_pf, plazo_dias)
+        else:
+            return False
+        return self.banco.alta_cuenta(cuenta) and self.db.guardar_cuenta(cuenta)
+
+    # Operaciones locales
+    def saldo(self, numero: str) -> Optional[Monto]:
+        cuenta = self.banco.buscar_cuenta(numero)
+        return cuenta.saldo if cuenta else None
+
+    def aplicar_lote(self, operaciones: List[Dict]) -> List[tuple]:
+        """Aplica un lote de operaciones cuyas cuentas pertenecen a esta partición"""
+        unidad = UnidadDeTrabajo()
+        resultados = self.banco.aplicar_lote(operaciones, unidad)
+        if not self.db.confirmar(unidad):
+            # Memoria vuelve a lo guardado: sin los movimientos y con los saldos de la base
+            self.banco.anular_movimientos(unidad.movimientos)
+            for numero in unidad.numeros_cuentas:
+                saldo = self.db.saldo_guardado(numero)
+                if saldo is not None:
+                    self.banco.sincronizar_saldo(numero, saldo)
+            return [(False, "Error al guardar") if exito else (exito, mensaje)
+                    for exito, mensaje in resultados]
+        return resultados
+
+    def resumen(self) -> Dict:
+        return self.banco.resumen()
+
+    # Transferencias entre particiones
+    def _registrar_transferencia(self, conn, id_transferencia: str, rol: str, numero: str,
+                                 contraparte: str, monto: Monto, comision: Monto, estado: str):
+        conn.execute('''
+            INSERT OR REPLACE INTO transferencias_particion
+            (id, rol, numero_cuenta, contraparte, monto, comision, estado)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (id_transferencia, rol, numero, contraparte, monto.centavos, comision.centavos, estado))
+
+    def _transferencia(self, id_transferencia: str) -> Optional[tuple]:
+        with self.db.conexiones.lectura() as conn:
+            return conn.execute('''
+                SELECT rol, numero_cuenta, contraparte, monto, comision, estado
+                FROM transferencias_particion WHERE id = ?
+            ''', (id_transferencia,)).fetchone()
+
+    def _persistir(self, unidad: UnidadDeTrabajo, *registro):
+        """Guarda la unidad y el estado de la transferencia en una sola transacción"""
+        with self.db.conexiones.transaccion() as conn:
+            self._registrar_transferencia(conn, *registro)
+            if not self.db.confirmar(unidad):
+                raise RuntimeError("Error al guardar la transferencia")
+
+    def _persistir_o_revertir(self, unidad: UnidadDeTrabajo, cuenta, saldo_anterior, *registro):
+        """Persiste la fase; si falla, la cuenta vuelve al saldo que tenía antes de aplicarla"""
+        try:
+            self._persistir(unidad, *registro)
+        except RuntimeError:
+            if cuenta is not None:
+                self.banco.anular_movimientos(unidad.movimientos)
+                cuenta._ajustar_saldo(saldo_anterior)
+            raise
+
+    def preparar_credito(self, id_transferencia: str, numero: str, origen: str,
+                         monto) -> Optional[str]:
+        """
+        Primera fase en la partición destino: verifica la cuenta y registra la
+        transferencia como preparada. Devuelve el DNI del titular o None si no existe
+        """
+        cuenta = self.banco.buscar_cuenta(numero)
+        if not cuenta:
+            return None
+        with self.db.conexiones.transaccion() as conn:
+            self._registrar_transferencia(conn, id_transferencia, "credito", numero, origen,
+                                          Monto.convertir(monto), Monto(), PREPARADA)
+        return cuenta.titular.dni
+
+    def preparar_debito(self, id_transferencia: str, numero: str, destino: str,
+                        monto, dni_destino: str) -> bool:
+        """
+        Primera fase en la partición origen: descuenta monto y comisión y los deja
+        reservados hasta la decisión. Devuelve False si no hay fondos
+        """
+        monto = Monto.convertir(monto)
+        cuenta = self.banco.buscar_cuenta(numero)
+        if not cuenta:
+            return False
+        comision = Monto()
+        if cuenta.titular.dni != dni_destino:
+            comision = self.banco.comision_transferencia
+        if not cuenta.puede_extraer(monto + comision):
+            return False
+
+        saldo_anterior = cuenta.saldo
+        unidad = UnidadDeTrabajo()
+        if comision > 0:
+            cuenta._aplicar_movimiento("COMISION TRANSFERENCIA", -comision)
+            unidad.registrar_movimiento(numero, "COMISION TRANSFERENCIA", -comision, cuenta.saldo,
+                                        cuenta.ultimo_movimiento_us)
+        cuenta._aplicar_movimiento(f"TRANSFERENCIA A {destino}", -monto)
+        unidad.registrar_movimiento(numero, f"TRANSFERENCIA A {destino}", -monto, cuenta.saldo,
+                                    cuenta.ultimo_movimiento_us)
+        unidad.actualizar_saldo(cuenta)
+        try:
+            self._persistir(unidad, id_transferencia, "debito", numero, destino,
+                            monto, comision, PREPARADA)
+        except RuntimeError:
+            self.banco.anular_movimientos(unidad.movimientos)
+            cuenta._ajustar_saldo(saldo_anterior)
+            return False
+        return True
+
+    def confirmar_transferencia(self, id_transferencia: str) -> bool:
+        """Segunda fase: confirma la transferencia; repetirla no tiene efecto"""
+        fila = self._transferencia(id_transferencia)
+        if not fila or fila[5] == ABORTADA:
+            return False
+        rol, numero, contraparte, monto, comision, estado = fila
+        if estado == CONFIRMADA:
+            return True
+
+        unidad = UnidadDeTrabajo()
+        cuenta = saldo_anterior = None
+        if rol == "credito":
+            cuenta = self.banco.buscar_cuenta(numero)
+            saldo_anterior = cuenta.saldo
+            cuenta._aplicar_movimiento(f"TRANSFERENCIA DE {contraparte}", Monto(monto))
+            unidad.actualizar_saldo(cuenta)
+            unidad.registrar_movimiento(numero, f"TRANSFERENCIA DE {contraparte}", Monto(monto),
+                                        cuenta.saldo, cuenta.ultimo_movimiento_us)
+        self._persistir_o_revertir(unidad, cuenta, saldo_anterior, id_transferencia, rol, numero,
+                                   contraparte, Monto(monto), Monto(comision), CONFIRMADA)
+        return True
+
+    def abortar_transferencia(self, id_transferencia: str) -> bool:
+        """Segunda fase: anula la transferencia y devuelve lo reservado en el débito"""
+        fila = self._transferencia(id_transferencia)
+        if not fila:
+            return True
+        rol, numero, contraparte, monto, comision, estado = fila
+        if estado == CONFIRMADA:
+            return False
+        if estado == ABORTADA:
+            return True
+
+        unidad = UnidadDeTrabajo()
+        cuenta = saldo_anterior = None
+        if rol == "debito":
+            cuenta = self.banco.buscar_cuenta(numero)
+            saldo_anterior = cuenta.saldo
+            reintegro = Monto(monto + comision)
+            cuenta._aplicar_movimiento(f"ANULACION TRANSFERENCIA A {contraparte}", reintegro)
+            unidad.actualizar_saldo(cuenta)
+            unidad.registrar_movimiento(numero, f"ANULACION TRANSFERENCIA A {contraparte}",
+                                        reintegro, cuenta.saldo, cuenta.ultimo_movimiento_us)
+        self._persistir_o_revertir(unidad, cuenta, saldo_anterior, id_transferencia, rol, numero,
+                                   contraparte, Monto(monto), Monto(comision), ABORTADA)
+        return True
+
+    def transferencias_pendientes(self) -> List[tuple]:
+        """Transferencias preparadas sin decisión: (id, rol, estado)"""
+        with self.db.conexiones.lectura() as conn:
+            return conn.execute(
+                'SELECT id, rol, estado FROM transferencias_particion WHERE estado = ?',
+                (PREPARADA,)
+            ).fetchall()
+
+    def estado_transferencia(self, id_transferencia: str) -> Optional[str]:
+        fila = self._transferencia(id_transferencia)
+        return fila[5] if fila else None
+
+def _servir_particion(conexion, db_path: str):
+    """Bucle del proceso de partición: ejecuta los comandos que envía el enrutador"""
+    particion = Particion(db_path)
+    while True:
+        comando, argumentos = conexion.recv()
+        if comando == "cerrar":
+            particion.cerrar()
+            conexion.send((True, None))
+            break
+        try:
+            conexion.send((True, getattr(particion, comando)(*argumentos)))
+        except Exception as e:
+            conexion.send((False, f"{type(e).__name__}: {e}"))
+
+class EnrutadorParticiones:
+    """
+    Reparte las cuentas entre varios procesos, cada uno con su Banco y su archivo SQLite
+
+    Las operaciones se envían a la partición dueña de la cuenta. Las transferencias
+    entre particiones usan dos fases: se prepara el crédito en destino y el débito en
+    origen (que reserva los fondos) y recién entonces se confirman ambas; si alguna
+    preparación falla, o falla la comunicación antes de decidir, se anulan. La
+    confirmación del crédito es el punto de decisión, de modo que recuperar() puede
+    completar o anular lo que quedó a medias
+    """
+
+    # Errores de una partición o de la comunicación con su proceso
+    _ERRORES_PARTICION = (RuntimeError, EOFError, OSError)
+
+    def __init__(self, rutas_db: List[str]):
+        self._procesos = []
+        self._conexiones = []
+        for ruta in rutas_db:
+            extremo_local, extremo_remoto = multiprocessing.Pipe()
+            proceso = multiprocessing.Process(target=_servir_particion,
+                                              args=(extremo_remoto, ruta), daemon=True)
+            proceso.start()
+            self._procesos.append(proceso)
+            self._conexiones.append(extremo_local)
+        self.recuperar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    @property
+    def cantidad(self) -> int:
+        return len(self._conexiones)
+
+    def particion(self, numero: str) -> int:
+        return particion_de(numero, self.cantidad)
+
+    # Comunicación con los procesos
+    def _respuesta(self, indice: int):
+        exito, valor = self._conexiones[indice].recv()
+        if not exito:
+            raise RuntimeError(f"Partición {indice}: {valor}")
+        return valor
+
+    def _llamar(self, indice: int, comando: str, *argumentos):
+        self._conexiones[indice].send((comando, argumentos))
+        return self._respuesta(indice)
+
+    def _llamar_varias(self, llamadas: Dict[int, tuple]) -> Dict[int, object]:
+        """Envía un comando a varias particiones a la vez y espera todas las respuestas"""
+        for indice, (comando, *argumentos) in llamadas.items():
+            self._conexiones[indice].send((comando, tuple(argumentos)))
+        return {indice: self._respuesta(indice) for indice in llamadas}
+
+    def cerrar(self):
+        """Detiene los procesos de partición"""
+        for indice, conexion in enumerate(self._conexiones):
+            if self._procesos[indice].is_alive():
+                conexion.send(("cerrar", ()))
+                self._respuesta(indice)
+        for proceso in self._procesos:
+            proceso.join()
+        self._conexiones = []
+        self._procesos = []
+
+    # Altas
+    def alta_cliente(self, dni: str, nombre: str, tipo: str) -> bool:
+        """Da de alta un cliente en todas las particiones"""
+        resultados = self._llamar_varias({i: ("alta_cliente", dni, nombre, tipo)
+                                          for i in range(self.cantidad)})
+        return all(resultados.values())
+
+    def alta_cuenta(self, numero: str, dni_titular: str, tipo: str, saldo_inicial=0,
+                    limite_descubierto=1000.0, plazo_dias: int = 30) -> bool:
+        """Da de alta una cuenta (tipo CA, CC o PF) en su partición"""
+        return self._llamar(self.particion(numero), "alta_cuenta", numero, dni_titular, tipo,
+                            saldo_inicial, limite_descubierto, plazo_dias)
+
+    # Operaciones
+    def saldo(self, numero: str) -> Optional[Monto]:
+        return self._llamar(self.particion(numero), "saldo", numero)
+
+    def depositar(self, numero: str, monto) -> bool:
+        return self.aplicar_lote([{'tipo': "DEPOSITO", 'cuenta': numero, 'monto': monto}])[0][0]
+
+    def extraer(self, numero: str, monto) -> bool:
+        return self.aplicar_lote([{'tipo': "EXTRACCION", 'cuenta': numero, 'monto': monto}])[0][0]
+
+    def transferir(self, origen: str, destino: str, monto) -> bool:
+        """Transfiere entre cuentas de la misma o de distintas particiones"""
+        operacion = {'tipo': "TRANSFERENCIA", 'cuenta': origen, 'destino': destino, 'monto': monto}
+        return self.aplicar_lote([operacion])[0][0]
+
+    def _transferir_entre_particiones(self, origen: str, destino: str, monto) -> tuple:
+        """Transferencia en dos fases; devuelve (exito, mensaje)"""
+        try:
+            monto = Monto.convertir(monto)
+        except (TypeError, ValueError, ArithmeticError):
+            return False, f"Monto inválido: {monto}"
+        if monto <= 0:
+            return False, "El monto debe ser mayor a cero"
+
+        id_transferencia = uuid.uuid4().hex
+        p_origen, p_destino = self.particion(origen), self.particion(destino)
+
+        # Fase 1: preparar crédito y débito
+        try:
+            dni_destino = self._llamar(p_destino, "preparar_credito", id_transferencia,
+                                       destino, origen, monto)
+            preparado = dni_destino is not None and self._llamar(
+                p_origen, "preparar_debito", id_transferencia, origen, destino, monto, dni_destino)
+        except self._ERRORES_PARTICION as e:
+            self._anular(id_transferencia, p_origen, p_destino)
+            return False, f"Error preparando la transferencia: {e}"
+        if not preparado:
+            self._anular(id_transferencia, p_origen, p_destino)
+            if dni_destino is None:
+                return False, f"Cuenta destino no encontrada: {destino}"
+            return False, "Fondos insuficientes o cuenta origen no encontrada"
+
+        # Fase 2: el crédito confirmado decide la transferencia
+        try:
+            self._llamar(p_destino, "confirmar_transferencia", id_transferencia)
+        except self._ERRORES_PARTICION as e:
+            try:
+                estado = self._llamar(p_destino, "estado_transferencia", id_transferencia)
+            except self._ERRORES_PARTICION:
+                # El crédito pudo confirmarse antes del fallo: ambas partes quedan
+                # preparadas y recuperar() decide con el estado del destino
+                return False, f"Transferencia sin decidir, pendiente de recuperar(): {e}"
+            if estado == PREPARADA:
+                self._anular(id_transferencia, p_origen, p_destino)
+                return False, f"Error confirmando la transferencia: {e}"
+            if estado != CONFIRMADA:
+                return False, f"Transferencia sin decidir, pendiente de recuperar(): {e}"
+        try:
+            self._llamar(p_origen, "confirmar_transferencia", id_transferencia)
+        except self._ERRORES_PARTICION:
+            # Ya está decidida: recuperar() confirma el débito más adelante
+            return True, "OK (débito pendiente de confirmar)"
+        return True, "OK"
+
+    def _anular(self, id_transferencia: str, *particiones: int):
+        """
+        Anula la transferencia en las particiones indicadas sin propagar errores
+        Lo que no se pueda anular queda preparado y lo resuelve recuperar()
+        """
+        for indice in particiones:
+            try:
+                self._llamar(indice, "abortar_transferencia", id_transferencia)
+            except self._ERRORES_PARTICION:
+                pass
+
+    def aplicar_lote(self, operaciones: List[Dict]) -> List[tuple]:
+        """
+        Aplica un lote como Banco.aplicar_lote repartiéndolo entre las particiones
+        Las operaciones se aplican en el orden del lote: los tramos de operaciones locales
+        se reparten en paralelo entre las particiones, y cada transferencia entre
+        particiones se aplica después del tramo anterior y antes del siguiente
+        """
+        resultados: List[Optional[tuple]] = [None] * len(operaciones)
+        por_particion: Dict[int, List[int]] = {}
+        for posicion, operacion in enumerate(operaciones):
+            indice = self.particion(str(operacion.get('cuenta') or ''))
+            destino = operacion.get('destino')
+            if (str(operacion.get('tipo') or '').upper() == "TRANSFERENCIA" and destino
+                    and self.particion(str(destino)) != indice):
+                self._aplicar_tramo(operaciones, por_particion, resultados)
+                por_particion = {}
+                resultados[posicion] = self._transferir_entre_particiones(
+                    str(operacion['cuenta']), str(destino), operacion.get('monto'))
+            else:
+                por_particion.setdefault(indice, []).append(posicion)
+        self._aplicar_tramo(operaciones, por_particion, resultados)
+        return resultados
+
+    def _aplicar_tramo(self, operaciones: List[Dict], por_particion: Dict[int, List[int]],
+                       resultados: List[Optional[tuple]]):
+        """Aplica en paralelo las operaciones locales de cada partición, en su orden relativo"""
+        if not por_particion:
+            return
+        respuestas = self._llamar_varias({
+            indice: ("aplicar_lote", [operaciones[p] for p in posiciones])
+            for indice, posiciones in por_particion.items()
+        })
+        for indice, posiciones in por_particion.items():
+            for posicion, resultado in zip(posiciones, respuestas[indice]):
+                resultados[posicion] = resultado
+
+    # Informes
+    _CLAVES_CLIENTES = ('total_clientes', 'clientes_persona', 'clientes_empresa')
+
+    def resumen(self) -> Dict:
+        """Informe general (el de Banco.resumen) combinando todas las particiones"""
+        resumenes = list(self._llamar_varias({i: ("resumen",) for i in range(self.cantidad)}).values())
+        informe = {}
+        for clave in resumenes[0]:
+            # Los clientes están replicados: alcanza con los de una partición
+            if clave in self._CLAVES_CLIENTES:
+                informe[clave] = resumenes[0][clave]
+            else:
+                informe[clave] = sum((r[clave] for r in resumenes[1:]), resumenes[0][clave])
+        return informe
+
+    # Recuperación
+    def recuperar(self) -> int:
+        """
+        Completa o anula las transferencias que quedaron preparadas tras una caída
+        Si el crédito llegó a confirmarse la transferencia se confirma; si no, se anula.
+        Devuelve la cantidad de transferencias resueltas
+        """
+        pendientes = self._llamar_varias({i: ("transferencias_pendientes",)
+                                          for i in range(self.cantidad)})
+        ids = {id_transferencia for filas in pendientes.values() for id_transferencia, _, _ in filas}
+        for id_transferencia in ids:
+            estados = self._llamar_varias({i: ("estado_transferencia", id_transferencia)
+                                           for i in range(self.cantidad)})
+            confirmar = CONFIRMADA in estados.values()
+            comando = "confirmar_transferencia" if confirmar else "abortar_transferencia"
+            for indice, filas in pendientes.items():
+                if any(fila[0] == id_transferencia for fila in filas):
+                    self._llamar(indice, comando, id_transferencia)
+        return len(ids)
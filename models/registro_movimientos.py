@@ -0,0 +1,293 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from .monto import Monto
+from .tiempo import a_epoch_us, desde_epoch_us
+
+class Movimiento:
+    """
+    Registro liviano de un movimiento de cuenta
+    Se comporta como una tupla (numero_cuenta, fecha, tipo, monto, saldo_final) y
+    admite acceso por nombre de campo; la fecha guardada se convierte recién al leerla
+    """
+    __slots__ = ('numero_cuenta', '_fecha', 'tipo', 'monto', 'saldo_final', 'id')
+    
+    CAMPOS = ('numero_cuenta', 'fecha', 'tipo', 'monto', 'saldo_final')
+    
+    def __init__(self, numero_cuenta: str, fecha, tipo: str, monto: float, 
+                 saldo_final: float, id: Optional[int] = None):
+        self.numero_cuenta = numero_cuenta
+        self._fecha = fecha
+        self.tipo = tipo
+        self.monto = monto
+        self.saldo_final = saldo_final
+        self.id = id
+    
+    @property
+    def fecha(self) -> datetime:
+        fecha = self._fecha
+        if isinstance(fecha, int):
+            fecha = self._fecha = desde_epoch_us(fecha)
+        elif isinstance(fecha, str):
+            fecha = self._fecha = datetime.fromisoformat(fecha)
+        return fecha
+    
+    def __getitem__(self, clave):
+        if isinstance(clave, str):
+            if clave not in self.CAMPOS:
+                raise KeyError(clave)
+            return getattr(self, clave)
+        return tuple(self)[clave]
+    
+    def get(self, clave: str, defecto=None):
+        """Acceso por nombre de campo al estilo de un diccionario"""
+        return getattr(self, clave) if clave in self.CAMPOS else defecto
+    
+    def __iter__(self):
+        yield self.numero_cuenta
+        yield self.fecha
+        yield self.tipo
+        yield self.monto
+        yield self.saldo_final
+    
+    def __len__(self) -> int:
+        return len(self.CAMPOS)
+    
+    def __eq__(self, otro) -> bool:
+        if isinstance(otro, Movimiento):
+            return tuple(self) == tuple(otro)
+        return NotImplemented
+    
+    def __repr__(self):
+        return f"Movimiento{tuple(self)!r}"
+
+# Los tipos de movimiento se guardan como un código; el texto de cada código es único.
+# Las cuentas de varios hilos comparten el registro, que solo crece bajo el lock
+_TIPOS: List[str] = []
+_CODIGOS: Dict[str, int] = {}
+_LOCK_TIPOS = threading.Lock()
+
+# Tipos que terminan con el número de la otra cuenta; solo el prefijo recibe código, así
+# el registro no crece con la cantidad de cuentas
+_PREFIJOS_CONTRAPARTE = ("ANULACION TRANSFERENCIA A ", "TRANSFERENCIA A ", "TRANSFERENCIA DE ")
+
+def codigo_tipo(tipo: str) -> int:
+    """Código interno de un tipo de movimiento, asignándolo la primera vez"""
+    codigo = _CODIGOS.get(tipo)
+    if codigo is None:
+        with _LOCK_TIPOS:
+            codigo = _CODIGOS.get(tipo)
+            if codigo is None:
+                # El texto se publica antes que el código, así quien lo lee lo encuentra
+                _TIPOS.append(tipo)
+                codigo = _CODIGOS[tipo] = len(_TIPOS) - 1
+    return codigo
+
+def _separar_tipo(tipo: str) -> Tuple[str, Optional[str]]:
+    """Separa un tipo como "TRANSFERENCIA A 123" en su prefijo y la cuenta contraparte"""
+    for prefijo in _PREFIJOS_CONTRAPARTE:
+        if tipo.startswith(prefijo):
+            return prefijo[:-1], tipo[len(prefijo):]
+    return tipo, None
+
+def _unir_tipo(codigo: int, contraparte: Optional[str]) -> str:
+    tipo = _TIPOS[codigo]
+    return tipo if contraparte is None else f"{tipo} {contraparte}"
+
+class PoliticaMovimientos:
+    """
+    Capacidad en memoria e historial de los registros de movimientos de un banco
+    Cada banco tiene la suya y se la pasa a sus cuentas, así dos bancos del mismo
+    proceso (por ejemplo, particiones con bases distintas) no comparten configuración
+    """
+    __slots__ = ('capacidad', 'historial')
+
+    def __init__(self, capacidad: int = 1000, historial=None):
+        if capacidad < 1:
+            raise ValueError("La capacidad debe ser al menos 1")
+        # Movimientos que se conservan en memoria por cuenta
+        self.capacidad = capacidad
+        # Fuente de los movimientos que no están en memoria: un objeto con
+        # movimientos_anteriores (por ejemplo DatabaseManager); sin historial las
+        # consultas ven solo la memoria
+        self.historial = historial
+
+# Política de las cuentas que no pertenecen a ningún banco
+POLITICA_POR_DEFECTO = PoliticaMovimientos()
+
+class RegistroMovimientos:
+    """
+    Movimientos en memoria de una cuenta guardados por columnas
+    Fecha (microsegundos desde la época), monto y saldo en centavos, el código del tipo y
+    la cuenta contraparte de las transferencias se guardan en columnas paralelas ordenadas
+    por fecha, de modo que una consulta por
+    rango de fechas es una búsqueda binaria y no recorre todo el historial
+
+    En memoria solo se conservan los últimos movimientos (ver PoliticaMovimientos); los
+    anteriores, descartados o previos a la carga de la cuenta, se leen del historial en la
+    base. Cada movimiento se guarda en la base con la misma fecha que en memoria, así que
+    la frontera entre ambos es la fecha del primer movimiento en memoria
+    """
+    __slots__ = ('_numero_cuenta', '_fechas', '_montos', '_saldos', '_tipos', '_contrapartes',
+                 '_ultima_fecha', '_sin_anteriores', 'politica')
+
+    def __init__(self, numero_cuenta: str, politica: PoliticaMovimientos = None):
+        self._numero_cuenta = numero_cuenta
+        self._fechas = array('q')
+        self._montos = array('q')
+        self._saldos = array('q')
+        self._tipos = array('I')
+        # None salvo en los movimientos con otra cuenta (ver _PREFIJOS_CONTRAPARTE)
+        self._contrapartes: List[Optional[str]] = []
+        # Fecha del último movimiento agregado, para guardarlo en la base con la misma
+        self._ultima_fecha: Optional[int] = None
+        # Ya se comprobó que el historial no tiene movimientos anteriores a la memoria
+        self._sin_anteriores = False
+        self.politica = politica or POLITICA_POR_DEFECTO
+
+    def __len__(self) -> int:
+        return len(self._fechas)
+
+    @property
+    def ultima_fecha_us(self) -> Optional[int]:
+        """Fecha en microsegundos del último movimiento agregado"""
+        return self._ultima_fecha
+
+    def agregar(self, fecha_us: int, tipo: str, monto: int, saldo_final: int):
+        """Agrega un movimiento con fecha en microsegundos e importes en centavos"""
+        fechas = self._fechas
+        self._ultima_fecha = fecha_us
+        tipo, contraparte = _separar_tipo(tipo)
+        if fechas and fecha_us < fechas[-1]:
+            # Si el reloj retrocedió se inserta en orden para conservar la búsqueda binaria
+            posicion = bisect_right(fechas, fecha_us)
+            fechas.insert(posicion, fecha_us)
+            self._montos.insert(posicion, monto)
+            self._saldos.insert(posicion, saldo_final)
+            self._tipos.insert(posicion, codigo_tipo(tipo))
+            self._contrapartes.insert(posicion, contraparte)
+        else:
+            fechas.append(fecha_us)
+            self._montos.append(monto)
+            self._saldos.append(saldo_final)
+            self._tipos.append(codigo_tipo(tipo))
+            self._contrapartes.append(contraparte)
+        
+        # Se descarta de a tramos para no desplazar los arrays en cada movimiento
+        capacidad = self.politica.capacidad
+        if len(fechas) > capacidad + max(capacidad // 4, 1):
+            self._descartar(len(fechas) - capacidad)
+
+    def quitar(self, fecha_us: int, tipo: str, monto: int) -> bool:
+        """
+        Quita el último movimiento con esa fecha, tipo y monto en centavos, por ejemplo
+        uno que no se pudo guardar en la base. Devuelve False si no está en memoria
+        """
+        fechas = self._fechas
+        tipo, contraparte = _separar_tipo(tipo)
+        codigo = _CODIGOS.get(tipo)
+        for i in range(bisect_right(fechas, fecha_us) - 1, bisect_left(fechas, fecha_us) - 1, -1):
+            if (self._tipos[i] == codigo and self._contrapartes[i] == contraparte
+                    and self._montos[i] == monto):
+                # Como en _descartar, los arrays se reemplazan para no alterar las vistas
+                self._fechas = fechas[:i] + fechas[i + 1:]
+                self._montos = self._montos[:i] + self._montos[i + 1:]
+                self._saldos = self._saldos[:i] + self._saldos[i + 1:]
+                self._tipos = self._tipos[:i] + self._tipos[i + 1:]
+                self._contrapartes = self._contrapartes[:i] + self._contrapartes[i + 1:]
+                return True
+        return False
+
+    def _descartar(self, cantidad: int):
+        """
+        Quita de memoria los movimientos más antiguos
+        Los movimientos con la misma fecha se descartan juntos, para que la frontera con el
+        historial no los separe. Los arrays se reemplazan en lugar de recortarse, así las
+        vistas ya entregadas siguen viendo los suyos
+        """
+        fechas = self._fechas
+        while cantidad < len(fechas) and fechas[cantidad] == fechas[cantidad - 1]:
+            cantidad += 1
+        self._fechas = fechas[cantidad:]
+        self._montos = self._montos[cantidad:]
+        self._saldos = self._saldos[cantidad:]
+        self._tipos = self._tipos[cantidad:]
+        self._contrapartes = self._contrapartes[cantidad:]
+        self._sin_anteriores = False
+
+    def rango(self, fecha_desde: date = None, fecha_hasta: date = None) -> Sequence[Movimiento]:
+        """
+        Movimientos con fecha entre fecha_desde y fecha_hasta, ambas inclusive
+        Si el rango solo abarca la memoria devuelve una vista sin copia; si puede alcanzar
+        movimientos anteriores devuelve una lista que empieza con los del historial
+        """
+        fechas = self._fechas
+        inicio = 0 if fecha_desde is None else bisect_left(fechas, a_epoch_us(fecha_desde))
+        fin = (len(fechas) if fecha_hasta is None
+               else bisect_right(fechas, a_epoch_us(fecha_hasta, fin_del_dia=True)))
+        vista = VistaMovimientos(self._numero_cuenta, self._columnas(), inicio, max(inicio, fin))
+        
+        historial = self.politica.historial
+        if inicio > 0 or historial is None or self._sin_anteriores:
+            return vista
+        
+        # Todo lo guardado antes del primer movimiento en memoria es historial
+        anteriores = historial.movimientos_anteriores(
+            self._numero_cuenta, fechas[0] if fechas else None, fecha_desde, fecha_hasta
+        )
+        if not anteriores:
+            self._sin_anteriores = fecha_desde is None and fecha_hasta is None and bool(fechas)
+            return vista
+        return anteriores + list(vista)
+
+    def _columnas(self) -> tuple:
+        return self._fechas, self._montos, self._saldos, self._tipos, self._contrapartes
+
+class VistaMovimientos:
+    """
+    Secuencia de solo lectura sobre un tramo de un registro de movimientos
+    No copia los datos: cada Movimiento se arma recién al accederlo. Conserva las columnas
+    del registro que la creó, así sigue siendo válida aunque luego se descarten movimientos
+    """
+    __slots__ = ('_numero_cuenta', '_columnas', '_inicio', '_fin')
+
+    def __init__(self, numero_cuenta: str, columnas: tuple, inicio: int, fin: int):
+        self._numero_cuenta = numero_cuenta
+        self._columnas = columnas
+        self._inicio = inicio
+        self._fin = fin
+
+    def __len__(self) -> int:
+        return self._fin - self._inicio
+
+    def _movimiento(self, indice: int) -> Movimiento:
+        fechas, montos, saldos, tipos, contrapartes = self._columnas
+        return Movimiento(self._numero_cuenta, fechas[indice],
+                          _unir_tipo(tipos[indice], contrapartes[indice]),
+                          Monto(montos[indice]), Monto(saldos[indice]))
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            inicio, fin, paso = indice.indices(len(self))
+            if paso != 1:
+                return [self[i] for i in range(inicio, fin, paso)]
+            return VistaMovimientos(self._numero_cuenta, self._columnas, self._inicio + inicio,
+                                    self._inicio + max(inicio, fin))
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError("índice de movimiento fuera de rango")
+        return self._movimiento(self._inicio + indice)
+
+    def __iter__(self) -> Iterator[Movimiento]:
+        movimiento = self._movimiento
+        for indice in range(self._inicio, self._fin):
+            yield movimiento(indice)
+
+    def __bool__(self) -> bool:
+        return self._fin > self._inicio
+
+    def __repr__(self):
+        return f"VistaMovimientos({len(self)} movimientos)"
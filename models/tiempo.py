@@ -0,0 +1,27 @@
+from datetime import date, datetime, time, timedelta
+
+# Las fechas se guardan como microsegundos desde 1970-01-01 sin zona horaria,
+# de modo que la hora local se conserva tal cual al convertir en ambos sentidos
+EPOCA = datetime(1970, 1, 1)
+_MICROSEGUNDO = timedelta(microseconds=1)
+
+def a_epoch_us(fecha: date, fin_del_dia: bool = False) -> int:
+    """Convierte una fecha u hora a microsegundos desde la época"""
+    if not isinstance(fecha, datetime):
+        fecha = datetime.combine(fecha, time.max if fin_del_dia else time.min)
+    return (fecha - EPOCA) // _MICROSEGUNDO
+
+def desde_epoch_us(valor: int) -> datetime:
+    """Convierte microsegundos desde la época a datetime"""
+    return EPOCA + timedelta(microseconds=valor)
+
+def sql_texto_epoch_us(columna: str) -> str:
+    """Expresión SQL que muestra una columna de microsegundos en formato ISO"""
+    return (f"strftime('%Y-%m-%dT%H:%M:%S', {columna} / 1000000, 'unixepoch') "
+            f"|| printf('.%06d', {columna} % 1000000)")
+
+def sql_epoch_us_desde_texto(columna: str) -> str:
+    """Expresión SQL que convierte una fecha ISO en texto a microsegundos"""
+    return (f"CAST(strftime('%s', substr({columna}, 1, 19)) AS INTEGER) * 1000000 "
+            f"+ CASE WHEN length({columna}) > 20 "
+            f"THEN CAST(substr(substr({columna}, 21) || '000000', 1, 6) AS INTEGER) ELSE 0 END")
@@ -0,0 +1,62 @@
+import heapq
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+class AgendaVencimientos:
+    """
+    Cola de prioridad de vencimientos de plazos fijos
+
+    Mantiene un montículo de (fecha_vencimiento, numero): consultar las cuentas vencidas
+    cuesta O(k log n) para las k que vencieron, sin recorrer todas las cuentas. Las bajas
+    no se quitan del montículo; la entrada queda marcada como obsoleta y se descarta al
+    llegar a la cima, y el montículo se reconstruye si las obsoletas pasan a ser mayoría.
+    """
+
+    def __init__(self):
+        self._monticulo: List[Tuple[datetime, str]] = []
+        # Vencimiento vigente de cada cuenta programada
+        self._programadas: Dict[str, datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._programadas)
+
+    def __contains__(self, numero: str) -> bool:
+        return numero in self._programadas
+
+    def programar(self, numero: str, fecha_vencimiento: datetime):
+        """Agrega una cuenta o reemplaza su vencimiento"""
+        self._programadas[numero] = fecha_vencimiento
+        heapq.heappush(self._monticulo, (fecha_vencimiento, numero))
+
+    def cancelar(self, numero: str) -> bool:
+        """Quita una cuenta de la agenda"""
+        if self._programadas.pop(numero, None) is None:
+            return False
+        if len(self._monticulo) > 2 * len(self._programadas) + 64:
+            self._compactar()
+        return True
+
+    def _vigente(self, fecha: datetime, numero: str) -> bool:
+        return self._programadas.get(numero) == fecha
+
+    def _compactar(self):
+        """Reconstruye el montículo solo con las entradas vigentes"""
+        self._monticulo = [(fecha, numero) for numero, fecha in self._programadas.items()]
+        heapq.heapify(self._monticulo)
+
+    def proximo_vencimiento(self) -> Optional[datetime]:
+        """Fecha del próximo vencimiento programado"""
+        while self._monticulo and not self._vigente(*self._monticulo[0]):
+            heapq.heappop(self._monticulo)
+        return self._monticulo[0][0] if self._monticulo else None
+
+    def vencidas(self, ahora: datetime = None) -> List[str]:
+        """Quita de la agenda y devuelve, en orden de vencimiento, las cuentas ya vencidas"""
+        ahora = ahora or datetime.now()
+        numeros = []
+        while self._monticulo and self._monticulo[0][0] <= ahora:
+            fecha, numero = heapq.heappop(self._monticulo)
+            if self._vigente(fecha, numero):
+                del self._programadas[numero]
+                numeros.append(numero)
+        return numeros
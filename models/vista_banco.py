@@ -0,0 +1,153 @@
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from .entidades import Cliente, CuentaBase
+from .monto import Monto
+
+class VistaBanco:
+    """
+    Vista de solo lectura del banco en un instante, para informes largos
+
+    Crearla no copia nada: comparte los diccionarios de clientes, cuentas e índices del
+    banco y guarda los totales del momento. Copia en escritura:
+    - antes del primer alta o baja posterior, el banco le pide a la vista que se quede
+      con una copia propia de esos diccionarios;
+    - antes de cambiar un saldo por primera vez, el banco le entrega el saldo anterior.
+    Así la vista se puede recorrer desde otro hilo con resultados consistentes entre sí,
+    sin bloquear las operaciones del banco mientras dura el informe.
+    """
+    __slots__ = ('epoca', 'creada', '_clientes', '_cuentas', '_cuentas_por_tipo',
+                 '_clientes_por_tipo', '_resumen', '_anteriores',
+                 '_compartida', '_lock', '_al_cerrar', '__weakref__')
+
+    def __init__(self, epoca: int, clientes: Dict[str, Cliente], cuentas: Dict[str, CuentaBase],
+                 cuentas_por_tipo: Dict[str, Dict[str, None]],
+                 clientes_por_tipo: Dict[str, Dict[str, None]],
+                 resumen: Dict, al_cerrar: Optional[Callable[[], None]] = None):
+        self.epoca = epoca
+        self.creada = datetime.now()
+        self._clientes = clientes
+        self._cuentas = cuentas
+        self._cuentas_por_tipo = cuentas_por_tipo
+        self._clientes_por_tipo = clientes_por_tipo
+        # Totales del informe general, armados por el banco al crear la vista
+        self._resumen = resumen
+        # Saldo de cada cuenta al crear la vista, solo para las que cambiaron después
+        self._anteriores: Dict[str, Monto] = {}
+        self._compartida = True
+        # Protege la lectura de los diccionarios compartidos mientras el banco los separa
+        self._lock = threading.Lock()
+        # Avisa al banco que deje de mantener la vista
+        self._al_cerrar = al_cerrar
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        """Deja de recibir los cambios del banco y suelta sus datos; la vista queda vacía"""
+        if self._al_cerrar is not None:
+            self._al_cerrar()
+            self._al_cerrar = None
+        with self._lock:
+            self._clientes, self._cuentas = {}, {}
+            self._cuentas_por_tipo, self._clientes_por_tipo = {}, {}
+            self._anteriores = {}
+            self._compartida = False
+
+    # Copia en escritura (la llama el banco)
+    def _separar(self):
+        """Copia los diccionarios compartidos antes de que el banco los modifique"""
+        with self._lock:
+            if not self._compartida:
+                return
+            self._clientes = dict(self._clientes)
+            self._cuentas = dict(self._cuentas)
+            self._cuentas_por_tipo = {codigo: dict(numeros)
+                                      for codigo, numeros in self._cuentas_por_tipo.items()}
+            self._clientes_por_tipo = {tipo: dict(dnis)
+                                       for tipo, dnis in self._clientes_por_tipo.items()}
+            self._compartida = False
+
+    def _conservar(self, numero: str, anterior: Monto):
+        """Guarda el saldo de la cuenta al crear la vista, si todavía no se guardó"""
+        self._anteriores.setdefault(numero, anterior)
+
+    # Saldos
+    def saldo(self, cuenta: CuentaBase) -> Monto:
+        """Saldo de la cuenta al crear la vista"""
+        # El saldo actual se lee antes de buscar el anterior: el banco guarda el anterior
+        # antes de asignar el nuevo, así que si ya se ve el nuevo el anterior está guardado
+        actual = cuenta.saldo
+        return self._anteriores.get(cuenta.numero, actual)
+
+    def descubierto_utilizado(self, cuenta: CuentaBase) -> Monto:
+        """Descubierto en uso de la cuenta al crear la vista"""
+        return max(Monto(), -self.saldo(cuenta))
+
+    # Clientes y cuentas
+    def buscar_cuenta(self, numero: str) -> Optional[CuentaBase]:
+        with self._lock:
+            return self._cuentas.get(numero)
+
+    def buscar_cliente(self, dni: str) -> Optional[Cliente]:
+        with self._lock:
+            return self._clientes.get(dni)
+
+    def obtener_cuentas(self) -> List[CuentaBase]:
+        with self._lock:
+            return list(self._cuentas.values())
+
+    def obtener_cajas_ahorro(self) -> List[CuentaBase]:
+        return self._cuentas_de_tipo("CA")
+
+    def obtener_cuentas_corriente(self) -> List[CuentaBase]:
+        return self._cuentas_de_tipo("CC")
+
+    def obtener_cuentas_plazo_fijo(self) -> List[CuentaBase]:
+        return self._cuentas_de_tipo("PF")
+
+    def _cuentas_de_tipo(self, codigo: str) -> List[CuentaBase]:
+        with self._lock:
+            cuentas = self._cuentas
+            return [cuentas[numero] for numero in self._cuentas_por_tipo.get(codigo, ())]
+
+    def obtener_clientes(self) -> List[Cliente]:
+        with self._lock:
+            return list(self._clientes.values())
+
+    def obtener_clientes_persona(self) -> List[Cliente]:
+        return self._clientes_de_tipo("persona")
+
+    def obtener_clientes_empresa(self) -> List[Cliente]:
+        return self._clientes_de_tipo("empresa")
+
+    def _clientes_de_tipo(self, tipo: str) -> List[Cliente]:
+        with self._lock:
+            clientes = self._clientes
+            return [clientes[dni] for dni in self._clientes_por_tipo.get(tipo, ())]
+
+    # Totales
+    def contar_cuentas(self, tipo: str = None) -> int:
+        with self._lock:
+            if tipo is None:
+                return len(self._cuentas)
+            return len(self._cuentas_por_tipo.get(tipo, ()))
+
+    def contar_clientes(self, tipo: str = None) -> int:
+        with self._lock:
+            if tipo is None:
+                return len(self._clientes)
+            return len(self._clientes_por_tipo.get(tipo, ()))
+
+    def saldo_total(self) -> Monto:
+        return self._resumen['saldo_total']
+
+    def total_descubierto(self) -> Monto:
+        return self._resumen['total_descubierto']
+
+    def resumen(self) -> Dict:
+        """Totales del informe general al crear la vista"""
+        return dict(self._resumen)
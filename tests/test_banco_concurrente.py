@@ -0,0 +1,100 @@
+import random
+import sys
+import threading
+
+import pytest
+
+from models.banco import Banco
+from models.entidades import CajaAhorro, ClienteEmpresa, ClientePersona, CuentaCorriente
+from models.monto import Monto
+
+HILOS = 8
+OPERACIONES_POR_HILO = 3000
+CUENTAS = 40
+SALDO_INICIAL = Monto.de_pesos(1000)
+
+
+@pytest.fixture(autouse=True)
+def cambios_de_hilo_frecuentes():
+    # Cambiar de hilo cada pocas instrucciones para que las operaciones se intercalen
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(intervalo)
+
+
+def armar_banco(franjas: int) -> Banco:
+    banco = Banco(franjas=franjas)
+    titulares = [ClientePersona("20111111", "Ana"), ClienteEmpresa("30222222", "Acme SA")]
+    for titular in titulares:
+        banco.alta_cliente(titular)
+    for i in range(CUENTAS):
+        titular = titulares[i % 2]
+        if i % 4 < 2:
+            cuenta = CajaAhorro(f"CA-{i}", titular, SALDO_INICIAL)
+        else:
+            cuenta = CuentaCorriente(f"CC-{i}", titular, 500, 50, SALDO_INICIAL)
+        banco.alta_cuenta(cuenta)
+    return banco
+
+
+def operar(banco: Banco, numeros: list, semilla: int, balance: dict, barrera: threading.Barrier):
+    """
+    Mezcla depósitos, extracciones y transferencias al azar y anota en balance el dinero
+    que entró y salió del banco por las operaciones que resultaron exitosas
+    """
+    azar = random.Random(semilla)
+    entradas = salidas = comisiones = Monto()
+    barrera.wait()
+    for _ in range(OPERACIONES_POR_HILO):
+        monto = Monto(azar.randint(1, 30000))
+        operacion = azar.random()
+        if operacion < 0.2:
+            if banco.depositar(azar.choice(numeros), monto):
+                entradas += monto
+        elif operacion < 0.4:
+            if banco.extraer(azar.choice(numeros), monto):
+                salidas += monto
+        else:
+            origen, destino = azar.sample(numeros, 2)
+            titular_origen = banco.buscar_cuenta(origen).titular.dni
+            titular_destino = banco.buscar_cuenta(destino).titular.dni
+            if banco.transferir(origen, destino, monto) and titular_origen != titular_destino:
+                comisiones += banco.comision_transferencia
+    balance[semilla] = (entradas, salidas, comisiones)
+
+
+@pytest.mark.parametrize("franjas", [1, 4, 16])
+def test_transferencias_concurrentes_conservan_el_dinero(franjas):
+    banco = armar_banco(franjas)
+    numeros = [cuenta.numero for cuenta in banco.obtener_cuentas()]
+    total_inicial = banco.saldo_total()
+    assert total_inicial == SALDO_INICIAL * CUENTAS
+
+    balance = {}
+    barrera = threading.Barrier(HILOS)
+    hilos = [threading.Thread(target=operar, args=(banco, numeros, semilla, balance, barrera))
+             for semilla in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(timeout=120)
+    assert not any(hilo.is_alive() for hilo in hilos), "posible interbloqueo entre franjas"
+    assert len(balance) == HILOS
+
+    entradas = sum((e for e, _, _ in balance.values()), Monto())
+    salidas = sum((s for _, s, _ in balance.values()), Monto())
+    comisiones = sum((c for _, _, c in balance.values()), Monto())
+    esperado = total_inicial + entradas - salidas - comisiones
+
+    # Los totales incrementales por franja y la suma de los saldos cuenta por cuenta
+    # tienen que coincidir con el dinero que entró y salió
+    assert banco.saldo_total() == esperado
+    assert sum((cuenta.saldo for cuenta in banco.obtener_cuentas()), Monto()) == esperado
+    assert banco.verificar()
+
+    for cuenta in banco.obtener_cuentas():
+        if isinstance(cuenta, CuentaCorriente):
+            assert cuenta.saldo >= -cuenta.limite_descubierto
+        else:
+            assert cuenta.saldo >= Monto()
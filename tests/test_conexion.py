@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+
+from models.conexion import GestorConexiones
+
+
+@pytest.fixture
+def gestor(tmp_path):
+    gestor = GestorConexiones(str(tmp_path / "conexion.db"))
+    yield gestor
+    gestor.cerrar()
+
+
+def test_commit_fallido_no_deja_la_transaccion_abierta(gestor):
+    with gestor.transaccion() as conn:
+        conn.execute('CREATE TABLE padre (id INTEGER PRIMARY KEY)')
+        conn.execute('CREATE TABLE hijo (padre INTEGER REFERENCES padre (id) '
+                     'DEFERRABLE INITIALLY DEFERRED)')
+    # Con la clave foránea diferida la violación recién se detecta en el COMMIT
+    with gestor.escritura() as conn:
+        conn.execute('PRAGMA foreign_keys=ON')
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with gestor.transaccion() as conn:
+            conn.execute('INSERT INTO hijo VALUES (5)')
+
+    with gestor.transaccion() as conn:
+        conn.execute('INSERT INTO padre VALUES (1)')
+    with gestor.lectura() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM padre').fetchone()[0] == 1
+        assert conn.execute('SELECT COUNT(*) FROM hijo').fetchone()[0] == 0
+
+
+def test_pool_agotado_es_error_de_sqlite(tmp_path):
+    gestor = GestorConexiones(str(tmp_path / "pool.db"), tamano_pool=1, timeout=0.05)
+    try:
+        with gestor.lectura():
+            with pytest.raises(sqlite3.OperationalError):
+                with gestor.lectura():
+                    pass
+    finally:
+        gestor.cerrar()
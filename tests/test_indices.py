@@ -0,0 +1,101 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from models.database import DatabaseManager
+from models.migraciones import INDICES
+
+FECHA = datetime(2026, 1, 15)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "banco.db"))
+    yield db
+    db.cerrar()
+
+
+def plan_movimientos(db, orden, extra='', extra_params=(), **filtros):
+    """Plan de la consulta de movimientos que arma DatabaseManager con esos filtros"""
+    query, params = db._filtrar_movimientos(**filtros)
+    return db.plan_consulta(query + extra + orden, params + list(extra_params))
+
+
+def usa_indice(plan, nombre):
+    return any(f"USING INDEX {nombre} " in paso or f"USING COVERING INDEX {nombre} " in paso
+               for paso in plan)
+
+
+def sin_ordenamiento_temporal(plan):
+    return not any("TEMP B-TREE" in paso for paso in plan)
+
+
+@pytest.mark.parametrize("filtros", [
+    {'numero_cuenta': 'CA-1'},
+    {'numero_cuenta': 'CA-1', 'fecha_desde': FECHA},
+    {'numero_cuenta': 'CA-1', 'fecha_desde': FECHA, 'fecha_hasta': FECHA},
+    {'numero_cuenta': 'CA-1', 'tipo': 'DEPOSITO'},
+])
+def test_movimientos_de_una_cuenta_usan_indice_cuenta_fecha(db, filtros):
+    plan = plan_movimientos(db, ' ORDER BY fecha_us DESC, id DESC', **filtros)
+    assert usa_indice(plan, 'idx_movimientos_cuenta_fecha_us'), plan
+    assert sin_ordenamiento_temporal(plan), plan
+
+
+@pytest.mark.parametrize("filtros", [
+    {'fecha_desde': FECHA},
+    {'fecha_hasta': FECHA},
+    {'fecha_desde': FECHA, 'fecha_hasta': FECHA},
+])
+def test_movimientos_por_fecha_usan_indice_fecha(db, filtros):
+    plan = plan_movimientos(db, ' ORDER BY fecha_us DESC, id DESC', **filtros)
+    assert usa_indice(plan, 'idx_movimientos_fecha_us'), plan
+    assert sin_ordenamiento_temporal(plan), plan
+
+
+def test_historial_anterior_usa_indice_cuenta_fecha(db):
+    # Misma consulta que movimientos_anteriores a partir del segundo bloque
+    plan = plan_movimientos(db, ' ORDER BY fecha_us, id LIMIT ?',
+                            ' AND fecha_us < ? AND (fecha_us, id) > (?, ?)', [0, 0, 0, 1000],
+                            numero_cuenta='CA-1')
+    assert usa_indice(plan, 'idx_movimientos_cuenta_fecha_us'), plan
+    assert sin_ordenamiento_temporal(plan), plan
+
+
+def test_pagina_de_movimientos_usa_indice(db):
+    # Misma consulta que cargar_movimientos_pagina a partir de la segunda página
+    plan = plan_movimientos(db, ' ORDER BY fecha_us DESC, id DESC LIMIT ?',
+                            ' AND (fecha_us, id) < (?, ?)', [0, 0, 101],
+                            numero_cuenta='CA-1')
+    assert usa_indice(plan, 'idx_movimientos_cuenta_fecha_us'), plan
+    assert sin_ordenamiento_temporal(plan), plan
+
+
+def test_cuentas_por_titular_usan_indice(db):
+    plan = db.plan_consulta('SELECT numero FROM cuentas WHERE 1=1 AND dni_titular = ?',
+                            ('20123456',))
+    assert usa_indice(plan, 'idx_cuentas_dni_titular'), plan
+
+
+def test_indices_eliminados_se_recrean_al_abrir(tmp_path):
+    ruta = str(tmp_path / "banco.db")
+    DatabaseManager(ruta).cerrar()
+
+    # Como los deja una importación masiva interrumpida
+    conn = sqlite3.connect(ruta)
+    for indices in INDICES.values():
+        for nombre, _ in indices:
+            conn.execute(f'DROP INDEX {nombre}')
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(ruta)
+    try:
+        with db.conexiones.lectura() as conn:
+            existentes = {fila[0] for fila in
+                          conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        db.cerrar()
+    esperados = {nombre for indices in INDICES.values() for nombre, _ in indices}
+    assert esperados <= existentes
@@ -0,0 +1,45 @@
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from models.monto import Monto
+
+
+@pytest.mark.parametrize("monto, numero", [
+    (Monto(500), 5), (Monto(50), 0.5), (Monto(25), 0.25), (Monto(1), Decimal('0.01')),
+    (Monto(1234), Decimal('12.34')), (Monto(1), Fraction(1, 100)), (Monto(-300), -3),
+    (Monto(-75), -0.75),
+])
+def test_numeros_iguales_tienen_el_mismo_hash(monto, numero):
+    assert monto == numero
+    assert hash(monto) == hash(numero)
+
+
+def test_floats_se_comparan_sin_redondear():
+    # 0.006 redondea a un centavo pero no es igual a un centavo
+    assert Monto(1) != 0.006
+    assert Monto(1) > 0.006
+    assert Monto(1) < 0.011
+    # 0.01 no es representable exacto como float: tampoco es igual
+    assert Monto(1) != 0.01
+    assert Monto(1) == Decimal('0.01')
+
+
+def test_orden_consistente_con_igualdad():
+    for numero in (0.004, 0.005, 0.006, 0.1 + 0.2):
+        monto = Monto.de_pesos(numero)
+        resultados = [monto < numero, monto == numero, monto > numero]
+        assert resultados.count(True) == 1
+
+
+def test_infinitos_y_nan():
+    assert Monto(100) < float('inf')
+    assert Monto(100) > float('-inf')
+    assert Monto(100) != float('nan')
+
+
+def test_no_numeros_no_son_iguales():
+    assert Monto(500) != "5"
+    with pytest.raises(TypeError):
+        Monto(500) < "5"
@@ -0,0 +1,47 @@
+import pytest
+
+from models.database import DatabaseManager
+
+CUENTA = "CA-1"
+MOVIMIENTOS = 25
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "banco.db"), tamano_pool=1, timeout=0.05)
+    # Varios movimientos con la misma fecha para que el orden dependa también del id
+    for i in range(MOVIMIENTOS):
+        db.guardar_movimiento(CUENTA, "DEPOSITO", i + 1, i + 1, fecha_us=1000 + i // 3)
+    yield db
+    db.cerrar()
+
+
+def test_iterador_no_retiene_la_conexion_entre_bloques(db):
+    iterador = db.iter_movimientos(CUENTA, tamano_bloque=4)
+    primeros = [next(iterador) for _ in range(6)]
+    # Con un pool de una sola conexión, otra lectura tiene que poder tomarla
+    assert len(db.cargar_movimientos(CUENTA)) == MOVIMIENTOS
+    restantes = list(iterador)
+    ids = [mov.id for mov in primeros + restantes]
+    assert len(ids) == MOVIMIENTOS == len(set(ids))
+    claves = [(mov._fecha, mov.id) for mov in primeros + restantes]
+    assert claves == sorted(claves, reverse=True)
+
+
+def test_historial_anterior_en_orden_cronologico(db):
+    movimientos = db.movimientos_anteriores(CUENTA, 1005)
+    claves = [(mov._fecha, mov.id) for mov in movimientos]
+    assert claves == sorted(claves)
+    assert len(movimientos) == 15
+
+
+def test_paginas_recorren_todos_los_movimientos(db):
+    vistos, siguiente = [], None
+    while True:
+        pagina, siguiente = db.cargar_movimientos_pagina({'numero_cuenta': CUENTA},
+                                                         siguiente, limite=7)
+        vistos.extend(mov.id for mov in pagina)
+        if siguiente is None:
+            break
+        assert len(pagina) == 7
+    assert len(vistos) == MOVIMIENTOS == len(set(vistos))
@@ -256,7 +256,7 @@ class EditarCuentaDialog(QDialog):
             self.limite_input = QDoubleSpinBox()
             self.limite_input.setMinimum(0)
             self.limite_input.setMaximum(10000)
-            self.limite_input.setValue(self.cuenta.limite_descubierto)
+            self.limite_input.setValue(float(self.cuenta.limite_descubierto))
             layout.addRow("Límite Descubierto:", self.limite_input)
         
         layout.addRow("Número:", self.numero_input)
@@ -2,13 +2,17 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
                             QComboBox, QPushButton, QTableWidget, QTableWidgetItem, 
                             QHeaderView, QMessageBox, QLabel, QTextEdit, QDateEdit,
                             QFileDialog, QDoubleSpinBox, QLineEdit)
-from PyQt6.QtCore import QDate
+from PyQt6.QtCore import QDate, pyqtSignal
 from PyQt6.QtGui import QColor
 from datetime import datetime
 import csv
+import threading
 from models.entidades import CajaAhorro, CuentaCorriente, CuentaPlazoFijo
 
 class InformeGeneralDialog(QDialog):
+    # Texto del informe armado en segundo plano
+    informe_listo = pyqtSignal(str)
+    
     def __init__(self, banco, parent=None):
         super().__init__(parent)
         self.banco = banco
@@ -25,6 +29,7 @@ class InformeGeneralDialog(QDialog):
         self.texto_informe = QTextEdit()
         self.texto_informe.setReadOnly(True)
         layout.addWidget(self.texto_informe)
+        self.informe_listo.connect(self.texto_informe.setPlainText)
         
         # Botones
         buttons_layout = QHBoxLayout()
@@ -47,61 +52,87 @@ class InformeGeneralDialog(QDialog):
     
     def generar_informe(self):
         """Genera el informe general del banco"""
+        if self.banco.perezoso:
+            self.texto_informe.setPlainText(self.armar_informe(self.banco, lambda cuenta: cuenta.saldo))
+            return
+        
+        # La vista fija el estado del banco en este instante; el texto se arma en otro
+        # hilo mientras las operaciones siguen, y todos los totales salen del mismo estado
+        vista = self.banco.snapshot()
+        self.texto_informe.setPlainText("Generando informe...")
+        threading.Thread(target=self._armar_en_segundo_plano, args=(vista,), daemon=True).start()
+    
+    def _armar_en_segundo_plano(self, vista):
+        with vista:
+            informe = self.armar_informe(vista, vista.saldo)
+        try:
+            self.informe_listo.emit(informe)
+        except RuntimeError:
+            pass  # El diálogo se cerró antes de terminar
+    
+    @staticmethod
+    def armar_informe(fuente, saldo) -> str:
+        """
+        Arma el texto del informe general
+        fuente es el banco o una vista del banco; saldo(cuenta) devuelve el saldo a informar
+        """
         informe = "INFORME GENERAL DEL BANCO\n"
         informe += "=" * 60 + "\n\n"
         
         # Cajas de Ahorro
-        cajas_ahorro = self.banco.obtener_cajas_ahorro()
+        cajas_ahorro = fuente.obtener_cajas_ahorro()
         informe += f"CAJAS DE AHORRO ({len(cajas_ahorro)})\n"
         informe += "-" * 40 + "\n"
         total_ca = 0
         for ca in cajas_ahorro:
-            informe += f"  {ca.numero} - {ca.titular.nombre}: ${ca.saldo:.2f}\n"
-            total_ca += ca.saldo
+            saldo_ca = saldo(ca)
+            informe += f"  {ca.numero} - {ca.titular.nombre}: ${saldo_ca:.2f}\n"
+            total_ca += saldo_ca
         informe += f"TOTAL CA: ${total_ca:.2f}\n\n"
         
         # Cuentas Corrientes
-        cuentas_corriente = self.banco.obtener_cuentas_corriente()
+        cuentas_corriente = fuente.obtener_cuentas_corriente()
         informe += f"CUENTAS CORRIENTES ({len(cuentas_corriente)})\n"
         informe += "-" * 40 + "\n"
         total_cc = 0
         total_descubierto = 0
         for cc in cuentas_corriente:
-            descubierto = f" (Descubierto: ${cc.descubierto_utilizado:.2f})" if cc.saldo < 0 else ""
-            informe += f"  {cc.numero} - {cc.titular.nombre}: ${cc.saldo:.2f}{descubierto}\n"
-            total_cc += cc.saldo
-            if cc.saldo < 0:
-                total_descubierto += abs(cc.saldo)
+            saldo_cc = saldo(cc)
+            descubierto = f" (Descubierto: ${-saldo_cc:.2f})" if saldo_cc < 0 else ""
+            informe += f"  {cc.numero} - {cc.titular.nombre}: ${saldo_cc:.2f}{descubierto}\n"
+            total_cc += saldo_cc
+            if saldo_cc < 0:
+                total_descubierto += abs(saldo_cc)
         informe += f"TOTAL CC: ${total_cc:.2f}\n"
         informe += f"TOTAL EN DESCUBIERTO: ${total_descubierto:.2f}\n\n"
         
         # Plazos Fijos
-        plazos_fijos = self.banco.obtener_cuentas_plazo_fijo()
+        plazos_fijos = fuente.obtener_cuentas_plazo_fijo()
         informe += f"PLAZOS FIJOS ({len(plazos_fijos)})\n"
         informe += "-" * 40 + "\n"
         total_pf = 0
         for pf in plazos_fijos:
-            informe += f"  {pf.numero} - {pf.titular.nombre}: ${pf.saldo:.2f}\n"
-            total_pf += pf.saldo
+            saldo_pf = saldo(pf)
+            informe += f"  {pf.numero} - {pf.titular.nombre}: ${saldo_pf:.2f}\n"
+            total_pf += saldo_pf
         informe += f"TOTAL PF: ${total_pf:.2f}\n\n"
         
         # Clientes
-        clientes_persona = self.banco.obtener_clientes_persona()
-        clientes_empresa = self.banco.obtener_clientes_empresa()
+        clientes_persona = fuente.obtener_clientes_persona()
+        clientes_empresa = fuente.obtener_clientes_empresa()
         informe += "CLIENTES\n"
         informe += "-" * 40 + "\n"
         informe += f"CLIENTES PERSONA: {len(clientes_persona)}\n"
         informe += f"CLIENTES EMPRESA: {len(clientes_empresa)}\n"
-        informe += f"TOTAL CLIENTES: {len(self.banco.obtener_clientes())}\n\n"
+        informe += f"TOTAL CLIENTES: {len(fuente.obtener_clientes())}\n\n"
         
         # Totales generales
-        saldo_total = self.banco.saldo_total()
+        saldo_total = fuente.saldo_total()
         informe += "TOTALES GENERALES\n"
         informe += "-" * 40 + "\n"
         informe += f"SALDO TOTAL: ${saldo_total:.2f}\n"
-        informe += f"TOTAL CUENTAS: {len(self.banco.obtener_cuentas())}\n"
-        
-        self.texto_informe.setPlainText(informe)
+        informe += f"TOTAL CUENTAS: {len(fuente.obtener_cuentas())}\n"
+        return informe
     
     def exportar_informe(self):
         filename, _ = QFileDialog.getSaveFileName(
@@ -157,7 +188,12 @@ class InformePlazoFijoDialog(QDialog):
         self.cargar_plazos_fijos()
     
     def cargar_plazos_fijos(self):
-        plazos_fijos = self.banco.obtener_cuentas_plazo_fijo()
+        # Con la vista todas las filas muestran el mismo instante aunque se acrediten intereses
+        vista = None if self.banco.perezoso else self.banco.snapshot()
+        plazos_fijos = (vista or self.banco).obtener_cuentas_plazo_fijo()
+        saldos = [vista.saldo(pf) if vista else pf.saldo for pf in plazos_fijos]
+        if vista:
+            vista.cerrar()
         self.tabla_plazos_fijos.setRowCount(len(plazos_fijos))
         
         for i, pf in enumerate(plazos_fijos):
@@ -168,7 +204,7 @@ class InformePlazoFijoDialog(QDialog):
             self.tabla_plazos_fijos.setItem(i, 4, QTableWidgetItem(f"${pf.capital_inicial:.2f}"))
             self.tabla_plazos_fijos.setItem(i, 5, QTableWidgetItem(f"{pf.tasa_interes*100:.2f}%"))
             self.tabla_plazos_fijos.setItem(i, 6, QTableWidgetItem(f"${pf.interes_calculado:.2f}"))
-            self.tabla_plazos_fijos.setItem(i, 7, QTableWidgetItem(f"${pf.saldo:.2f}"))
+            self.tabla_plazos_fijos.setItem(i, 7, QTableWidgetItem(f"${saldos[i]:.2f}"))
         
         self.tabla_plazos_fijos.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
     
@@ -199,6 +235,8 @@ class InformePlazoFijoDialog(QDialog):
                 QMessageBox.warning(self, "Error", f"No se pudo exportar: {str(e)}")
 
 class InformeMovimientosDialog(QDialog):
+    TAMANO_PAGINA = 200
+    
     def __init__(self, banco, db, parent=None):
         super().__init__(parent)
         self.banco = banco
@@ -258,6 +296,11 @@ class InformeMovimientosDialog(QDialog):
         self.tabla_movimientos.setHorizontalHeaderLabels(["Fecha", "Cuenta", "Tipo", "Monto", "Saldo Final"])
         layout.addWidget(self.tabla_movimientos)
         
+        # Botón para cargar la página siguiente
+        self.cargar_mas_btn = QPushButton("Cargar más")
+        self.cargar_mas_btn.clicked.connect(self.cargar_pagina)
+        layout.addWidget(self.cargar_mas_btn)
+        
         # Botón exportar
         exportar_btn = QPushButton("Exportar a CSV")
         exportar_btn.clicked.connect(self.exportar_csv)
@@ -267,24 +310,32 @@ class InformeMovimientosDialog(QDialog):
         self.filtrar_movimientos()
     
     def filtrar_movimientos(self):
-        cuenta = self.cuenta_combo.currentData()
-        tipo = self.tipo_combo.currentData()
-        fecha_desde = self.fecha_desde.date().toPyDate()
-        fecha_hasta = self.fecha_hasta.date().toPyDate()
-        
-        movimientos = self.db.cargar_movimientos(cuenta, fecha_desde, fecha_hasta)
-        
-        if tipo:
-            movimientos = [m for m in movimientos if m['tipo'] == tipo]
+        self._filtros = {
+            'numero_cuenta': self.cuenta_combo.currentData(),
+            'tipo': self.tipo_combo.currentData(),
+            'fecha_desde': self.fecha_desde.date().toPyDate(),
+            'fecha_hasta': self.fecha_hasta.date().toPyDate()
+        }
+        self._siguiente = None
+        self.tabla_movimientos.setRowCount(0)
+        self.cargar_pagina()
+    
+    def cargar_pagina(self):
+        movimientos, self._siguiente = self.db.cargar_movimientos_pagina(
+            self._filtros, self._siguiente, self.TAMANO_PAGINA
+        )
+        self.cargar_mas_btn.setEnabled(self._siguiente is not None)
         
-        self.tabla_movimientos.setRowCount(len(movimientos))
+        inicio = self.tabla_movimientos.rowCount()
+        self.tabla_movimientos.setRowCount(inicio + len(movimientos))
         
-        for i, mov in enumerate(movimientos):
-            self.tabla_movimientos.setItem(i, 0, QTableWidgetItem(mov['fecha'].strftime("%d/%m/%Y %H:%M")))
-            self.tabla_movimientos.setItem(i, 1, QTableWidgetItem(mov['numero_cuenta']))
-            self.tabla_movimientos.setItem(i, 2, QTableWidgetItem(mov['tipo']))
+        for i, mov in enumerate(movimientos, start=inicio):
+            fecha, cuenta, tipo, monto, saldo_final = self._textos(mov)
+            self.tabla_movimientos.setItem(i, 0, QTableWidgetItem(fecha))
+            self.tabla_movimientos.setItem(i, 1, QTableWidgetItem(cuenta))
+            self.tabla_movimientos.setItem(i, 2, QTableWidgetItem(tipo))
             
-            monto_item = QTableWidgetItem(f"${mov['monto']:.2f}")
+            monto_item = QTableWidgetItem(monto)
             if mov['monto'] < 0:
                 
                 monto_item.setForeground(QColor(255, 0, 0))  
@@ -292,10 +343,16 @@ class InformeMovimientosDialog(QDialog):
                 monto_item.setForeground(QColor(0, 100, 0))  
             self.tabla_movimientos.setItem(i, 3, monto_item)
             
-            self.tabla_movimientos.setItem(i, 4, QTableWidgetItem(f"${mov['saldo_final']:.2f}"))
+            self.tabla_movimientos.setItem(i, 4, QTableWidgetItem(saldo_final))
         
         self.tabla_movimientos.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
     
+    @staticmethod
+    def _textos(mov) -> list:
+        """Columnas de un movimiento como se muestran en la tabla y en el CSV"""
+        return [mov['fecha'].strftime("%d/%m/%Y %H:%M"), mov['numero_cuenta'], mov['tipo'],
+                f"${mov['monto']:.2f}", f"${mov['saldo_final']:.2f}"]
+    
     def exportar_csv(self):
         filename, _ = QFileDialog.getSaveFileName(
             self, "Exportar CSV", "movimientos.csv", "CSV Files (*.csv)"
@@ -306,12 +363,10 @@ class InformeMovimientosDialog(QDialog):
                     writer = csv.writer(f)
                     writer.writerow(["Fecha", "Cuenta", "Tipo", "Monto", "Saldo Final"])
                     
-                    for row in range(self.tabla_movimientos.rowCount()):
-                        fila = []
-                        for col in range(self.tabla_movimientos.columnCount()):
-                            item = self.tabla_movimientos.item(row, col)
-                            fila.append(item.text() if item else "")
-                        writer.writerow(fila)
+                    # La tabla solo tiene las páginas cargadas: se exportan todos los
+                    # movimientos filtrados recorriéndolos por bloques desde la base
+                    for mov in self.db.iter_movimientos(**self._filtros):
+                        writer.writerow(self._textos(mov))
                 
                 QMessageBox.information(self, "Éxito", "Datos exportados correctamente")
             except Exception as e:
@@ -342,14 +397,14 @@ class ConfiguracionDialog(QDialog):
         self.costo_mantenimiento_input = QDoubleSpinBox()
         self.costo_mantenimiento_input.setMinimum(0)
         self.costo_mantenimiento_input.setMaximum(1000)
-        self.costo_mantenimiento_input.setValue(self.banco.costo_mantenimiento_cc)
+        self.costo_mantenimiento_input.setValue(float(self.banco.costo_mantenimiento_cc))
         self.costo_mantenimiento_input.setPrefix("$ ")
         
         # Comisión por transferencias
         self.comision_transferencia_input = QDoubleSpinBox()
         self.comision_transferencia_input.setMinimum(0)
         self.comision_transferencia_input.setMaximum(500)
-        self.comision_transferencia_input.setValue(self.banco.comision_transferencia)
+        self.comision_transferencia_input.setValue(float(self.banco.comision_transferencia))
         self.comision_transferencia_input.setPrefix("$ ")
         
         layout.addRow("Tasa de Interés Plazo Fijo:", self.tasa_interes_input)
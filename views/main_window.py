@@ -239,25 +239,25 @@ class MainWindow(QMainWindow):
     
     def mostrar_deposito(self):
         from .movimientos_window import DepositoDialog
-        dialog = DepositoDialog(self.controller.banco, self.controller.db, self)
+        dialog = DepositoDialog(self.controller, self)
         if dialog.exec():
             self.actualizar_resumen()
     
     def mostrar_extraccion(self):
         from .movimientos_window import ExtraccionDialog
-        dialog = ExtraccionDialog(self.controller.banco, self.controller.db, self)
+        dialog = ExtraccionDialog(self.controller, self)
         if dialog.exec():
             self.actualizar_resumen()
     
     def mostrar_transferencia(self):
         from .movimientos_window import TransferenciaDialog
-        dialog = TransferenciaDialog(self.controller.banco, self.controller.db, self)
+        dialog = TransferenciaDialog(self.controller, self)
         if dialog.exec():
             self.actualizar_resumen()
     
     def mostrar_plazo_fijo(self):
         from .movimientos_window import PlazoFijoDialog
-        dialog = PlazoFijoDialog(self.controller.banco, self.controller.db, self)
+        dialog = PlazoFijoDialog(self.controller, self)
         if dialog.exec():
             self.actualizar_resumen()
     
@@ -3,13 +3,13 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
                             QLabel, QDoubleSpinBox, QDateEdit, QTextEdit)
 from PyQt6.QtCore import QDate
 from datetime import datetime, timedelta
-from models.entidades import CuentaPlazoFijo
 
 class DepositoDialog(QDialog):
-    def __init__(self, banco, db, parent=None):
+    def __init__(self, controller, parent=None):
         super().__init__(parent)
-        self.banco = banco
-        self.db = db
+        # Las operaciones pasan por el controlador, que las guarda según el modo de la base
+        self.controller = controller
+        self.banco = controller.banco
         self.init_ui()
     
     def init_ui(self):
@@ -70,21 +70,18 @@ class DepositoDialog(QDialog):
             QMessageBox.warning(self, "Error", "Seleccione una cuenta")
             return
         
-        if self.banco.depositar(numero_cuenta, monto):
-            cuenta = self.banco.buscar_cuenta(numero_cuenta)
-            self.db.guardar_cuenta(cuenta)
-            self.db.guardar_movimiento(numero_cuenta, "DEPOSITO", monto, cuenta.saldo)
-            QMessageBox.information(self, "Éxito", f"Depósito de ${monto:.2f} realizado correctamente")
-            self.actualizar_saldo()
+        # El controlador informa el resultado con sus señales
+        if self.controller.depositar(numero_cuenta, monto):
             self.accept()
         else:
-            QMessageBox.warning(self, "Error", "No se pudo realizar el depósito")
+            self.actualizar_saldo()
 
 class ExtraccionDialog(QDialog):
-    def __init__(self, banco, db, parent=None):
+    def __init__(self, controller, parent=None):
         super().__init__(parent)
-        self.banco = banco
-        self.db = db
+        # Las operaciones pasan por el controlador, que las guarda según el modo de la base
+        self.controller = controller
+        self.banco = controller.banco
         self.init_ui()
     
     def init_ui(self):
@@ -155,21 +152,17 @@ class ExtraccionDialog(QDialog):
             QMessageBox.warning(self, "Error", "Seleccione una cuenta")
             return
         
-        if self.banco.extraer(numero_cuenta, monto):
-            cuenta = self.banco.buscar_cuenta(numero_cuenta)
-            self.db.guardar_cuenta(cuenta)
-            self.db.guardar_movimiento(numero_cuenta, "EXTRACCION", -monto, cuenta.saldo)
-            QMessageBox.information(self, "Éxito", f"Extracción de ${monto:.2f} realizada correctamente")
-            self.actualizar_info_cuenta()
+        if self.controller.extraer(numero_cuenta, monto):
             self.accept()
         else:
-            QMessageBox.warning(self, "Error", "No se pudo realizar la extracción (fondos insuficientes)")
+            self.actualizar_info_cuenta()
 
 class TransferenciaDialog(QDialog):
-    def __init__(self, banco, db, parent=None):
+    def __init__(self, controller, parent=None):
         super().__init__(parent)
-        self.banco = banco
-        self.db = db
+        # Las operaciones pasan por el controlador, que las guarda según el modo de la base
+        self.controller = controller
+        self.banco = controller.banco
         self.init_ui()
     
     def init_ui(self):
@@ -251,24 +244,15 @@ class TransferenciaDialog(QDialog):
             QMessageBox.warning(self, "Error", "No puede transferir a la misma cuenta")
             return
         
-        if self.banco.transferir(cuenta_origen_num, cuenta_destino_num, monto):
-            # Actualizar cuentas en la base de datos
-            cuenta_origen = self.banco.buscar_cuenta(cuenta_origen_num)
-            cuenta_destino = self.banco.buscar_cuenta(cuenta_destino_num)
-            
-            self.db.guardar_cuenta(cuenta_origen)
-            self.db.guardar_cuenta(cuenta_destino)
-            
-            QMessageBox.information(self, "Éxito", f"Transferencia de ${monto:.2f} realizada correctamente")
+        if self.controller.transferir(cuenta_origen_num, cuenta_destino_num, monto):
             self.accept()
-        else:
-            QMessageBox.warning(self, "Error", "No se pudo realizar la transferencia (fondos insuficientes)")
 
 class PlazoFijoDialog(QDialog):
-    def __init__(self, banco, db, parent=None):
+    def __init__(self, controller, parent=None):
         super().__init__(parent)
-        self.banco = banco
-        self.db = db
+        # Las operaciones pasan por el controlador, que las guarda según el modo de la base
+        self.controller = controller
+        self.banco = controller.banco
         self.init_ui()
     
     def init_ui(self):
@@ -362,48 +346,7 @@ class PlazoFijoDialog(QDialog):
             QMessageBox.warning(self, "Error", "Seleccione una cuenta origen")
             return
         
-        cuenta_origen = self.banco.buscar_cuenta(cuenta_origen_num)
-        if not cuenta_origen:
-            QMessageBox.warning(self, "Error", "Cuenta origen no encontrada")
-            return
-        
-        if capital > cuenta_origen.saldo:
-            QMessageBox.warning(self, "Error", "Fondos insuficientes en la cuenta origen")
-            return
-        
-        # Extraer capital de la cuenta origen
-        if not cuenta_origen.extraer(capital):
-            QMessageBox.warning(self, "Error", "No se pudo extraer el capital de la cuenta origen")
-            return
-        
-        # Generar número de cuenta para el plazo fijo
-        numero_pf = f"PF{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        # CORRECCIÓN: Crear cuenta a plazo fijo (ahora importada correctamente)
-        plazo_fijo = CuentaPlazoFijo(
-            numero_pf, 
-            cuenta_origen.titular, 
-            capital, 
-            self.banco.tasa_interes_pf, 
-            plazo_dias
-        )
-        
-        # Registrar en el banco y base de datos
-        if self.banco.alta_cuenta(plazo_fijo):
-            self.db.guardar_cuenta(cuenta_origen)
-            self.db.guardar_cuenta(plazo_fijo)
-            self.db.guardar_movimiento(cuenta_origen_num, "CREACION PF", -capital, cuenta_origen.saldo)
-            
-            QMessageBox.information(
-                self, 
-                "Éxito", 
-                f"Plazo fijo creado exitosamente\n"
-                f"Número: {numero_pf}\n"
-                f"Capital: ${capital:.2f}\n"
-                f"Vencimiento: {plazo_fijo.fecha_vencimiento.strftime('%d/%m/%Y')}"
-            )
+        if self.controller.crear_plazo_fijo(cuenta_origen_num, capital, plazo_dias):
             self.accept()
         else:
-            # Revertir la extracción si falla la creación del plazo fijo
-            cuenta_origen.depositar(capital)
-            QMessageBox.warning(self, "Error", "No se pudo crear el plazo fijo")
\ No newline at end of file
+            self.actualizar_info()
\ No newline at end of file